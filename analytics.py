@@ -0,0 +1,221 @@
+"""
+Параллельная аналитика продаж
+
+Колонки журнала продаж копируются в один блок разделяемой памяти, журнал
+делится на части, и каждая часть агрегируется в отдельном процессе
+ProcessPoolExecutor. Процессы считают выручку и количество по целочисленным
+ключам (книга, клиент, сотрудник, день); частичные итоги объединяются в
+основном процессе, где книги переводятся в жанры и авторов, а дни - в месяцы.
+"""
+
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+from models import to_kopecks, from_kopecks
+from ledger import SalesLedger, to_timestamp, EPOCH
+from exceptions import BookstoreError
+
+# Колонки журнала продаж, нужные для агрегатов, в порядке размещения в памяти
+COLUMNS = ('book_id', 'customer_id', 'employee_id', 'quantity', 'total_kopecks', 'timestamp')
+# Ключи, по которым агрегируют процессы
+WORKER_KEYS = ('book_id', 'customer_id', 'employee_id', 'day')
+DIMENSIONS = ('genre', 'author', 'employee', 'customer', 'month', 'book')
+UNKNOWN = 'неизвестно'
+
+DAY = 86_400_000_000
+# Части на процесс: несколько частей сглаживают неравномерную нагрузку
+CHUNKS_PER_WORKER = 4
+# Меньше этого числа продаж запуск процессов не окупается
+PARALLEL_THRESHOLD = 200_000
+
+Totals = Dict[str, Tuple[Dict[int, int], Dict[int, int]]]
+
+
+def _ledger_columns(bookstore) -> List[array]:
+    """Копии колонок продаж для агрегатов
+
+    Колонки копируются под блокировкой записи по одному числу строк:
+    продажи, добавленные во время построения отчета, в него не попадают,
+    а буферы самих колонок журнала не экспортируются (экспортированный
+    массив нельзя дополнить, и продажа завершилась бы ошибкой).
+    """
+    with bookstore._write_lock:
+        sales = bookstore.sales
+        if isinstance(sales, SalesLedger):
+            size = len(sales)
+            return [getattr(sales, name)[:size] for name in COLUMNS]
+
+        columns = [array('q') for _ in COLUMNS]
+        for sale in sales.values():
+            values = (sale.book_id, sale.customer_id, sale.employee_id, sale.quantity,
+                      to_kopecks(sale.total_price), to_timestamp(sale.sale_date))
+            for column, value in zip(columns, values):
+                column.append(value)
+        return columns
+
+
+def _aggregate(book_ids, customer_ids, employee_ids, quantities, kopecks, timestamps) -> Totals:
+    """Выручка в копейках и количество экземпляров по ключам WORKER_KEYS"""
+    days = [timestamp // DAY for timestamp in timestamps]
+    totals = {}
+    for name, keys in zip(WORKER_KEYS, (book_ids, customer_ids, employee_ids, days)):
+        revenue: Dict[int, int] = {}
+        units: Dict[int, int] = {}
+        get_revenue = revenue.get
+        get_units = units.get
+        for key, amount, quantity in zip(keys, kopecks, quantities):
+            revenue[key] = get_revenue(key, 0) + amount
+            units[key] = get_units(key, 0) + quantity
+        totals[name] = (revenue, units)
+    return totals
+
+
+def _aggregate_shared(name: str, size: int, start: int, stop: int) -> Totals:
+    """Агрегирование строк start:stop из блока разделяемой памяти"""
+    block = shared_memory.SharedMemory(name=name)
+    views = []
+    try:
+        whole = block.buf.cast('q')
+        views.append(whole)
+        columns = []
+        for number in range(len(COLUMNS)):
+            column = whole[number * size + start:number * size + stop]
+            views.append(column)
+            columns.append(column)
+        return _aggregate(*columns)
+    finally:
+        for view in reversed(views):
+            view.release()
+        block.close()
+
+
+def _merge(target: Totals, part: Totals) -> None:
+    """Добавление частичных итогов к общим"""
+    for name, (revenue, units) in part.items():
+        total_revenue, total_units = target.setdefault(name, ({}, {}))
+        for key, amount in revenue.items():
+            total_revenue[key] = total_revenue.get(key, 0) + amount
+        for key, quantity in units.items():
+            total_units[key] = total_units.get(key, 0) + quantity
+
+
+def _parallel_totals(columns: List[array], workers: int) -> Totals:
+    """Агрегирование колонок в пуле процессов через разделяемую память
+
+    columns - копии колонок журнала (см. _ledger_columns), поэтому их
+    буферы можно экспортировать.
+    """
+    size = len(columns[0])
+    block = shared_memory.SharedMemory(create=True, size=8 * size * len(COLUMNS))
+    try:
+        for number, column in enumerate(columns):
+            source = memoryview(column).cast('B')
+            block.buf[8 * number * size:8 * (number + 1) * size] = source
+            source.release()
+
+        chunks = workers * CHUNKS_PER_WORKER
+        bounds = [size * part // chunks for part in range(chunks + 1)]
+        totals: Totals = {}
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_aggregate_shared, block.name, size, start, stop)
+                       for start, stop in zip(bounds, bounds[1:]) if start < stop]
+            for future in futures:
+                _merge(totals, future.result())
+        return totals
+    finally:
+        block.close()
+        block.unlink()
+
+
+class SalesReport:
+    """Выручка и количество проданных экземпляров по измерениям DIMENSIONS
+
+    Итоги хранятся в копейках; методы revenue и units возвращают словари
+    "значение измерения -> сумма в рублях (количество)".
+    """
+
+    def __init__(self, revenue: Dict[str, Dict], units: Dict[str, Dict]):
+        self._revenue = revenue
+        self._units = units
+
+    def _check(self, dimension: str) -> None:
+        """Проверка имени измерения"""
+        if dimension not in DIMENSIONS:
+            raise BookstoreError(f"Неизвестное измерение отчета: {dimension}")
+
+    def revenue(self, dimension: str) -> Dict:
+        """Выручка в рублях по значениям измерения"""
+        self._check(dimension)
+        return {key: from_kopecks(amount) for key, amount in self._revenue[dimension].items()}
+
+    def units(self, dimension: str) -> Dict:
+        """Количество проданных экземпляров по значениям измерения"""
+        self._check(dimension)
+        return dict(self._units[dimension])
+
+    def top(self, dimension: str, count: int = 10) -> List[Tuple[object, float, int]]:
+        """Значения измерения с наибольшей выручкой: (значение, выручка, количество)"""
+        self._check(dimension)
+        revenue = self._revenue[dimension]
+        keys = sorted(revenue, key=revenue.get, reverse=True)[:count]
+        return [(key, from_kopecks(revenue[key]), self._units[dimension][key]) for key in keys]
+
+
+def _regroup(totals: Tuple[Dict[int, int], Dict[int, int]], label) -> Tuple[Dict, Dict]:
+    """Перегруппировка итогов по ключам, полученным функцией label"""
+    revenue: Dict = {}
+    units: Dict = {}
+    for key, amount in totals[0].items():
+        group = label(key)
+        revenue[group] = revenue.get(group, 0) + amount
+        units[group] = units.get(group, 0) + totals[1][key]
+    return revenue, units
+
+
+def _month(day: int) -> str:
+    """Месяц в виде ГГГГ-ММ для номера дня от эпохи"""
+    moment = date.fromordinal(EPOCH.toordinal() + day)
+    return f"{moment.year:04d}-{moment.month:02d}"
+
+
+def sales_report(bookstore, workers: Optional[int] = None) -> SalesReport:
+    """Отчет о продажах по жанрам, авторам, сотрудникам, клиентам, месяцам и книгам
+
+    workers - число процессов (по умолчанию число ядер). Небольшие журналы
+    и workers=1 агрегируются в текущем процессе.
+    """
+    try:
+        columns = _ledger_columns(bookstore)
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(columns[0]) >= PARALLEL_THRESHOLD:
+            totals = _parallel_totals(columns, workers)
+        else:
+            totals = _aggregate(*columns)
+
+        books = bookstore.books
+
+        def attribute(name):
+            def label(book_id):
+                book = books.get(book_id)
+                return getattr(book, name) if book is not None else UNKNOWN
+            return label
+
+        groups = {
+            'book': totals['book_id'],
+            'genre': _regroup(totals['book_id'], attribute('genre')),
+            'author': _regroup(totals['book_id'], attribute('author')),
+            'customer': totals['customer_id'],
+            'employee': totals['employee_id'],
+            'month': _regroup(totals['day'], _month),
+        }
+        return SalesReport({name: group[0] for name, group in groups.items()},
+                           {name: group[1] for name, group in groups.items()})
+
+    except BookstoreError:
+        raise
+    except Exception as e:
+        raise BookstoreError(f"Ошибка при построении отчета о продажах: {e}")
@@ -0,0 +1,256 @@
+"""
+Фоновое сохранение снимков магазина
+
+Захват состояния (StateCapture) выполняется под блокировкой записи и
+занимает время, пропорциональное числу книг: словари книг, сотрудников и
+клиентов копируются неглубоко, а из журнала продаж запоминаются только
+колонки и число строк - продажи только добавляются в конец. Остатки книг
+изменяются на месте, поэтому пока захват зарегистрирован в магазине,
+_change_quantity сохраняет в нем исходный остаток книги перед первым
+изменением (копирование при записи).
+
+Сериализация выполняется в рабочем потоке, пока продажи и добавление книг
+продолжаются. BackgroundSnapshots сохраняет снимки по запросу или по
+расписанию и сообщает длительность сохранения и устаревание последнего
+снимка.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Union
+
+from bookstore import Bookstore
+from models import Book
+from ledger import SalesLedger
+from events import NullSink
+from exceptions import BookstoreError, FileOperationError
+from compression import snapshot_extension
+
+# Расширение файла снимка -> метод сохранения
+SNAPSHOT_FORMATS = {'.json': 'save_to_json', '.xml': 'save_to_xml', '.bin': 'save_to_binary'}
+
+
+class StateCapture:
+    """Согласованное состояние магазина на момент захвата
+
+    Захват регистрируется в магазине до вызова release(); materialize()
+    можно вызывать из любого потока.
+    """
+
+    def __init__(self, bookstore: Bookstore):
+        self._bookstore = bookstore
+        # Исходные остатки книг, измененных после захвата
+        self._quantities: Dict[int, int] = {}
+        with bookstore._write_lock:
+            self.time = time.time()
+            self.name = bookstore.name
+            self.books = dict(bookstore.books)
+            self.employees = dict(bookstore.employees)
+            self.customers = dict(bookstore.customers)
+            if isinstance(bookstore.sales, SalesLedger):
+                self._sale_columns = [getattr(bookstore.sales, name) for name in SalesLedger.COLUMNS]
+                self.sales_count = len(bookstore.sales)
+            else:
+                self._sale_columns = None
+                self._sales = dict(bookstore.sales.items())
+                self.sales_count = len(self._sales)
+            self.ids = bookstore.ids.state()
+            self.journal_seq = bookstore._journal_seq
+            bookstore._captures.append(self)
+
+    def preserve(self, book: Book) -> None:
+        """Сохранение исходного остатка книги перед ее изменением
+
+        Вызывается магазином под блокировкой записи.
+        """
+        if book.book_id not in self._quantities:
+            self._quantities[book.book_id] = book.quantity
+
+    def _quantity(self, book: Book) -> int:
+        """Остаток книги на момент захвата"""
+        # Остаток читается до обращения к сохраненным значениям: магазин
+        # сохраняет исходный остаток раньше, чем изменяет книгу
+        quantity = book.quantity
+        return self._quantities.get(book.book_id, quantity)
+
+    def materialize(self, events=None) -> Bookstore:
+        """Магазин с данными на момент захвата (без индексов поиска), пригодный для сохранения"""
+        snapshot = Bookstore(self.name, events=events if events is not None else NullSink())
+        snapshot.books = {book_id: Book.from_checked(book_id, book.title, book.author, book.genre,
+                                                     book.price, self._quantity(book), book.year)
+                          for book_id, book in self.books.items()}
+        snapshot.employees = dict(self.employees)
+        snapshot.customers = dict(self.customers)
+        if self._sale_columns is not None:
+            count = self.sales_count
+            snapshot.sales.extend_columns(*[column[:count] for column in self._sale_columns])
+        else:
+            snapshot.sales = self._sales
+        snapshot.ids.restore(self.ids)
+        snapshot._journal_seq = self.journal_seq
+        return snapshot
+
+    def release(self) -> None:
+        """Отмена регистрации захвата в магазине"""
+        with self._bookstore._write_lock:
+            if self in self._bookstore._captures:
+                self._bookstore._captures.remove(self)
+
+
+def capture(bookstore: Bookstore, events=None) -> Bookstore:
+    """Копия данных магазина на текущий момент для сохранения в фоне
+
+    Под блокировкой записи выполняется только захват; книги и продажи
+    копируются уже после ее освобождения.
+    """
+    state = StateCapture(bookstore)
+    try:
+        return state.materialize(events)
+    finally:
+        state.release()
+
+
+class SnapshotReport:
+    """Итоги фонового сохранения снимка"""
+
+    def __init__(self, filename: str, captured_at: float, capture_seconds: float,
+                 save_seconds: float, sales: int):
+        self.filename = filename
+        self.captured_at = captured_at
+        self.capture_seconds = capture_seconds
+        self.save_seconds = save_seconds
+        self.sales = sales
+
+    @property
+    def seconds(self) -> float:
+        """Общая длительность сохранения"""
+        return self.capture_seconds + self.save_seconds
+
+    def to_dict(self) -> Dict:
+        """Преобразование итогов в словарь"""
+        return {
+            'filename': self.filename,
+            'captured_at': datetime.fromtimestamp(self.captured_at).isoformat(),
+            'capture_seconds': round(self.capture_seconds, 6),
+            'save_seconds': round(self.save_seconds, 3),
+            'sales': self.sales,
+        }
+
+
+class BackgroundSnapshots:
+    """Сохранение снимков магазина в рабочем потоке по запросу и по расписанию
+
+    filename - путь к файлу снимка или функция, возвращающая путь для
+    очередного снимка; формат определяется по расширению (.json, .xml,
+    .bin, в том числе со сжатием: .json.gz и т.п.). Файл записывается во
+    временный файл рядом и атомарно заменяет предыдущий. Одновременно
+    сохраняется не больше одного снимка.
+    Сохранение в другом потоке требует магазина в конкурентном режиме.
+    """
+
+    def __init__(self, bookstore: Bookstore, filename: Union[str, Callable[[], str]]):
+        self.bookstore = bookstore
+        self.filename = filename
+        self.last: Optional[SnapshotReport] = None
+        self.last_error: Optional[Exception] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _path(self) -> str:
+        """Путь к файлу очередного снимка"""
+        return self.filename() if callable(self.filename) else self.filename
+
+    def save(self) -> SnapshotReport:
+        """Захват состояния и сохранение снимка в текущем потоке"""
+        path = self._path()
+        method = SNAPSHOT_FORMATS.get(snapshot_extension(path))
+        if method is None:
+            raise FileOperationError(f"Неизвестный формат снимка: {path}")
+
+        with self._lock:
+            start = time.perf_counter()
+            state = StateCapture(self.bookstore)
+            capture_seconds = time.perf_counter() - start
+            try:
+                snapshot = state.materialize()
+            finally:
+                state.release()
+
+            # Временный файл сохраняет расширения, определяющие формат и сжатие
+            directory, name = os.path.split(path)
+            temp_path = os.path.join(directory, '.tmp-' + name)
+            getattr(snapshot, method)(temp_path)
+            os.replace(temp_path, path)
+
+            report = SnapshotReport(path, state.time, capture_seconds,
+                                    time.perf_counter() - start - capture_seconds, state.sales_count)
+            self.last = report
+
+        self.bookstore._emit('snapshot_saved', filename=path, seconds=report.seconds,
+                             capture_ms=capture_seconds * 1000)
+        return report
+
+    def _check_concurrent(self) -> None:
+        """Проверка, что магазин можно изменять во время сохранения в другом потоке"""
+        if not self.bookstore.concurrent:
+            raise BookstoreError("Фоновому сохранению снимков нужен магазин в конкурентном режиме")
+
+    def save_in_background(self) -> threading.Thread:
+        """Сохранение снимка в отдельном потоке; ошибка сохраняется в last_error"""
+        self._check_concurrent()
+        thread = threading.Thread(target=self._save_logged, name='snapshot', daemon=True)
+        thread.start()
+        return thread
+
+    def _save_logged(self) -> None:
+        """Сохранение снимка с запоминанием ошибки вместо ее выброса"""
+        try:
+            self.save()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e if isinstance(e, BookstoreError) else FileOperationError(
+                f"Ошибка при фоновом сохранении снимка: {e}")
+
+    def start(self, interval: float) -> None:
+        """Запуск сохранения снимков каждые interval секунд"""
+        self._check_concurrent()
+        if self._thread is not None:
+            raise BookstoreError("Сохранение по расписанию уже запущено")
+        if interval <= 0:
+            raise BookstoreError("Интервал сохранения должен быть положительным")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,),
+                                        name='snapshot-schedule', daemon=True)
+        self._thread.start()
+
+    def _run(self, interval: float) -> None:
+        """Цикл сохранения по расписанию"""
+        while not self._stop.wait(interval):
+            self._save_logged()
+
+    def stop(self) -> None:
+        """Остановка сохранения по расписанию (текущее сохранение завершается)"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def staleness(self) -> Optional[float]:
+        """Сколько секунд назад было захвачено состояние последнего снимка"""
+        if self.last is None:
+            return None
+        return time.time() - self.last.captured_at
+
+    def status(self) -> Dict:
+        """Сведения о последнем снимке, его устаревании и последней ошибке"""
+        staleness = self.staleness()
+        return {
+            'last': self.last.to_dict() if self.last is not None else None,
+            'staleness_seconds': round(staleness, 3) if staleness is not None else None,
+            'scheduled': self._thread is not None,
+            'error': str(self.last_error) if self.last_error is not None else None,
+        }
@@ -0,0 +1,429 @@
+"""
+Замеры производительности операций книжного магазина
+
+Запуск: python benchmarks.py <имя замера> [--size N]
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from analytics import sales_report, DIMENSIONS
+from background_snapshot import BackgroundSnapshots
+from bookstore import Bookstore
+from compression import CODECS
+from file_operations import FileOperations
+from events import ConsoleSink, RingBufferSink, NullSink
+from models import Book, Sale
+from ledger import SalesLedger
+from tests.conftest import (make_bookstore, timed, run_concurrent_sales, add_sale_columns,
+                            measure_manager_listing, FIRST_PAGE_SHARE)
+
+
+def fail(message: str) -> None:
+    """Завершение замера с ненулевым кодом при нарушении проверки"""
+    raise SystemExit(f"ОШИБКА: {message}")
+
+
+def benchmark_xml_save(size: int) -> None:
+    """Сравнение записи XML через ElementTree и потоковой записи"""
+    bookstore = make_bookstore(sales=size)
+    with tempfile.TemporaryDirectory() as directory:
+        tree_file = os.path.join(directory, 'tree.xml')
+        stream_file = os.path.join(directory, 'stream.xml')
+
+        tree_time = timed(bookstore.save_to_xml, tree_file)
+        stream_time = timed(bookstore.save_to_xml, stream_file, streaming=True)
+
+        with open(tree_file, 'rb') as f1, open(stream_file, 'rb') as f2:
+            identical = f1.read() == f2.read()
+
+        print(f"Продаж: {size}")
+        print(f"ElementTree: {tree_time:.2f} с")
+        print(f"Потоковая запись: {stream_time:.2f} с (ускорение x{tree_time / stream_time:.1f})")
+        print(f"Размер файла: {os.path.getsize(stream_file) / 2 ** 20:.1f} МБ, "
+              f"файлы {'совпадают' if identical else 'РАЗЛИЧАЮТСЯ'}")
+
+
+def benchmark_binary_snapshot(size: int) -> None:
+    """Сравнение JSON и двоичного колоночного снимка: размер, запись, загрузка"""
+    bookstore = make_bookstore(books=size // 10, sales=size)
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, 'data.json')
+        binary_file = os.path.join(directory, 'data.bin')
+        check_file = os.path.join(directory, 'check.json')
+
+        json_save = timed(bookstore.save_to_json, json_file)
+        binary_save = timed(bookstore.save_to_binary, binary_file)
+
+        loaded_json = Bookstore("JSON")
+        json_load = timed(loaded_json.load_from_json, json_file)
+        loaded_binary = Bookstore("Двоичный")
+        binary_load = timed(loaded_binary.load_from_binary, binary_file)
+
+        loaded_binary.save_to_json(check_file)
+        with open(json_file, 'rb') as f1, open(check_file, 'rb') as f2:
+            identical = f1.read() == f2.read()
+
+        json_size = os.path.getsize(json_file) / 2 ** 20
+        binary_size = os.path.getsize(binary_file) / 2 ** 20
+        print(f"Продаж: {size}, книг: {size // 10}")
+        print(f"JSON: {json_size:.1f} МБ, запись {json_save:.2f} с, загрузка {json_load:.2f} с")
+        print(f"Двоичный: {binary_size:.1f} МБ, запись {binary_save:.2f} с, загрузка {binary_load:.2f} с")
+        print(f"Повторное сохранение в JSON {'совпадает' if identical else 'ОТЛИЧАЕТСЯ'} с исходным")
+    if not identical:
+        fail("JSON после двоичного снимка отличается от исходного")
+
+
+def benchmark_delta_snapshot(size: int) -> None:
+    """Полный снимок JSON и дельта-снимок после нескольких продаж"""
+    bookstore = make_bookstore(books=size // 10, sales=size)
+    bookstore.events = NullSink()
+    with tempfile.TemporaryDirectory() as directory:
+        base_file = os.path.join(directory, 'base.json')
+        delta_file = os.path.join(directory, 'changes.delta')
+
+        full_save = timed(bookstore.save_to_json, base_file)
+        for book_id in range(1, 11):
+            bookstore.sell_book(book_id, 1, 1, 1)
+        delta_save = timed(bookstore.save_delta, delta_file)
+
+        loaded = Bookstore("Цепочка", events=NullSink())
+        chain_load = timed(loaded.load_with_deltas, base_file, [delta_file])
+        restored = len(loaded.sales) == len(bookstore.sales)
+
+        print(f"Продаж: {size}, изменено после снимка: 10 продаж, 10 книг")
+        print(f"Полный снимок: {full_save:.3f} с, {os.path.getsize(base_file) / 2 ** 20:.1f} МБ")
+        print(f"Дельта-снимок: {delta_save * 1000:.2f} мс, {os.path.getsize(delta_file) / 2 ** 10:.1f} КБ")
+        print(f"Загрузка базы с дельтой: {chain_load:.2f} с, "
+              f"продажи {'восстановлены' if restored else 'НЕ ВОССТАНОВЛЕНЫ'}")
+
+
+def benchmark_background_snapshot(size: int) -> None:
+    """Фоновый снимок: пауза записи на захват, длительность сохранения и продажи во время него"""
+    bookstore = make_bookstore(books=size // 10, sales=size, stock=size, concurrent=True)
+    bookstore.events = NullSink()
+    with tempfile.TemporaryDirectory() as directory:
+        snapshots = BackgroundSnapshots(bookstore, os.path.join(directory, 'data.bin'))
+        before = len(bookstore.sales)
+        thread = snapshots.save_in_background()
+        sold = 0
+        while thread.is_alive():
+            bookstore.sell_book(sold % (size // 10) + 1, 1, 1, 1)
+            sold += 1
+        thread.join()
+
+        report = snapshots.last
+        loaded = Bookstore("Снимок", events=NullSink())
+        loaded.load_from_binary(report.filename)
+        consistent = len(loaded.sales) == before and loaded.verify_totals()
+
+        print(f"Продаж: {size}, книг: {size // 10}")
+        print(f"Захват состояния: {report.capture_seconds * 1000:.2f} мс, "
+              f"сохранение: {report.save_seconds:.2f} с")
+        print(f"Продаж во время сохранения: {sold} ({sold / report.save_seconds:.0f} продаж/с)")
+        print(f"Снимок {'согласован' if consistent else 'НЕ СОГЛАСОВАН'} с моментом захвата")
+
+
+def benchmark_compressed_snapshot(size: int) -> None:
+    """Снимки со сжатием: размер, запись и загрузка по кодекам и форматам"""
+    bookstore = make_bookstore(books=size // 10, sales=size)
+    bookstore.events = NullSink()
+    cores = os.cpu_count() or 1
+    threads = FileOperations.COMPRESS_THREADS
+    print(f"Продаж: {size}, книг: {size // 10}, ядер: {cores}")
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for extension, save, load in (('.json', 'save_to_json', 'load_from_json'),
+                                          ('.bin', 'save_to_binary', 'load_from_binary')):
+                plain_size = None
+                for codec in [None] + list(CODECS.values()):
+                    modes = [1] if codec is None or cores == 1 else [1, cores]
+                    for count in modes:
+                        FileOperations.COMPRESS_THREADS = count
+                        filename = os.path.join(directory, 'data' + extension + (codec.extension if codec else ''))
+                        save_time = timed(getattr(bookstore, save), filename)
+                        loaded = Bookstore("Снимок", events=NullSink())
+                        load_time = timed(getattr(loaded, load), filename)
+                        file_size = os.path.getsize(filename)
+                        plain_size = plain_size or file_size
+                        label = f"{extension} {codec.name if codec else 'без сжатия'}"
+                        if codec is not None and len(modes) > 1:
+                            label += f" ({count} пот.)"
+                        print(f"{label:24} {file_size / 2 ** 20:8.1f} МБ (x{plain_size / file_size:.1f}), "
+                              f"запись {save_time:.2f} с, загрузка {load_time:.2f} с"
+                              f"{'' if len(loaded.sales) == size else ', ПРОДАЖИ НЕ ВОССТАНОВЛЕНЫ'}")
+    finally:
+        FileOperations.COMPRESS_THREADS = threads
+
+
+def benchmark_partitioned_snapshot(size: int) -> None:
+    """Секционированный снимок: запись и загрузка по числу процессов против одного JSON файла"""
+    bookstore = make_bookstore(books=max(1, size // 100))
+    add_sale_columns(bookstore, size)
+    bookstore.events = NullSink()
+    cores = os.cpu_count() or 1
+    print(f"Продаж: {size}, книг: {len(bookstore.books)}, ядер: {cores}")
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, 'data.json')
+        json_save = timed(bookstore.save_to_json, json_file)
+        json_load = timed(Bookstore("JSON", events=NullSink()).load_from_json, json_file)
+        print(f"Один JSON файл: запись {json_save:.2f} с, загрузка {json_load:.2f} с")
+        os.remove(json_file)
+
+        parts = os.path.join(directory, 'parts')
+        single = None
+        for workers in sorted({1, cores} | {count for count in (2, 4, 8) if count < cores}):
+            save_time = timed(bookstore.save_partitioned, parts, workers)
+            loaded = Bookstore("Секции", events=NullSink())
+            load_time = timed(loaded.load_partitioned, parts, workers)
+            single = single or load_time
+            restored = len(loaded.sales) == size and loaded.verify_totals()
+            print(f"Процессов: {workers}: запись {save_time:.2f} с, загрузка {load_time:.2f} с "
+                  f"(x{single / load_time:.1f} к одному процессу, x{json_load / load_time:.1f} к JSON), "
+                  f"данные {'восстановлены' if restored else 'НЕ ВОССТАНОВЛЕНЫ'}")
+
+
+def traced_memory(build) -> int:
+    """Объем памяти, занятый результатом build(), в байтах"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return used
+
+
+def generate_sales(size: int):
+    """Генератор продаж для замеров памяти"""
+    start = datetime(2024, 1, 1)
+    for sale_id in range(1, size + 1):
+        yield Sale(sale_id, sale_id % 1000 + 1, sale_id % 100 + 1, sale_id % 10 + 1,
+                   1, 100.0 + sale_id % 900, start + timedelta(seconds=sale_id))
+
+
+def benchmark_sales_memory(size: int) -> None:
+    """Память на одну продажу: словарь объектов Sale и колоночный журнал"""
+    def build_dict():
+        return {sale.sale_id: sale for sale in generate_sales(size)}
+
+    def build_ledger():
+        ledger = SalesLedger()
+        for sale in generate_sales(size):
+            ledger.put(sale)
+        return ledger
+
+    dict_bytes = traced_memory(build_dict)
+    ledger_bytes = traced_memory(build_ledger)
+    print(f"Продаж: {size}")
+    print(f"Словарь объектов Sale: {dict_bytes / size:.0f} байт на продажу")
+    print(f"Колоночный журнал: {ledger_bytes / size:.0f} байт на продажу "
+          f"(в {dict_bytes / ledger_bytes:.1f} раза меньше)")
+
+
+class PlainBook:
+    """Книга с атрибутами в __dict__ и без интернирования (прежнее представление)"""
+
+    def __init__(self, book_id, title, author, genre, price, quantity, year):
+        self.book_id = book_id
+        self.title = title
+        self.author = author
+        self.genre = genre
+        self.price = price
+        self.quantity = quantity
+        self.year = year
+
+
+def generate_book_rows(size: int):
+    """Генератор полей книг; каждая строка - отдельный объект, как после разбора файла"""
+    for book_id in range(1, size + 1):
+        yield (book_id, f"Книга {book_id}", f"Автор {book_id % 997}",
+               f"Жанр {book_id % 5}", 100.0 + book_id % 900, 10, 2000)
+
+
+def benchmark_books_memory(size: int) -> None:
+    """Память на одну книгу: объекты с __dict__ и слотами с интернированием"""
+    plain_bytes = traced_memory(lambda: [PlainBook(*row) for row in generate_book_rows(size)])
+    slots_bytes = traced_memory(lambda: [Book(*row) for row in generate_book_rows(size)])
+    print(f"Книг: {size}")
+    print(f"Атрибуты в __dict__: {plain_bytes / size:.0f} байт на книгу")
+    print(f"Слоты и интернирование: {slots_bytes / size:.0f} байт на книгу "
+          f"(в {plain_bytes / slots_bytes:.1f} раза меньше)")
+
+
+def benchmark_sell_bulk(size: int) -> None:
+    """Продажа size позиций: цикл sell_book и один вызов sell_books_bulk"""
+    lines = [(line % 1000 + 1, 1) for line in range(size)]
+
+    looped = make_bookstore()
+    bulk = make_bookstore()
+    with contextlib.redirect_stdout(io.StringIO()):
+        loop_time = timed(lambda: [looped.sell_book(book_id, quantity, 1, 1) for book_id, quantity in lines])
+        bulk_time = timed(bulk.sell_books_bulk, lines, 1, 1)
+
+    identical = (looped.get_total_revenue() == bulk.get_total_revenue() and
+                 looped.get_inventory_value() == bulk.get_inventory_value())
+    print(f"Позиций: {size}")
+    print(f"Цикл sell_book: {loop_time:.3f} с ({size / loop_time:.0f} позиций/с)")
+    print(f"sell_books_bulk: {bulk_time:.3f} с ({size / bulk_time:.0f} позиций/с, "
+          f"ускорение x{loop_time / bulk_time:.1f})")
+    print(f"Итоговые суммы {'совпадают' if identical else 'РАЗЛИЧАЮТСЯ'}")
+
+
+def benchmark_concurrent_sales(size: int) -> None:
+    """Нагрузочная проверка конкурентного режима: продажи в секунду по числу потоков"""
+    interval = sys.getswitchinterval()
+    # Частое переключение потоков увеличивает число чередований операций
+    sys.setswitchinterval(1e-5)
+    try:
+        print(f"Попыток продажи: {size}")
+        failures = []
+        for threads in (1, 2, 4, 8):
+            result = run_concurrent_sales(threads, size)
+            failed = [name for name, passed in result['checks'].items() if not passed]
+            failures.extend(f"{threads} потоков: {name}" for name in failed)
+            print(f"Потоков: {threads}: продано {result['sold']}, "
+                  f"{result['sold'] / result['elapsed']:.0f} продаж/с, "
+                  f"поисков параллельно: {result['searches']}, "
+                  f"{'проверки пройдены' if not failed else 'ОШИБКИ: ' + ', '.join(failed)}")
+    finally:
+        sys.setswitchinterval(interval)
+    if failures:
+        fail("нарушены инварианты конкурентных продаж: " + "; ".join(failures))
+
+
+def benchmark_analytics(size: int) -> None:
+    """Отчет о продажах в одном процессе и в пуле процессов"""
+    bookstore = make_bookstore(books=10000, customers=1000, employees=50)
+    add_sale_columns(bookstore, size)
+
+    serial_time = timed(sales_report, bookstore, workers=1)
+    serial = sales_report(bookstore, workers=1)
+    print(f"Продаж: {size}, ядер: {os.cpu_count()}")
+    print(f"1 процесс: {serial_time:.2f} с")
+    for workers in (2, 4, 8):
+        if workers > 2 * (os.cpu_count() or 1):
+            break
+        start = time.perf_counter()
+        report = sales_report(bookstore, workers=workers)
+        elapsed = time.perf_counter() - start
+        identical = all(report.revenue(name) == serial.revenue(name) and
+                        report.units(name) == serial.units(name) for name in DIMENSIONS)
+        print(f"{workers} процесса: {elapsed:.2f} с (ускорение x{serial_time / elapsed:.1f}), "
+              f"итоги {'совпадают' if identical else 'РАЗЛИЧАЮТСЯ'}")
+
+
+def benchmark_manager_listing(size: int) -> None:
+    """Вывод списка книг менеджером: построчный print и постраничный буферизованный вывод"""
+    bookstore = make_bookstore(books=size)
+    with open(os.devnull, 'w') as devnull:
+        def print_all():
+            with contextlib.redirect_stdout(devnull):
+                for book in bookstore.books.values():
+                    print(f"  {book}")
+
+        print_time = timed(print_all)
+    result = measure_manager_listing(size)
+
+    print(f"Книг: {size}")
+    print(f"Все книги построчным print: {print_time:.3f} с")
+    print(f"Первая страница: {result['first_page'] * 1000:.2f} мс, "
+          f"с сортировкой по цене: {result['sorted_page'] * 1000:.1f} мс")
+    print(f"Все страницы подряд: {result['all_pages']:.3f} с, записей вывода: {result['writes']} "
+          f"на {result['pages']} стр.")
+    print(f"Продажа с поиском книги по названию: {result['sell'] * 1000:.2f} мс")
+
+    if result['first_page'] > result['all_pages'] * FIRST_PAGE_SHARE:
+        fail(f"первая страница дольше {FIRST_PAGE_SHARE:.1%} вывода всех страниц: "
+             f"список строится целиком")
+    if result['writes'] > result['pages'] + 1:
+        fail(f"{result['writes']} записей вывода на {result['pages']} страниц: вывод не постраничный")
+
+
+def benchmark_import_books(size: int) -> None:
+    """Добавление книг через add_book с разными приемниками событий"""
+    rows = list(generate_book_rows(size))
+    with open(os.devnull, 'w') as devnull:
+        sinks = [
+            ("Консоль, по сообщению", ConsoleSink(devnull)),
+            ("Консоль, пакетами по 1000", ConsoleSink(devnull, batch_size=1000)),
+            ("Кольцевой буфер", RingBufferSink()),
+            ("Без событий", NullSink()),
+        ]
+        print(f"Книг: {size} (консольный вывод направлен в {os.devnull})")
+        for title, sink in sinks:
+            bookstore = Bookstore("Импорт")
+
+            def load():
+                with bookstore.silent(sink):
+                    for row in rows:
+                        bookstore.add_book(Book(*row))
+
+            elapsed = timed(load)
+            print(f"{title}: {elapsed:.2f} с ({size / elapsed:.0f} книг/с)")
+
+
+def benchmark_csv_import(size: int) -> None:
+    """Импорт каталога книг из CSV с каждой сотой строкой с ошибкой"""
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'catalogue.csv')
+        with open(filename, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['title', 'author', 'genre', 'price', 'quantity', 'year'])
+            for book_id, title, author, genre, price, quantity, year in generate_book_rows(size):
+                if book_id % 100 == 0:
+                    price = 'нет'
+                writer.writerow([title, author, genre, price, quantity, year])
+
+        bookstore = Bookstore("Импорт", events=NullSink())
+        report = bookstore.import_csv(filename, pause_gc=True)
+        print(report)
+        # Файл отклоненных строк удаляется вместе с каталогом, поэтому проверяется здесь
+        with open(report.reject_file, encoding='utf-8', newline='') as f:
+            rejected = sum(1 for _ in csv.reader(f)) - 1
+        if rejected != size // 100:
+            fail(f"в файле отклоненных строк {rejected} записей вместо {size // 100}")
+        print(f"Отклоненных строк в файле: {rejected}")
+
+
+BENCHMARKS = {
+    'xml_save': (benchmark_xml_save, 1_000_000),
+    'binary_snapshot': (benchmark_binary_snapshot, 1_000_000),
+    'delta_snapshot': (benchmark_delta_snapshot, 1_000_000),
+    'background_snapshot': (benchmark_background_snapshot, 1_000_000),
+    'compressed_snapshot': (benchmark_compressed_snapshot, 1_000_000),
+    'partitioned_snapshot': (benchmark_partitioned_snapshot, 10_000_000),
+    'sales_memory': (benchmark_sales_memory, 1_000_000),
+    'books_memory': (benchmark_books_memory, 1_000_000),
+    'sell_bulk': (benchmark_sell_bulk, 10_000),
+    'concurrent_sales': (benchmark_concurrent_sales, 100_000),
+    'analytics': (benchmark_analytics, 10_000_000),
+    'manager_listing': (benchmark_manager_listing, 100_000),
+    'import_books': (benchmark_import_books, 200_000),
+    'csv_import': (benchmark_csv_import, 1_000_000),
+}
+
+
+def main():
+    """Запуск выбранного замера"""
+    parser = argparse.ArgumentParser(description="Замеры производительности книжного магазина")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--size', type=int, help="размер данных (по умолчанию свой для каждого замера)")
+    args = parser.parse_args()
+
+    benchmark, default_size = BENCHMARKS[args.benchmark]
+    benchmark(args.size or default_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Двоичный колоночный формат снимка данных магазина
+
+Структура файла (все числа little-endian, блоки выровнены по 8 байт):
+    заголовок: сигнатура, счетчики ID, номер записи журнала, размеры разделов
+    таблица строк: смещения (в символах) и общий блок строк в UTF-8
+    колонки разделов books, employees, customers, sales - массивы
+    фиксированной ширины; строковые поля хранятся номерами в таблице строк
+
+Сжатый файл (.bin.gz, .bin.bz2, .bin.xz) распаковывается в память
+целиком, колонки читаются из распакованного буфера.
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import Dict, List
+
+import compression
+from models import Book, Employee, Customer, Sale, to_kopecks, from_kopecks
+from ledger import SalesLedger, to_timestamp, from_timestamp
+
+MAGIC = b'BKSTCOL1'
+HEADER = struct.Struct('<8sqqqqqIQQQQ')
+STRING_TABLE = struct.Struct('<QQ')
+
+# (раздел, модель, метод пакетного размещения в магазине, [(поле, тип колонки)])
+# Тип 'S' - номер строки в таблице строк, 'T' - дата в микросекундах от эпохи
+SECTIONS = [
+    ('books', Book, '_restore_books',
+     [('book_id', 'q'), ('title', 'S'), ('author', 'S'), ('genre', 'S'),
+      ('price', 'd'), ('quantity', 'q'), ('year', 'q')]),
+    ('employees', Employee, '_restore_employees',
+     [('emp_id', 'q'), ('name', 'S'), ('position', 'S'), ('salary', 'd')]),
+    ('customers', Customer, '_restore_customers',
+     [('cust_id', 'q'), ('name', 'S'), ('email', 'S'), ('phone', 'S')]),
+    ('sales', Sale, '_restore_sales',
+     [('sale_id', 'q'), ('book_id', 'q'), ('customer_id', 'q'), ('employee_id', 'q'),
+      ('quantity', 'q'), ('total_price', 'd'), ('sale_date', 'T')]),
+]
+
+STORAGE_TYPES = {'q': 'q', 'd': 'd', 'S': 'I', 'T': 'q'}
+
+
+def _padding(size: int) -> bytes:
+    """Заполнение до границы 8 байт"""
+    return b'\0' * (-size % 8)
+
+
+class StringTable:
+    """Таблица уникальных строк снимка"""
+
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self._strings: List[str] = []
+
+    def ref(self, text: str) -> int:
+        """Номер строки в таблице (строка добавляется при первом обращении)"""
+        number = self._index.get(text)
+        if number is None:
+            number = self._index[text] = len(self._strings)
+            self._strings.append(text)
+        return number
+
+    def to_bytes(self) -> bytes:
+        """Двоичное представление таблицы строк"""
+        offsets = array('Q', [0])
+        position = 0
+        for text in self._strings:
+            position += len(text)
+            offsets.append(position)
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+
+        blob = ''.join(self._strings).encode('utf-8')
+        data = STRING_TABLE.pack(len(self._strings), len(blob)) + offsets.tobytes()
+        return data + blob + _padding(len(blob))
+
+
+def _little_endian(column: array) -> array:
+    """Колонка в порядке байтов little-endian"""
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+def _ledger_columns(ledger: SalesLedger) -> list:
+    """Колонки раздела sales, взятые из журнала продаж"""
+    return [ledger.sale_id, ledger.book_id, ledger.customer_id, ledger.employee_id,
+            ledger.quantity, map(from_kopecks, ledger.total_kopecks), ledger.timestamp]
+
+
+def _column_values(entities, field: str, kind: str, strings: StringTable) -> array:
+    """Колонка значений поля для всех сущностей раздела"""
+    if kind == 'S':
+        values = [strings.ref(getattr(entity, field)) for entity in entities]
+    elif kind == 'T':
+        values = [to_timestamp(getattr(entity, field)) for entity in entities]
+    else:
+        values = [getattr(entity, field) for entity in entities]
+
+    return _little_endian(array(STORAGE_TYPES[kind], values))
+
+
+def save(bookstore, filename: str, threads: int = 1) -> None:
+    """Сохранение магазина в двоичный колоночный файл
+
+    threads - число потоков блочного сжатия, если файл сжимается.
+    """
+    strings = StringTable()
+    name_ref = strings.ref(bookstore.name)
+
+    sizes = []
+    columns = []
+    for section, _, _, fields in SECTIONS:
+        storage = getattr(bookstore, section)
+        if isinstance(storage, SalesLedger):
+            # Колонки журнала продаж записываются без создания объектов Sale
+            sizes.append(len(storage))
+            columns.extend(_little_endian(array(STORAGE_TYPES[kind], values)) for (_, kind), values in
+                           zip(fields, _ledger_columns(storage)))
+            continue
+
+        entities = list(storage.values())
+        sizes.append(len(entities))
+        for field, kind in fields:
+            columns.append(_column_values(entities, field, kind, strings))
+
+    with compression.open_write(filename, threads) as f:
+        f.write(HEADER.pack(MAGIC, bookstore._next_book_id, bookstore._next_emp_id,
+                            bookstore._next_cust_id, bookstore._next_sale_id,
+                            bookstore._journal_seq, name_ref, *sizes))
+        f.write(_padding(HEADER.size))
+        f.write(strings.to_bytes())
+        for column in columns:
+            data = column.tobytes()
+            f.write(data)
+            f.write(_padding(len(data)))
+
+
+def load(bookstore, filename: str) -> None:
+    """Загрузка магазина из двоичного колоночного файла
+
+    Файл отображается в память через mmap, колонки читаются напрямую из
+    отображения без промежуточных копий, а объекты создаются пакетно
+    по разделам.
+    """
+    if compression.is_compressed(filename):
+        with compression.open_read(filename) as f:
+            _load_from_buffer(bookstore, f.read())
+        return
+
+    with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        _load_from_buffer(bookstore, mapped)
+
+
+def _load_from_buffer(bookstore, buffer) -> None:
+    """Разбор файла из буфера; представления буфера освобождаются до его закрытия"""
+    views = [memoryview(buffer)]
+    try:
+        _load_from_view(bookstore, views[0], views)
+    finally:
+        for view in reversed(views):
+            view.release()
+
+
+def _load_from_view(bookstore, view: memoryview, views: List[memoryview]) -> None:
+    """Разбор отображенного в память файла"""
+    (magic, next_book_id, next_emp_id, next_cust_id, next_sale_id,
+     journal_seq, name_ref, *sizes) = HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("Файл не является двоичным снимком магазина")
+    position = HEADER.size + len(_padding(HEADER.size))
+
+    # Таблица строк декодируется целиком одним вызовом
+    count, blob_size = STRING_TABLE.unpack_from(view, position)
+    position += STRING_TABLE.size
+    offsets = _column(view, views, position, 'Q', count + 1)
+    position += 8 * (count + 1)
+    text = str(view[position:position + blob_size], 'utf-8')
+    strings = [text[offsets[i]:offsets[i + 1]] for i in range(count)]
+    position += blob_size + len(_padding(blob_size))
+
+    bookstore._clear_data()
+    bookstore.name = strings[name_ref]
+
+    for (section, model, restore, fields), size in zip(SECTIONS, sizes):
+        columns = []
+        for field, kind in fields:
+            storage = STORAGE_TYPES[kind]
+            columns.append(_column(view, views, position, storage, size))
+            nbytes = array(storage).itemsize * size
+            position += nbytes + len(_padding(nbytes))
+
+        if section == 'sales':
+            # Продажи попадают в колоночный журнал без создания объектов Sale
+            *ids, prices, timestamps = columns
+            bookstore._restore_sale_columns(*ids, array('q', map(to_kopecks, prices)), timestamps)
+            continue
+
+        values = []
+        for (field, kind), column in zip(fields, columns):
+            if kind == 'S':
+                values.append([strings[ref] for ref in column])
+            elif kind == 'T':
+                values.append([from_timestamp(micros) for micros in column])
+            else:
+                values.append(column.tolist())
+
+        getattr(bookstore, restore)([model(*row) for row in zip(*values)])
+
+    bookstore._next_book_id = next_book_id
+    bookstore._next_emp_id = next_emp_id
+    bookstore._next_cust_id = next_cust_id
+    bookstore._next_sale_id = next_sale_id
+    bookstore._journal_seq = journal_seq
+
+
+def _column(view: memoryview, views: List[memoryview], position: int, storage: str, size: int):
+    """Колонка фиксированной ширины, прочитанная из отображения файла"""
+    width = array(storage).itemsize
+    raw = view[position:position + width * size]
+    views.append(raw)
+    if sys.byteorder != 'little':
+        column = array(storage, raw.tobytes())
+        column.byteswap()
+        return column
+    column = raw.cast(storage)
+    views.append(column)
+    return column
@@ -2,84 +2,377 @@
 Основной класс книжного магазина
 """
 
-from typing import List, Dict
-from models import Book, Employee, Customer, Sale
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from models import Book, Employee, Customer, Sale, to_kopecks, from_kopecks
 from exceptions import *
 from file_operations import FileOperations
+from csv_import import BATCH_SIZE, ImportReport
+from indexes import BookIndex, SaleIndex, TimeIndex, RollingCounter
+from ledger import SalesLedger, to_timestamp, from_timestamp, time_buckets
+from journal import compact
+from id_allocator import IDAllocator, CounterAttribute
+from delta_snapshot import ChangeTracker, snapshot_digest
+from compression import snapshot_extension
+from events import Event, EventSink, ConsoleSink, NullSink
+
+# Число блокировок, между которыми распределяются книги в конкурентном режиме
+LOCK_STRIPES = 64
+# Число попыток поиска без блокировки до перехода к поиску под блокировкой
+SEARCH_RETRIES = 8
+# Скользящие окна итогов продаж: имя -> длина в минутах
+ROLLING_WINDOWS = {'1h': 60, '24h': 24 * 60}
+# Пакеты продаж больше этого размера пересчитывают скользящие окна по индексу времени
+ROLLING_REBUILD_SIZE = 1024
+# Расширение файла полного снимка -> метод загрузки
+SNAPSHOT_LOADERS = {'.json': 'load_from_json', '.xml': 'load_from_xml', '.bin': 'load_from_binary'}
 
 
 class Bookstore:
-    """Основной класс книжного магазина"""
-
-    def __init__(self, name: str):
+    """Основной класс книжного магазина
+
+    В конкурентном режиме (concurrent=True) магазин можно использовать из
+    нескольких потоков. Проверка и изменение остатка книги выполняются под
+    блокировкой ее полосы (книги распределены по LOCK_STRIPES блокировкам),
+    общие структуры - индексы, журнал продаж, итоги - изменяются под
+    короткой блокировкой записи, а ID выделяются атомарно. Поиск книг
+    выполняется без блокировок: счетчик версий, который увеличивается до и
+    после каждой записи, позволяет обнаружить пересечение с изменением и
+    повторить поиск.
+
+    Сообщения об изменениях передаются приемнику событий events (по
+    умолчанию - вывод в консоль); silent() временно отключает их.
+
+    ID новых сущностей выдает распределитель ids; атрибуты _next_*_id
+    отображаются на его счетчики. Слой хранения отмечает измененные
+    сущности, и save_delta сохраняет только изменения после последнего
+    снимка.
+    """
+
+    _next_book_id = CounterAttribute('book')
+    _next_emp_id = CounterAttribute('employee')
+    _next_cust_id = CounterAttribute('customer')
+    _next_sale_id = CounterAttribute('sale')
+
+    def __init__(self, name: str, concurrent: bool = False, events: Optional[EventSink] = None):
         self.name = name
+        self.concurrent = concurrent
+        self.events = events if events is not None else ConsoleSink()
         self.books: Dict[int, Book] = {}
         self.employees: Dict[int, Employee] = {}
         self.customers: Dict[int, Customer] = {}
-        self.sales: Dict[int, Sale] = {}
-        self._next_book_id = 1
-        self._next_emp_id = 1
-        self._next_cust_id = 1
-        self._next_sale_id = 1
+        self.sales = SalesLedger()
+        self.ids = IDAllocator(concurrent)
+        self._book_index = BookIndex()
+        self._sale_index = SaleIndex()
+        self._time_index = TimeIndex()
+        self._rolling = {name: RollingCounter(minutes) for name, minutes in ROLLING_WINDOWS.items()}
+        self._revenue_kopecks = 0
+        self._inventory_kopecks = 0
+        self.journal = None
+        self._journal_seq = 0
+        self._changes = ChangeTracker()
+        # Захваты состояния для фоновых снимков (background_snapshot.StateCapture)
+        self._captures = []
         self.file_ops = FileOperations()
 
-    def _get_next_book_id(self) -> int:
-        """Получить следующий доступный ID для книги"""
-        if self.books:
-            max_id = max(self.books.keys())
-            return max_id + 1
-        return 1
-
-    def _get_next_emp_id(self) -> int:
-        """Получить следующий доступный ID для сотрудника"""
-        if self.employees:
-            max_id = max(self.employees.keys())
-            return max_id + 1
-        return 1
-
-    def _get_next_cust_id(self) -> int:
-        """Получить следующий доступный ID для клиента"""
-        if self.customers:
-            max_id = max(self.customers.keys())
-            return max_id + 1
-        return 1
+        self._version = 0
+        if concurrent:
+            self._write_lock = threading.Lock()
+            self._stock_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        else:
+            self._write_lock = nullcontext()
+            self._stock_locks = [nullcontext()]
+
+    def _emit(self, kind: str, **data) -> None:
+        """Передача события приемнику, если он включен"""
+        if self.events.enabled:
+            self.events.emit(Event(kind, data))
+
+    @contextmanager
+    def silent(self, sink: Optional[EventSink] = None):
+        """Временная замена приемника событий для пакетных операций
+
+        По умолчанию события отключаются; можно передать другой приемник,
+        например ConsoleSink с пакетным выводом.
+        """
+        previous = self.events
+        self.events = sink if sink is not None else NullSink()
+        try:
+            yield self.events
+        finally:
+            self.events.flush()
+            self.events = previous
+
+    def _stock_lock(self, book_id: int):
+        """Блокировка полосы, к которой относится книга"""
+        return self._stock_locks[book_id % len(self._stock_locks)]
+
+    @contextmanager
+    def _writing(self):
+        """Изменение общих структур магазина под блокировкой записи"""
+        with self._write_lock:
+            self._version += 1
+            try:
+                yield
+            finally:
+                self._version += 1
+
+    def _clear_data(self) -> None:
+        """Очистка всех данных магазина вместе с индексами"""
+        self.books.clear()
+        self.employees.clear()
+        self.customers.clear()
+        self.sales.clear()
+        self._book_index.clear()
+        self._sale_index.clear()
+        self._time_index.clear()
+        for counter in self._rolling.values():
+            counter.clear()
+        self._revenue_kopecks = 0
+        self._inventory_kopecks = 0
+        self._changes.reset()
+
+    def _restore_book(self, book: Book) -> None:
+        """Размещение загруженной книги без проверок и сообщений"""
+        # Стоимость считается до изменения данных: ошибка перевода в копейки их не затрагивает
+        value = to_kopecks(book.price) * book.quantity
+        old = self.books.get(book.book_id)
+        if old is not None:
+            self._inventory_kopecks -= to_kopecks(old.price) * old.quantity
+        # Индекс сам заменяет прежнюю книгу, сохраняя ее место в порядке выдачи
+        self.books[book.book_id] = book
+        self._book_index.add(book)
+        self._inventory_kopecks += value
+        self.ids.observe('book', book.book_id)
+        self._changes.mark('books', book.book_id)
+
+    def _restore_employee(self, employee: Employee) -> None:
+        """Размещение загруженного сотрудника без проверок и сообщений"""
+        self.employees[employee.emp_id] = employee
+        self.ids.observe('employee', employee.emp_id)
+        self._changes.mark('employees', employee.emp_id)
+
+    def _restore_customer(self, customer: Customer) -> None:
+        """Размещение загруженного клиента без проверок и сообщений"""
+        self.customers[customer.cust_id] = customer
+        self.ids.observe('customer', customer.cust_id)
+        self._changes.mark('customers', customer.cust_id)
+
+    def _restore_sale(self, sale: Sale) -> None:
+        """Размещение загруженной продажи без проверок и сообщений"""
+        old = self.sales.get(sale.sale_id)
+        if old is not None:
+            self._sale_index.remove(old)
+            self._time_index.remove(old.sale_id, to_timestamp(old.sale_date))
+            self._revenue_kopecks -= to_kopecks(old.total_price)
+            for counter in self._rolling.values():
+                counter.add(to_timestamp(old.sale_date), -to_kopecks(old.total_price), -old.quantity)
+        self.sales.put(sale)
+        self._sale_index.add(sale)
+        kopecks = to_kopecks(sale.total_price)
+        timestamp = to_timestamp(sale.sale_date)
+        self._time_index.add(sale.sale_id, timestamp, kopecks, sale.quantity)
+        for counter in self._rolling.values():
+            counter.add(timestamp, kopecks, sale.quantity)
+        self._revenue_kopecks += kopecks
+        self.ids.observe('sale', sale.sale_id)
+        self._changes.mark('sales', sale.sale_id)
+
+    def _restore_books(self, books: List[Book]) -> None:
+        """Пакетное размещение загруженных книг с построением индексов за один проход
+
+        Цены переводятся в копейки до изменения данных, поэтому пакет с
+        непереводимой ценой не размещается совсем.
+        """
+        value = sum(to_kopecks(book.price) * book.quantity for book in books)
+        if any(book.book_id in self.books for book in books):
+            for book in books:
+                self._restore_book(book)
+            return
+
+        self.books.update((book.book_id, book) for book in books)
+        self._book_index.add_many(books)
+        self._inventory_kopecks += value
+        if books:
+            self.ids.observe('book', max(book.book_id for book in books))
+            self._changes.mark_many('books', (book.book_id for book in books))
+
+    def _restore_employees(self, employees: List[Employee]) -> None:
+        """Пакетное размещение загруженных сотрудников"""
+        for employee in employees:
+            self._restore_employee(employee)
+
+    def _restore_customers(self, customers: List[Customer]) -> None:
+        """Пакетное размещение загруженных клиентов"""
+        for customer in customers:
+            self._restore_customer(customer)
+
+    def _restore_sales(self, sales: List[Sale]) -> None:
+        """Пакетное размещение загруженных продаж с построением индексов за один проход"""
+        if any(sale.sale_id in self.sales for sale in sales):
+            for sale in sales:
+                self._restore_sale(sale)
+            return
+
+        self.sales.extend(sales)
+        self._sale_index.add_many(sales)
+        kopecks = [to_kopecks(sale.total_price) for sale in sales]
+        self._add_to_time_index([sale.sale_id for sale in sales],
+                                [to_timestamp(sale.sale_date) for sale in sales],
+                                kopecks, [sale.quantity for sale in sales])
+        self._revenue_kopecks += sum(kopecks)
+        if sales:
+            self.ids.observe('sale', max(sale.sale_id for sale in sales))
+            self._changes.mark_many('sales', (sale.sale_id for sale in sales))
+
+    def _restore_sale_columns(self, sale_ids, book_ids, customer_ids, employee_ids,
+                              quantities, total_kopecks, timestamps) -> None:
+        """Пакетное размещение загруженных продаж, заданных колонками
+
+        Продажи попадают в журнал продаж без создания объектов Sale.
+        """
+        if self.sales.intersects(sale_ids):
+            self._restore_sales([Sale(*row[:5], from_kopecks(row[5]), from_timestamp(row[6]))
+                                 for row in zip(sale_ids, book_ids, customer_ids, employee_ids,
+                                                quantities, total_kopecks, timestamps)])
+            return
+
+        self.sales.extend_columns(sale_ids, book_ids, customer_ids, employee_ids,
+                                  quantities, total_kopecks, timestamps)
+        self._sale_index.add_columns(sale_ids, {'book_id': book_ids, 'customer_id': customer_ids,
+                                                'employee_id': employee_ids})
+        self._add_to_time_index(sale_ids, timestamps, total_kopecks, quantities)
+        self._revenue_kopecks += sum(total_kopecks)
+        if len(sale_ids):
+            self.ids.observe('sale', max(sale_ids))
+            self._changes.mark_many('sales', sale_ids)
+
+    def _add_to_time_index(self, sale_ids, timestamps, total_kopecks, quantities) -> None:
+        """Пакетное добавление продаж в индекс времени и скользящие окна"""
+        self._time_index.add_many(sale_ids, timestamps, total_kopecks, quantities)
+        if len(timestamps) <= ROLLING_REBUILD_SIZE:
+            for counter in self._rolling.values():
+                for row in zip(timestamps, total_kopecks, quantities):
+                    counter.add(*row)
+            return
+
+        # Большой пакет (загрузка): окна заполняются только последними продажами
+        latest = self._time_index.latest()
+        for counter in self._rolling.values():
+            counter.clear()
+            for row in self._time_index.rows_since(latest - counter.minutes * counter.MINUTE):
+                counter.add(*row)
+
+    def _change_quantity(self, book: Book, delta: int) -> None:
+        """Изменение количества экземпляров книги с обновлением индексов"""
+        for capture in self._captures:
+            capture.preserve(book)
+        book.quantity += delta
+        self._book_index.update_quantity(book)
+        self._inventory_kopecks += to_kopecks(book.price) * delta
+        self._changes.mark('books', book.book_id)
+
+    def _apply_add_book(self, book: Book) -> Book:
+        """Добавление книги или пополнение существующей без сообщений
+
+        Возвращает книгу, которая хранится в магазине.
+        """
+        existing = self.books.get(book.book_id)
+        if existing is not None:
+            self._change_quantity(existing, book.quantity)
+            return existing
+        self._restore_book(book)
+        return book
+
+    def _apply_remove_book(self, book: Book, quantity: int) -> None:
+        """Списание экземпляров книги без проверок и сообщений"""
+        self._change_quantity(book, -quantity)
+        if book.quantity == 0:
+            del self.books[book.book_id]
+            self._book_index.remove(book)
+            self._changes.delete_book(book.book_id)
+
+    def _apply_sale(self, sale: Sale) -> None:
+        """Проведение продажи без проверок и сообщений"""
+        self._change_quantity(self.books[sale.book_id], -sale.quantity)
+        self._restore_sale(sale)
+
+    def _apply_sales(self, sales: List[Sale]) -> None:
+        """Проведение пакета продаж без проверок и сообщений"""
+        demand: Dict[int, int] = {}
+        for sale in sales:
+            demand[sale.book_id] = demand.get(sale.book_id, 0) + sale.quantity
+        for book_id, quantity in demand.items():
+            self._change_quantity(self.books[book_id], -quantity)
+        self._restore_sales(sales)
+
+    def _log(self, operation: str, **payload) -> None:
+        """Запись изменения в журнал, если он подключен"""
+        if self.journal is not None:
+            self._journal_seq = self.journal.append(operation, payload)
+
+    def reserve_ids(self, kind: str, count: int) -> range:
+        """Резервирование диапазона из count ID для пакетной загрузки или рабочего процесса
+
+        kind - 'book', 'employee', 'customer' или 'sale'. Зарезервированные
+        ID больше не выдаются, в том числе после восстановления из журнала
+        и снимков.
+        """
+        try:
+            with self._writing():
+                ids = self.ids.reserve(kind, count)
+                self._log('reserve_ids', kind=kind, stop=ids.stop)
+            return ids
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при резервировании ID: {e}")
 
     def add_book(self, book: Book) -> None:
         """Добавление книги в магазин"""
         try:
-            if book.book_id <= 0:
-                book.book_id = self._get_next_book_id()
+            with self._writing():
+                if book.book_id <= 0:
+                    book.book_id = self.ids.allocate('book')
 
-            if book.book_id in self.books:
-                self.books[book.book_id].quantity += book.quantity
-                print(
-                    f"Количество книги '{book.title}' увеличено. Теперь в наличии: {self.books[book.book_id].quantity}")
+                merged = book.book_id in self.books
+                stored = self._apply_add_book(book)
+                self._log('add_book', book=book.to_dict())
+
+            if merged:
+                self._emit('book_restocked', book_id=book.book_id, title=book.title,
+                           quantity=stored.quantity)
             else:
-                self.books[book.book_id] = book
-                if book.book_id >= self._next_book_id:
-                    self._next_book_id = book.book_id + 1
-                print(f"Книга '{book.title}' успешно добавлена с ID: {book.book_id}")
+                self._emit('book_added', book_id=book.book_id, title=book.title)
         except Exception as e:
             raise BookstoreError(f"Ошибка при добавлении книги: {e}")
 
     def remove_book(self, book_id: int, quantity: int = 1) -> None:
         """Удаление книги из магазина"""
         try:
-            if book_id not in self.books:
-                raise BookNotFoundError(f"Книга с ID {book_id} не найдена")
-
-            book = self.books[book_id]
-            if book.quantity < quantity:
-                raise InsufficientQuantityError(
-                    f"Недостаточно книг. В наличии: {book.quantity}, запрошено: {quantity}"
-                )
-
-            book.quantity -= quantity
-            if book.quantity == 0:
-                del self.books[book_id]
-                print(f"Книга '{book.title}' полностью удалена из магазина")
+            with self._stock_lock(book_id):
+                book = self.books.get(book_id)
+                if book is None:
+                    raise BookNotFoundError(f"Книга с ID {book_id} не найдена")
+
+                if book.quantity < quantity:
+                    raise InsufficientQuantityError(
+                        f"Недостаточно книг. В наличии: {book.quantity}, запрошено: {quantity}"
+                    )
+
+                with self._writing():
+                    self._apply_remove_book(book, quantity)
+                    self._log('remove_book', book_id=book_id, quantity=quantity)
+                remaining = book.quantity
+
+            if remaining == 0:
+                self._emit('book_depleted', book_id=book_id, title=book.title)
             else:
-                print(f"Удалено {quantity} экз. книги '{book.title}'. Осталось: {book.quantity}")
+                self._emit('book_removed', book_id=book_id, title=book.title,
+                           quantity=quantity, remaining=remaining)
 
         except (BookNotFoundError, InsufficientQuantityError):
             raise
@@ -89,64 +382,149 @@ class Bookstore:
     def sell_book(self, book_id: int, quantity: int, customer_id: int, employee_id: int) -> Sale:
         """Продажа книги клиенту"""
         try:
-            if book_id not in self.books:
-                raise BookNotFoundError(f"Книга с ID {book_id} не найдена")
-
             if customer_id not in self.customers:
                 raise CustomerNotFoundError(f"Клиент с ID {customer_id} не найден")
 
             if employee_id not in self.employees:
                 raise EmployeeNotFoundError(f"Сотрудник с ID {employee_id} не найден")
 
-            book = self.books[book_id]
-            if book.quantity < quantity:
-                raise InsufficientQuantityError(
-                    f"Недостаточно книг для продажи. В наличии: {book.quantity}"
-                )
+            with self._stock_lock(book_id):
+                book = self.books.get(book_id)
+                if book is None:
+                    raise BookNotFoundError(f"Книга с ID {book_id} не найдена")
+
+                if book.quantity < quantity:
+                    raise InsufficientQuantityError(
+                        f"Недостаточно книг для продажи. В наличии: {book.quantity}"
+                    )
+
+                total_price = book.price * quantity
+
+                # ID выделяется под блокировкой записи, чтобы продажи попадали
+                # в журнал продаж в порядке возрастания ID
+                with self._writing():
+                    sale = Sale(
+                        sale_id=self.ids.allocate('sale'),
+                        book_id=book_id,
+                        customer_id=customer_id,
+                        employee_id=employee_id,
+                        quantity=quantity,
+                        total_price=total_price
+                    )
+
+                    self._apply_sale(sale)
+                    self._log('sell_book', sale=sale.to_dict())
+
+            if self.events.enabled:
+                self._emit('book_sold', sale_id=sale.sale_id, book_id=book_id, title=book.title,
+                           quantity=quantity, total_price=total_price,
+                           customer=self.customers[customer_id].name,
+                           employee=self.employees[employee_id].name)
 
-            total_price = book.price * quantity
-            book.quantity -= quantity
+            return sale
 
-            sale = Sale(
-                sale_id=self._next_sale_id,
-                book_id=book_id,
-                customer_id=customer_id,
-                employee_id=employee_id,
-                quantity=quantity,
-                total_price=total_price
-            )
+        except (BookNotFoundError, CustomerNotFoundError, EmployeeNotFoundError, InsufficientQuantityError):
+            raise
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при продаже книги: {e}")
 
-            self.sales[self._next_sale_id] = sale
-            self._next_sale_id += 1
+    def sell_books_bulk(self, lines: Iterable[Tuple[int, int]], customer_id: int,
+                        employee_id: int) -> List[Sale]:
+        """Продажа нескольких книг одному клиенту по принципу "все или ничего"
 
-            customer = self.customers[customer_id]
-            employee = self.employees[employee_id]
+        lines - пары (ID книги, количество). Все строки проверяются до
+        изменения остатков; если хотя бы одна строка некорректна, ничего
+        не продается, пустой пакет отклоняется. Продажи получают непрерывный
+        диапазон ID и одну дату.
+        """
+        try:
+            lines = list(lines)
+            if not lines:
+                raise ValueError("Пакет продаж не может быть пустым")
 
-            print(f"Продажа успешно завершена: {quantity} экз. '{book.title}' "
-                  f"клиенту {customer.name} за {total_price} руб. "
-                  f"(Продавец: {employee.name})")
+            if customer_id not in self.customers:
+                raise CustomerNotFoundError(f"Клиент с ID {customer_id} не найден")
 
-            return sale
+            if employee_id not in self.employees:
+                raise EmployeeNotFoundError(f"Сотрудник с ID {employee_id} не найден")
+
+            # Блокировки полос берутся в порядке возрастания номеров,
+            # поэтому встречные пакетные продажи не приводят к взаимной блокировке
+            stripes = sorted({book_id % len(self._stock_locks) for book_id, _ in lines})
+            with ExitStack() as stack:
+                for stripe in stripes:
+                    stack.enter_context(self._stock_locks[stripe])
+
+                demand: Dict[int, int] = {}
+                books: Dict[int, Book] = {}
+                for number, (book_id, quantity) in enumerate(lines, 1):
+                    book = books.get(book_id)
+                    if book is None:
+                        book = self.books.get(book_id)
+                        if book is None:
+                            raise BookNotFoundError(f"Строка {number}: книга с ID {book_id} не найдена")
+                        books[book_id] = book
+
+                    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+                        raise ValueError(f"Строка {number}: количество должно быть положительным")
+
+                    demand[book_id] = demand.get(book_id, 0) + quantity
+                    if book.quantity < demand[book_id]:
+                        raise InsufficientQuantityError(
+                            f"Строка {number}: недостаточно книг '{book.title}' для продажи. "
+                            f"В наличии: {book.quantity}, всего запрошено: {demand[book_id]}"
+                        )
+
+                sale_date = datetime.now()
+                with self._writing():
+                    first_id = self.ids.reserve('sale', len(lines)).start
+                    sales = [
+                        Sale(
+                            sale_id=first_id + offset,
+                            book_id=book_id,
+                            customer_id=customer_id,
+                            employee_id=employee_id,
+                            quantity=quantity,
+                            total_price=books[book_id].price * quantity,
+                            sale_date=sale_date
+                        )
+                        for offset, (book_id, quantity) in enumerate(lines)
+                    ]
+
+                    self._apply_sales(sales)
+                    self._log('sell_books_bulk', sales=[sale.to_dict() for sale in sales])
+
+            if self.events.enabled:
+                self._emit('books_sold_bulk', first_sale_id=sales[0].sale_id, lines=len(sales),
+                           quantity=sum(demand.values()),
+                           total_price=sum(sale.total_price for sale in sales),
+                           customer=self.customers[customer_id].name,
+                           employee=self.employees[employee_id].name)
+
+            return sales
 
         except (BookNotFoundError, CustomerNotFoundError, EmployeeNotFoundError, InsufficientQuantityError):
             raise
         except Exception as e:
-            raise BookstoreError(f"Ошибка при продаже книги: {e}")
+            raise BookstoreError(f"Ошибка при продаже книг: {e}")
 
     def add_employee(self, employee: Employee) -> None:
         """Добавление сотрудника"""
         try:
-            if employee.emp_id <= 0:
-                employee.emp_id = self._get_next_emp_id()
+            with self._writing():
+                if employee.emp_id <= 0:
+                    employee.emp_id = self.ids.allocate('employee')
+
+                exists = employee.emp_id in self.employees
+                if not exists:
+                    self._restore_employee(employee)
+                    self._log('add_employee', employee=employee.to_dict())
 
-            if employee.emp_id in self.employees:
-                print(f"Сотрудник с ID {employee.emp_id} уже существует")
+            if exists:
+                self._emit('employee_exists', emp_id=employee.emp_id)
                 return
 
-            self.employees[employee.emp_id] = employee
-            if employee.emp_id >= self._next_emp_id:
-                self._next_emp_id = employee.emp_id + 1
-            print(f"Сотрудник {employee.name} успешно добавлен с ID: {employee.emp_id}")
+            self._emit('employee_added', emp_id=employee.emp_id, name=employee.name)
 
         except Exception as e:
             raise BookstoreError(f"Ошибка при добавлении сотрудника: {e}")
@@ -154,83 +532,300 @@ class Bookstore:
     def add_customer(self, customer: Customer) -> None:
         """Добавление клиента"""
         try:
-            if customer.cust_id <= 0:
-                customer.cust_id = self._get_next_cust_id()
+            with self._writing():
+                if customer.cust_id <= 0:
+                    customer.cust_id = self.ids.allocate('customer')
 
-            if customer.cust_id in self.customers:
-                print(f"Клиент с ID {customer.cust_id} уже существует")
+                exists = customer.cust_id in self.customers
+                if not exists:
+                    self._restore_customer(customer)
+                    self._log('add_customer', customer=customer.to_dict())
+
+            if exists:
+                self._emit('customer_exists', cust_id=customer.cust_id)
                 return
 
-            self.customers[customer.cust_id] = customer
-            if customer.cust_id >= self._next_cust_id:
-                self._next_cust_id = customer.cust_id + 1
-            print(f"Клиент {customer.name} успешно добавлен с ID: {customer.cust_id}")
+            self._emit('customer_added', cust_id=customer.cust_id, name=customer.name)
 
         except Exception as e:
             raise BookstoreError(f"Ошибка при добавлении клиента: {e}")
 
     def search_books(self, **kwargs) -> List[Book]:
-        """Поиск книг по различным критериям"""
-        try:
-            results = list(self.books.values())
-
-            if 'title' in kwargs and kwargs['title']:
-                results = [b for b in results if kwargs['title'].lower() in b.title.lower()]
-            if 'author' in kwargs and kwargs['author']:
-                results = [b for b in results if kwargs['author'].lower() in b.author.lower()]
-            if 'genre' in kwargs and kwargs['genre']:
-                results = [b for b in results if kwargs['genre'].lower() in b.genre.lower()]
-            if 'max_price' in kwargs and kwargs['max_price']:
-                results = [b for b in results if b.price <= kwargs['max_price']]
+        """Поиск книг по различным критериям
 
-            return results
+        Текстовые критерии: title, author, genre (поиск подстроки).
+        Диапазоны: min_price/max_price, year_from/year_to,
+        min_quantity/max_quantity (границы включаются).
+        """
+        try:
+            if not self.concurrent:
+                return self._search_books(kwargs)
+
+            for _ in range(SEARCH_RETRIES):
+                version = self._version
+                if version % 2 == 0:
+                    try:
+                        results = self._search_books(kwargs)
+                    except (RuntimeError, KeyError):
+                        # Индекс изменился во время обхода
+                        results = None
+                    if results is not None and self._version == version:
+                        return results
+                time.sleep(0)
+
+            with self._write_lock:
+                return self._search_books(kwargs)
 
         except Exception as e:
             raise BookstoreError(f"Ошибка при поиске книг: {e}")
 
+    def _search_books(self, criteria: Dict) -> List[Book]:
+        """Поиск книг по индексам без синхронизации"""
+        book_ids = self._book_index.search(**criteria)
+        if book_ids is None:
+            return list(self.books.values())
+        return [self.books[book_id] for book_id in self._book_index.ordered(book_ids)]
+
     def get_sales_by_customer(self, customer_id: int) -> List[Sale]:
         """Получение всех продаж для конкретного клиента"""
         try:
-            return [sale for sale in self.sales.values() if sale.customer_id == customer_id]
+            return [self.sales[sale_id] for sale_id in self._sale_index.get('customer_id', customer_id)]
         except Exception as e:
             raise BookstoreError(f"Ошибка при получении продаж клиента: {e}")
 
     def get_sales_by_employee(self, employee_id: int) -> List[Sale]:
         """Получение всех продаж для конкретного сотрудника"""
         try:
-            return [sale for sale in self.sales.values() if sale.employee_id == employee_id]
+            return [self.sales[sale_id] for sale_id in self._sale_index.get('employee_id', employee_id)]
         except Exception as e:
             raise BookstoreError(f"Ошибка при получении продаж сотрудника: {e}")
 
+    def get_sales_by_book(self, book_id: int) -> List[Sale]:
+        """Получение всех продаж конкретной книги"""
+        try:
+            return [self.sales[sale_id] for sale_id in self._sale_index.get('book_id', book_id)]
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при получении продаж книги: {e}")
+
+    def get_sales_between(self, start: datetime, end: datetime) -> List[Sale]:
+        """Продажи за период start <= дата продажи < end в порядке времени"""
+        try:
+            with self._write_lock:
+                sale_ids = self._time_index.keys_between(to_timestamp(start), to_timestamp(end))
+                return [self.sales[sale_id] for sale_id in sale_ids]
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при получении продаж за период: {e}")
+
+    def _period_totals(self, start: datetime, end: datetime) -> Tuple[int, int]:
+        """Выручка в копейках и количество экземпляров за период start <= t < end"""
+        return self._time_index.totals_between(to_timestamp(start), to_timestamp(end))
+
+    def get_sales_series(self, start: datetime, end: datetime,
+                         unit: str = 'day') -> List[Tuple[datetime, float, int]]:
+        """Выручка и количество экземпляров по часам, дням или месяцам периода
+
+        unit - 'hour', 'day' или 'month'. Возвращает тройки (начало
+        интервала, выручка, количество); крайние интервалы учитывают
+        только продажи внутри периода.
+        """
+        try:
+            series = []
+            with self._write_lock:
+                for label, low, high in time_buckets(start, end, unit):
+                    kopecks, units = self._period_totals(low, high)
+                    series.append((label, from_kopecks(kopecks), units))
+            return series
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при построении ряда продаж: {e}")
+
+    def get_rolling_totals(self) -> Dict[str, Tuple[float, int]]:
+        """Выручка и количество экземпляров за последний час и сутки
+
+        Окна отсчитываются от текущего момента с точностью до минуты.
+        """
+        try:
+            now = to_timestamp(datetime.now())
+            with self._write_lock:
+                totals = {name: counter.totals(now) for name, counter in self._rolling.items()}
+            return {name: (from_kopecks(kopecks), units) for name, (kopecks, units) in totals.items()}
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при расчете итогов за скользящие окна: {e}")
+
     def get_total_revenue(self) -> float:
         """Получение общей выручки магазина"""
         try:
-            return sum(sale.total_price for sale in self.sales.values())
+            return from_kopecks(self._revenue_kopecks)
         except Exception as e:
             raise BookstoreError(f"Ошибка при расчете выручки: {e}")
 
     def get_inventory_value(self) -> float:
         """Получение общей стоимости инвентаря"""
         try:
-            return sum(book.price * book.quantity for book in self.books.values())
+            return from_kopecks(self._inventory_kopecks)
         except Exception as e:
             raise BookstoreError(f"Ошибка при расчете стоимости инвентаря: {e}")
 
+    def verify_totals(self) -> bool:
+        """Полный пересчет выручки и стоимости инвентаря
+
+        Сравнивает накопленные итоги с суммами по всем продажам и книгам.
+        При расхождении итоги заменяются пересчитанными значениями.
+        Возвращает True, если расхождений не было.
+        """
+        try:
+            revenue = self.sales.total_revenue_kopecks()
+            inventory = sum(to_kopecks(book.price) * book.quantity for book in self.books.values())
+
+            consistent = (revenue == self._revenue_kopecks and
+                          inventory == self._inventory_kopecks)
+            self._revenue_kopecks = revenue
+            self._inventory_kopecks = inventory
+            return consistent
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при пересчете итогов: {e}")
+
+    @contextmanager
+    def _full_snapshot(self, filename: str):
+        """Сохраненный полный снимок становится базой дельта-снимков
+
+        Снимок записывается под блокировкой записи, поэтому счетчики ID
+        базы совпадают с данными файла: изменения других потоков ждут
+        окончания записи и попадают в следующий дельта-снимок. Снимок
+        становится базой после записи, когда известен его отпечаток. При
+        ошибке отслеживание прекращается до следующего полного снимка.
+        Сохранять, не останавливая продажи, позволяет background_snapshot.
+        """
+        with self._write_lock:
+            self._changes.clear(self.ids.state())
+            try:
+                yield
+                self._changes.snapshot = snapshot_digest(filename)
+            except BaseException:
+                self._changes.reset()
+                raise
+
+    def _loaded_snapshot(self, filename: str) -> None:
+        """Загруженный полный снимок становится базой дельта-снимков"""
+        self._changes.clear(self.ids.state(), snapshot_digest(filename))
+
     def save_to_json(self, filename: str) -> None:
         """Сохранение данных в JSON файл"""
-        self.file_ops.save_to_json(self, filename)
+        with self._full_snapshot(filename):
+            self.file_ops.save_to_json(self, filename)
 
-    def load_from_json(self, filename: str) -> None:
+    def load_from_json(self, filename: str, streaming: bool = False, progress=None) -> None:
         """Загрузка данных из JSON файла"""
-        self.file_ops.load_from_json(self, filename)
+        self.file_ops.load_from_json(self, filename, streaming, progress)
+        self._loaded_snapshot(filename)
+        self._after_load()
 
-    def save_to_xml(self, filename: str) -> None:
+    def save_to_xml(self, filename: str, streaming: bool = False) -> None:
         """Сохранение данных в XML файл"""
-        self.file_ops.save_to_xml(self, filename)
+        with self._full_snapshot(filename):
+            self.file_ops.save_to_xml(self, filename, streaming)
 
-    def load_from_xml(self, filename: str) -> None:
+    def load_from_xml(self, filename: str, progress=None) -> None:
         """Загрузка данных из XML файла"""
-        self.file_ops.load_from_xml(self, filename)
+        self.file_ops.load_from_xml(self, filename, progress)
+        self._loaded_snapshot(filename)
+        self._after_load()
+
+    def save_to_binary(self, filename: str) -> None:
+        """Сохранение данных в двоичный колоночный файл"""
+        with self._full_snapshot(filename):
+            self.file_ops.save_to_binary(self, filename)
+
+    def load_from_binary(self, filename: str) -> None:
+        """Загрузка данных из двоичного колоночного файла"""
+        self.file_ops.load_from_binary(self, filename)
+        self._loaded_snapshot(filename)
+        self._after_load()
+
+    def save_partitioned(self, directory: str, workers: Optional[int] = None,
+                         codec: Optional[str] = None) -> None:
+        """Сохранение данных в каталог секций с манифестом
+
+        Секции записываются параллельно в workers процессах (по умолчанию -
+        число ядер); codec - необязательное сжатие секций ('gzip', 'bz2', 'xz').
+        """
+        with self._full_snapshot(directory):
+            self.file_ops.save_partitioned(self, directory, workers, codec)
+
+    def load_partitioned(self, directory: str, workers: Optional[int] = None, progress=None) -> None:
+        """Загрузка данных из каталога секций, разбираемых параллельно в workers процессах"""
+        self.file_ops.load_partitioned(self, directory, workers, progress)
+        self._loaded_snapshot(directory)
+        self._after_load()
+
+    def save_delta(self, filename: str) -> None:
+        """Сохранение изменений после последнего снимка в дельта-снимок
+
+        Время сохранения пропорционально числу измененных сущностей.
+        Требуется базовый снимок: магазин должен быть сохранен или загружен
+        полным снимком.
+        """
+        with self._writing():
+            self.file_ops.save_delta(self, filename)
+
+    def pending_changes(self) -> int:
+        """Число сущностей, измененных после последнего снимка"""
+        return len(self._changes)
+
+    def load_with_deltas(self, base: str, deltas: Iterable[str] = ()) -> None:
+        """Загрузка полного снимка base и применение дельта-снимков по порядку
+
+        Формат base определяется по расширению: .json, .xml или .bin, в том
+        числе сжатых снимков (.json.gz и т.п.); каталог загружается как
+        секционированный снимок.
+        """
+        if os.path.isdir(base):
+            loader = 'load_partitioned'
+        else:
+            loader = SNAPSHOT_LOADERS.get(snapshot_extension(base))
+        if loader is None:
+            raise FileOperationError(f"Неизвестный формат снимка: {base}")
+        getattr(self.file_ops, loader)(self, base)
+        self._loaded_snapshot(base)
+        for delta in deltas:
+            self.file_ops.load_delta(self, delta)
+        self._after_load()
+
+    def import_csv(self, filename: str, entity: str = 'books', reject_file: Optional[str] = None,
+                   batch_size: int = BATCH_SIZE, delimiter: str = ',', progress=None,
+                   pause_gc: bool = False) -> ImportReport:
+        """Потоковый импорт книг, сотрудников или клиентов из CSV файла
+
+        Строки с ошибками записываются в файл отклоненных строк, остальные
+        получают новые ID. pause_gc=True отключает сборщик мусора процесса
+        на время импорта. Возвращает итоги импорта.
+        """
+        try:
+            return self.file_ops.import_csv(self, filename, entity, reject_file,
+                                            batch_size, delimiter, progress, pause_gc)
+        finally:
+            self._after_load()
+
+    def _after_load(self) -> None:
+        """Синхронизация журнала после загрузки или импорта данных из файла
+
+        Загруженное состояние не выражается записями журнала, поэтому при
+        подключенном журнале сразу сохраняется новая контрольная точка.
+        """
+        if self.journal is not None:
+            self._journal_seq = self.journal.seq
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """Сохранение контрольной точки и очистка журнала"""
+        if self.journal is None:
+            raise BookstoreError("Журнал изменений не подключен")
+        try:
+            with self._writing():
+                compact(self, os.path.dirname(self.journal.path))
+        except BookstoreError:
+            raise
+        except Exception as e:
+            raise FileOperationError(f"Ошибка при сохранении контрольной точки: {e}")
 
     def display_info(self) -> None:
         """Отображение информации о магазине"""
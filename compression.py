@@ -0,0 +1,190 @@
+"""
+Сжатие файлов снимков магазина
+
+При записи кодек выбирается по расширению файла (.gz, .bz2, .xz), при
+чтении - по сигнатуре в начале файла, поэтому сжатый снимок читается
+независимо от имени. Данные сжимаются по мере записи, без построения
+всего документа в памяти.
+
+В блочном режиме (threads > 1) поток записи делится на блоки по
+BLOCK_SIZE байт, которые сжимаются независимо в пуле потоков (zlib, bz2 и
+lzma отпускают GIL на время сжатия) и записываются в файл по порядку.
+Каждый блок - отдельный член gzip или поток bz2/xz; модули gzip, bz2 и
+lzma читают такие склеенные потоки как один файл.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, Optional
+
+# Размер блока, сжимаемого одним потоком в блочном режиме
+BLOCK_SIZE = 4 << 20
+
+# Сколько сигнатурных байт читается для определения кодека
+MAGIC_SIZE = 6
+
+
+class Codec:
+    """Кодек сжатия: расширение файла, сигнатура и уровень сжатия по умолчанию"""
+
+    def __init__(self, name: str, extension: str, magic: bytes, level: int,
+                 open_file: Callable[[str, str, int], BinaryIO], compress: Callable[[bytes, int], bytes]):
+        self.name = name
+        self.extension = extension
+        self.magic = magic
+        self.level = level
+        self._open = open_file
+        self._compress = compress
+
+    def open(self, filename: str, mode: str, level: Optional[int] = None) -> BinaryIO:
+        """Сжимающий (mode='wb') или распаковывающий (mode='rb') файл"""
+        return self._open(filename, mode, self.level if level is None else level)
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        """Сжатие блока в самостоятельный член gzip или поток bz2/xz"""
+        return self._compress(data, self.level if level is None else level)
+
+    def __repr__(self):
+        return f"Codec({self.name!r})"
+
+
+# mtime=0: одинаковые данные дают одинаковый файл gzip
+CODECS: Dict[str, Codec] = {
+    'gzip': Codec('gzip', '.gz', b'\x1f\x8b', 6,
+                  lambda filename, mode, level: gzip.GzipFile(filename, mode, level, mtime=0),
+                  lambda data, level: gzip.compress(data, level, mtime=0)),
+    'bz2': Codec('bz2', '.bz2', b'BZh', 9,
+                 lambda filename, mode, level: bz2.BZ2File(filename, mode, compresslevel=level),
+                 bz2.compress),
+    'xz': Codec('xz', '.xz', b'\xfd7zXZ\x00', 3,
+                lambda filename, mode, level: lzma.LZMAFile(filename, mode,
+                                                            preset=level if 'w' in mode else None),
+                lambda data, level: lzma.compress(data, preset=level)),
+}
+
+
+def codec_for(filename: str) -> Optional[Codec]:
+    """Кодек по расширению файла; None для файла без сжатия"""
+    extension = os.path.splitext(filename)[1].lower()
+    for codec in CODECS.values():
+        if codec.extension == extension:
+            return codec
+    return None
+
+
+def snapshot_extension(filename: str) -> str:
+    """Расширение формата снимка без расширения сжатия: .json для data.json.gz"""
+    if codec_for(filename) is not None:
+        filename = os.path.splitext(filename)[0]
+    return os.path.splitext(filename)[1].lower()
+
+
+def detect(head: bytes) -> Optional[Codec]:
+    """Кодек по сигнатуре в начале файла; None для файла без сжатия"""
+    for codec in CODECS.values():
+        if head.startswith(codec.magic):
+            return codec
+    return None
+
+
+def is_compressed(filename: str) -> bool:
+    """Сжат ли файл (по сигнатуре)"""
+    with open(filename, 'rb') as f:
+        return detect(f.read(MAGIC_SIZE)) is not None
+
+
+class _ParallelWriter(io.BufferedIOBase):
+    """Поток записи, сжимающий блоки независимо в пуле потоков
+
+    Одновременно сжимается не больше 2 * threads блоков, поэтому в памяти
+    находится ограниченная часть данных.
+    """
+
+    def __init__(self, raw: BinaryIO, codec: Codec, threads: int,
+                 level: Optional[int] = None, block_size: Optional[int] = None):
+        self._raw = raw
+        self._codec = codec
+        self._level = level
+        # BLOCK_SIZE читается при создании, чтобы действовала его настройка
+        self._block_size = block_size or BLOCK_SIZE
+        self._buffer = bytearray()
+        self._pending = deque()
+        self._window = 2 * threads
+        self._pool = ThreadPoolExecutor(threads, thread_name_prefix='compress')
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            self._submit(bytes(self._buffer[:self._block_size]))
+            del self._buffer[:self._block_size]
+        return len(data)
+
+    def _submit(self, block: bytes) -> None:
+        """Передача блока на сжатие; запись уже сжатых блоков по порядку"""
+        self._pending.append(self._pool.submit(self._codec.compress, block, self._level))
+        while len(self._pending) > self._window:
+            self._raw.write(self._pending.popleft().result())
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self._buffer or not self._pending:
+                # Пустой файл тоже записывается как корректный сжатый поток
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            while self._pending:
+                self._raw.write(self._pending.popleft().result())
+        finally:
+            for future in self._pending:
+                future.cancel()
+            self._pool.shutdown()
+            self._raw.close()
+            super().close()
+
+
+def open_write(filename: str, threads: int = 1, level: Optional[int] = None) -> BinaryIO:
+    """Двоичный файл для записи снимка, сжимаемый по расширению имени
+
+    При threads > 1 используется блочное сжатие в пуле из threads потоков.
+    """
+    codec = codec_for(filename)
+    if codec is None:
+        return open(filename, 'wb')
+    if threads > 1:
+        return _ParallelWriter(open(filename, 'wb'), codec, threads, level)
+    return codec.open(filename, 'wb', level)
+
+
+def open_read(filename: str) -> BinaryIO:
+    """Двоичный файл снимка для чтения; сжатый файл распаковывается по ходу чтения"""
+    with open(filename, 'rb') as f:
+        codec = detect(f.read(MAGIC_SIZE))
+    if codec is None:
+        return open(filename, 'rb')
+    return codec.open(filename, 'rb')
+
+
+def open_text(filename: str, mode: str = 'r', threads: int = 1, errors: Optional[str] = None,
+              buffering: int = -1):
+    """Текстовый файл снимка в UTF-8 для чтения ('r') или записи ('w')
+
+    Файл без сжатия открывается обычным open().
+    """
+    if mode == 'w':
+        if codec_for(filename) is None:
+            return open(filename, 'w', encoding='utf-8', errors=errors, buffering=buffering)
+        stream = open_write(filename, threads)
+    else:
+        if not is_compressed(filename):
+            return open(filename, 'r', encoding='utf-8', errors=errors, buffering=buffering)
+        stream = open_read(filename)
+    return io.TextIOWrapper(stream, encoding='utf-8', errors=errors)
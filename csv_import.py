@@ -0,0 +1,313 @@
+"""
+Потоковый импорт каталога из CSV
+
+Файл читается пакетами по batch_size строк. Каждый пакет проверяется
+по колонкам: значения колонки приводятся к нужному типу и проверяются
+одним проходом, а текущий год для проверки года издания определяется
+один раз на весь импорт. Объекты создаются из проверенных значений без
+повторной валидации, ID выделяются одним диапазоном на пакет, а пакет
+размещается в магазине пакетными методами _restore_*.
+
+Записи с ошибками не прерывают импорт: они записываются в файл
+отклоненных строк вместе с номером записи и текстом ошибки.
+"""
+
+import csv
+import gc
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models import Book, Employee, Customer
+from exceptions import FileOperationError
+
+# Число строк, которые проверяются и размещаются за один раз; каждый пакет
+# пересортировывает числовые индексы книг, поэтому пакеты крупные
+BATCH_SIZE = 100_000
+
+# Колонки файла отклоненных строк, добавляемые перед исходными:
+# номер записи в файле (без переводов строк внутри полей совпадает с номером строки)
+# и текст ошибки
+REJECT_COLUMNS = ['record', 'error']
+
+# Наибольшая цена книги в рублях: суммы в копейках должны помещаться
+# в 64-битные колонки журнала продаж
+MAX_PRICE = 1_000_000_000
+
+
+class ImportReport:
+    """Итоги импорта: число строк, импортированных и отклоненных, время"""
+
+    def __init__(self, entity: str, rows: int, imported: int, seconds: float,
+                 first_id: Optional[int], reject_file: Optional[str]):
+        self.entity = entity
+        self.rows = rows
+        self.imported = imported
+        self.seconds = seconds
+        self.first_id = first_id
+        self.reject_file = reject_file
+
+    @property
+    def rejected(self) -> int:
+        """Число отклоненных строк"""
+        return self.rows - self.imported
+
+    @property
+    def rows_per_second(self) -> float:
+        """Скорость импорта в строках в секунду"""
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (f"Импорт ({self.entity}): строк {self.rows}, импортировано {self.imported}, "
+                f"отклонено {self.rejected} за {self.seconds:.2f} с "
+                f"({self.rows_per_second:.0f} строк/с)")
+
+
+def _text(values: List[str], message: str, errors: Dict[int, str]) -> List[str]:
+    """Колонка строк без пробелов по краям; пустые значения отмечаются ошибкой"""
+    values = [value.strip() for value in values]
+    for row, value in enumerate(values):
+        if not value:
+            errors.setdefault(row, message)
+    return values
+
+
+def _numbers(values: List[str], cast: Callable, message: str, errors: Dict[int, str]) -> List:
+    """Колонка чисел; нечисловые значения отмечаются ошибкой и заменяются на None"""
+    numbers = []
+    append = numbers.append
+    for row, value in enumerate(values):
+        try:
+            append(cast(value))
+        except ValueError:
+            errors.setdefault(row, message)
+            append(None)
+    return numbers
+
+
+def _require(values: List, valid: Callable, message: str, errors: Dict[int, str]) -> None:
+    """Отметка ошибкой значений колонки, не прошедших проверку valid"""
+    for row, value in enumerate(values):
+        if value is not None and not valid(value):
+            errors.setdefault(row, message)
+
+
+def _check_books(columns: Dict[str, List[str]], errors: Dict[int, str], year: int) -> List[List]:
+    """Проверка колонок книг в порядке проверок Book._validate_data"""
+    titles = _text(columns['title'], "Название книги не может быть пустым", errors)
+    authors = _text(columns['author'], "Автор не может быть пустым", errors)
+    genres = _text(columns['genre'], "Жанр не может быть пустым", errors)
+    prices = _numbers(columns['price'], float, "Неверная цена", errors)
+    _require(prices, lambda price: price > 0, "Цена должна быть положительной", errors)
+    _require(prices, lambda price: math.isfinite(price) and price <= MAX_PRICE, "Неверная цена", errors)
+    quantities = _numbers(columns['quantity'], int, "Неверное количество", errors)
+    _require(quantities, lambda quantity: quantity >= 0, "Количество не может быть отрицательным", errors)
+    years = _numbers(columns['year'], int, "Неверный год издания", errors)
+    _require(years, lambda value: 1000 <= value <= year, "Неверный год издания", errors)
+    return [titles, authors, genres, prices, quantities, years]
+
+
+def _check_employees(columns: Dict[str, List[str]], errors: Dict[int, str], year: int) -> List[List]:
+    """Проверка колонок сотрудников в порядке проверок Employee._validate_data"""
+    names = _text(columns['name'], "Имя сотрудника не может быть пустым", errors)
+    positions = _text(columns['position'], "Должность не может быть пустой", errors)
+    salaries = _numbers(columns['salary'], float, "Неверная зарплата", errors)
+    _require(salaries, lambda salary: salary >= 0, "Зарплата не может быть отрицательной", errors)
+    _require(salaries, math.isfinite, "Неверная зарплата", errors)
+    return [names, positions, salaries]
+
+
+def _check_customers(columns: Dict[str, List[str]], errors: Dict[int, str], year: int) -> List[List]:
+    """Проверка колонок клиентов в порядке проверок Customer._validate_data"""
+    names = _text(columns['name'], "Имя клиента не может быть пустым", errors)
+    emails = [value.strip() for value in columns['email']]
+    _require(emails, lambda email: '@' in email, "Неверный формат email", errors)
+    phones = _text(columns['phone'], "Телефон не может быть пустым", errors)
+    return [names, emails, phones]
+
+
+# Импортируемые сущности: колонки CSV, проверка, модель, вид ID и метод размещения
+ENTITIES = {
+    'books': (('title', 'author', 'genre', 'price', 'quantity', 'year'),
+              _check_books, Book, 'book', '_restore_books'),
+    'employees': (('name', 'position', 'salary'),
+                  _check_employees, Employee, 'employee', '_restore_employees'),
+    'customers': (('name', 'email', 'phone'),
+                  _check_customers, Customer, 'customer', '_restore_customers'),
+}
+
+
+# Число импортов, выполняемых с отключенным сборщиком, и состояние
+# сборщика до первого из них
+_paused_lock = threading.Lock()
+_paused_count = 0
+_paused_enabled = False
+
+
+@contextmanager
+def _collector_paused(pause: bool = True):
+    """Отключение циклического сборщика мусора на время импорта
+
+    Импорт создает миллионы объектов без циклических ссылок, и сборщик,
+    запускаемый по числу новых объектов, многократно обходит уже
+    размещенные данные впустую. Сборщик отключается для всего процесса,
+    поэтому только по явному запросу (pause=True). Одновременные импорты
+    учитываются счетчиком: прежнее состояние сборщика восстанавливает
+    последний завершившийся импорт.
+    """
+    global _paused_count, _paused_enabled
+    if not pause:
+        yield
+        return
+
+    with _paused_lock:
+        if _paused_count == 0:
+            _paused_enabled = gc.isenabled()
+            gc.disable()
+        _paused_count += 1
+    try:
+        yield
+    finally:
+        with _paused_lock:
+            _paused_count -= 1
+            if _paused_count == 0 and _paused_enabled:
+                gc.enable()
+
+
+def default_reject_file(filename: str) -> str:
+    """Имя файла отклоненных строк рядом с импортируемым файлом"""
+    return os.path.splitext(filename)[0] + '.rejects.csv'
+
+
+class _Rejects:
+    """Файл отклоненных строк; создается при первой отклоненной строке"""
+
+    def __init__(self, filename: str, header: List[str], delimiter: str):
+        self.filename = filename
+        self.header = header
+        self.delimiter = delimiter
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, record: int, error: str, row: List[str]) -> None:
+        if self._writer is None:
+            self._file = open(self.filename, 'w', encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file, delimiter=self.delimiter)
+            self._writer.writerow(REJECT_COLUMNS + self.header)
+        self._writer.writerow([record, error] + row)
+        self.count += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+def _import_batch(bookstore, entity: str, rows: List[List[str]], first_record: int,
+                  positions: List[int], width: int, year: int,
+                  rejects: _Rejects) -> Tuple[Optional[int], int]:
+    """Проверка и размещение одного пакета
+
+    Возвращает первый выделенный ID (None, если строк без ошибок нет) и
+    число размещенных строк.
+    """
+    fields, check, model, kind, restore = ENTITIES[entity]
+
+    errors: Dict[int, str] = {}
+    blanks = set()
+    checked = rows
+    if any(len(row) != width for row in rows):
+        blank = [''] * width
+        checked = list(rows)
+        for number, row in enumerate(rows):
+            if not row:
+                blanks.add(number)
+            elif len(row) != width:
+                errors[number] = f"Неверное число полей: {len(row)} вместо {width}"
+            else:
+                continue
+            checked[number] = blank
+
+    columns = {field: [row[position] for row in checked] for field, position in zip(fields, positions)}
+    values = check(columns, errors, year)
+    for number in blanks:
+        del errors[number]
+
+    for number in sorted(errors):
+        rejects.write(first_record + number, errors[number], rows[number])
+
+    if errors or blanks:
+        skipped = blanks.union(errors)
+        valid = [row for number, row in enumerate(zip(*values)) if number not in skipped]
+    else:
+        valid = list(zip(*values))
+    if not valid:
+        return None, 0
+
+    build = model.from_checked
+    with bookstore._writing():
+        first_id = bookstore.ids.reserve(kind, len(valid)).start
+        getattr(bookstore, restore)([build(entity_id, *row)
+                                     for entity_id, row in enumerate(valid, first_id)])
+    return first_id, len(valid)
+
+
+def import_csv(bookstore, filename: str, entity: str = 'books', reject_file: Optional[str] = None,
+               batch_size: int = BATCH_SIZE, delimiter: str = ',', progress=None,
+               pause_gc: bool = False) -> ImportReport:
+    """Потоковый импорт книг, сотрудников или клиентов из CSV файла
+
+    Первая запись файла - заголовок с именами колонок (для книг: title,
+    author, genre, price, quantity, year; для сотрудников: name, position,
+    salary; для клиентов: name, email, phone); лишние колонки пропускаются,
+    пустые строки не учитываются. Отклоненные записи с номером записи и
+    текстом ошибки сохраняются в reject_file (по умолчанию рядом с файлом,
+    с суффиксом .rejects.csv). progress(entity, rows) вызывается после
+    каждого пакета. pause_gc=True отключает циклический сборщик мусора
+    процесса на время импорта.
+    """
+    if entity not in ENTITIES:
+        raise FileOperationError(f"Неизвестный вид импортируемых данных: {entity}")
+    fields = ENTITIES[entity][0]
+
+    start = time.perf_counter()
+    # Год определяется один раз, а не при проверке каждой книги
+    year = datetime.now().year
+    with _collector_paused(pause_gc), open(filename, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = [name.strip() for name in next(reader, [])]
+        missing = [field for field in fields if field not in header]
+        if missing:
+            raise FileOperationError(f"В заголовке CSV нет колонок: {', '.join(missing)}")
+        positions = [header.index(field) for field in fields]
+
+        rejects = _Rejects(reject_file or default_reject_file(filename), header, delimiter)
+        # Заголовок - запись 1
+        record = 2
+        imported = 0
+        first_id = None
+        try:
+            while True:
+                rows = list(islice(reader, batch_size))
+                if not rows:
+                    break
+
+                batch_first, batch_imported = _import_batch(bookstore, entity, rows, record, positions,
+                                                            len(header), year, rejects)
+                if first_id is None:
+                    first_id = batch_first
+                imported += batch_imported
+                record += len(rows)
+                if progress is not None:
+                    progress(entity, imported + rejects.count)
+        finally:
+            rejects.close()
+
+    return ImportReport(entity, imported + rejects.count, imported,
+                        time.perf_counter() - start, first_id,
+                        rejects.filename if rejects.count else None)
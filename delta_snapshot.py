@@ -0,0 +1,168 @@
+"""
+Инкрементальные (дельта) снимки данных магазина
+
+Магазин отмечает в ChangeTracker сущности, добавленные, измененные или
+удаленные после последнего полного снимка (сохранения или загрузки).
+Дельта-снимок - небольшой JSON файл только с этими сущностями, поэтому
+его сохранение занимает время, пропорциональное объему изменений.
+Каждый сохраненный дельта-снимок становится базой для следующего.
+
+Цепочка восстанавливается загрузкой полного снимка и применением
+дельта-снимков по порядку. Каждый дельта-снимок хранит отпечаток полного
+снимка цепочки (SHA-256 файла или манифеста секционированного снимка) и
+свой номер в цепочке, а также счетчики ID базы. Снимок применяется только
+к магазину, загруженному из того же полного снимка и всех предыдущих
+звеньев, поэтому снимок другой цепочки или пропущенное звено отклоняются,
+даже если ID с тех пор не выдавались.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional, Set
+
+import compression
+from models import Book, Employee, Customer, Sale
+from partitioned_snapshot import MANIFEST
+from exceptions import BookstoreError, FileOperationError
+
+FORMAT = 'bookstore-delta'
+
+# Раздел -> (модель, атрибут магазина, метод пакетного размещения)
+SECTIONS = {
+    'books': (Book, 'books', '_restore_books'),
+    'employees': (Employee, 'employees', '_restore_employees'),
+    'customers': (Customer, 'customers', '_restore_customers'),
+    'sales': (Sale, 'sales', '_restore_sales'),
+}
+
+
+class ChangeTracker:
+    """Ключи сущностей, измененных после последнего полного снимка
+
+    Пока базы нет (магазин еще не сохранялся и не загружался, или данные
+    были очищены), изменения не отмечаются: следующим может быть только
+    полный снимок.
+    """
+
+    def __init__(self):
+        self.changed: Dict[str, Set[int]] = {section: set() for section in SECTIONS}
+        # Удаляться могут только книги (при списании последнего экземпляра)
+        self.deleted_books: Set[int] = set()
+        # Счетчики ID магазина в момент сохранения базы
+        self.base: Optional[Dict[str, int]] = None
+        # Отпечаток полного снимка цепочки (известен после записи файла)
+        self.snapshot: Optional[str] = None
+        # Число дельта-снимков цепочки, сохраненных или примененных после полного
+        self.sequence = 0
+
+    def mark(self, section: str, key: int) -> None:
+        """Отметка добавленной или измененной сущности"""
+        if self.base is not None:
+            self.changed[section].add(key)
+            if section == 'books':
+                self.deleted_books.discard(key)
+
+    def mark_many(self, section: str, keys) -> None:
+        """Отметка пакета добавленных сущностей"""
+        if self.base is not None:
+            self.changed[section].update(keys)
+            if section == 'books' and self.deleted_books:
+                self.deleted_books.difference_update(self.changed[section])
+
+    def delete_book(self, book_id: int) -> None:
+        """Отметка удаленной книги"""
+        if self.base is not None:
+            self.changed['books'].discard(book_id)
+            self.deleted_books.add(book_id)
+
+    def clear(self, base: Optional[Dict[str, int]], snapshot: Optional[str] = None) -> None:
+        """Начало отслеживания относительно нового полного снимка"""
+        for keys in self.changed.values():
+            keys.clear()
+        self.deleted_books.clear()
+        self.base = base
+        self.snapshot = snapshot
+        self.sequence = 0
+
+    def advance(self, base: Dict[str, int], sequence: int) -> None:
+        """Начало отслеживания относительно дельта-снимка с номером sequence"""
+        snapshot = self.snapshot
+        self.clear(base, snapshot)
+        self.sequence = sequence
+
+    def reset(self) -> None:
+        """Прекращение отслеживания до следующего полного снимка"""
+        self.clear(None)
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self.changed.values()) + len(self.deleted_books)
+
+
+def snapshot_digest(path: str) -> str:
+    """Отпечаток полного снимка: SHA-256 файла или манифеста каталога секций"""
+    if os.path.isdir(path):
+        path = os.path.join(path, MANIFEST)
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    except OSError as e:
+        raise FileOperationError(f"Не удалось прочитать снимок {path}: {e}")
+    return digest.hexdigest()
+
+
+def save(bookstore, filename: str) -> None:
+    """Сохранение изменений после последнего снимка в дельта-снимок"""
+    tracker = bookstore._changes
+    if tracker.base is None or tracker.snapshot is None:
+        raise BookstoreError("Нет базового снимка: сначала сохраните или загрузите полный снимок")
+
+    ids = bookstore.ids.state()
+    sequence = tracker.sequence + 1
+    data = {
+        'format': FORMAT,
+        'name': bookstore.name,
+        'snapshot': tracker.snapshot,
+        'sequence': sequence,
+        'base': tracker.base,
+        'ids': ids,
+        'journal_seq': bookstore._journal_seq,
+        'deleted_books': sorted(tracker.deleted_books),
+    }
+    for section, (_, attribute, _) in SECTIONS.items():
+        entities = getattr(bookstore, attribute)
+        data[section] = [entities[key].to_dict() for key in sorted(tracker.changed[section])]
+
+    with compression.open_text(filename, 'w') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+    tracker.advance(ids, sequence)
+
+
+def apply(bookstore, filename: str) -> None:
+    """Применение дельта-снимка к магазину, загруженному из его базы"""
+    with compression.open_text(filename) as f:
+        data = json.load(f)
+
+    if data.get('format') != FORMAT:
+        raise FileOperationError(f"Файл {filename} не является дельта-снимком")
+    tracker = bookstore._changes
+    if (tracker.snapshot is None or data.get('snapshot') != tracker.snapshot
+            or data.get('sequence') != tracker.sequence + 1 or data['base'] != bookstore.ids.state()):
+        raise FileOperationError(f"Дельта-снимок {filename} не продолжает цепочку снимков магазина")
+
+    bookstore.name = data['name']
+    for book_id in data['deleted_books']:
+        book = bookstore.books.get(book_id)
+        if book is not None:
+            bookstore._apply_remove_book(book, book.quantity)
+
+    for section, (model, _, restore) in SECTIONS.items():
+        if data[section]:
+            getattr(bookstore, restore)([model.from_dict(item) for item in data[section]])
+
+    bookstore.ids.restore(data['ids'])
+    bookstore._journal_seq = data['journal_seq']
+    tracker.advance(data['ids'], data['sequence'])
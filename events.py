@@ -0,0 +1,139 @@
+"""
+События изменений магазина и приемники событий
+"""
+
+import logging
+import sys
+import time
+from collections import deque
+from typing import Dict, List, Optional, TextIO
+
+# Шаблоны сообщений для событий
+MESSAGES = {
+    'book_added': "Книга '{title}' успешно добавлена с ID: {book_id}",
+    'book_restocked': "Количество книги '{title}' увеличено. Теперь в наличии: {quantity}",
+    'book_removed': "Удалено {quantity} экз. книги '{title}'. Осталось: {remaining}",
+    'book_depleted': "Книга '{title}' полностью удалена из магазина",
+    'book_sold': ("Продажа успешно завершена: {quantity} экз. '{title}' "
+                  "клиенту {customer} за {total_price} руб. (Продавец: {employee})"),
+    'books_sold_bulk': ("Пакетная продажа успешно завершена: {lines} поз., {quantity} экз. "
+                        "клиенту {customer} за {total_price} руб. (Продавец: {employee})"),
+    'employee_added': "Сотрудник {name} успешно добавлен с ID: {emp_id}",
+    'employee_exists': "Сотрудник с ID {emp_id} уже существует",
+    'customer_added': "Клиент {name} успешно добавлен с ID: {cust_id}",
+    'customer_exists': "Клиент с ID {cust_id} уже существует",
+    'data_saved': "Данные успешно сохранены в {filename}",
+    'data_loaded': "Данные успешно загружены из {filename}",
+    'snapshot_saved': "Снимок сохранен в фоне в {filename} за {seconds:.2f} с (захват {capture_ms:.1f} мс)",
+    'data_imported': ("Импорт из {filename}: импортировано {imported} из {rows} строк, "
+                      "отклонено {rejected} ({rate:.0f} строк/с)"),
+    'journal_replayed': "Из журнала восстановлено изменений: {applied}",
+}
+
+
+class Event:
+    """Событие магазина: вид, данные и время
+
+    Текст сообщения формируется только при обращении к message, поэтому
+    приемники, которым текст не нужен, не тратят время на форматирование.
+    """
+
+    __slots__ = ('kind', 'data', 'time')
+
+    def __init__(self, kind: str, data: Dict):
+        self.kind = kind
+        self.data = data
+        self.time = time.time()
+
+    @property
+    def message(self) -> str:
+        """Текст сообщения о событии"""
+        return MESSAGES[self.kind].format(**self.data)
+
+    def __repr__(self):
+        return f"Event({self.kind!r}, {self.data!r})"
+
+
+class EventSink:
+    """Приемник событий магазина
+
+    Магазин не создает события, если у приемника enabled равно False.
+    """
+
+    enabled = True
+
+    def emit(self, event: Event) -> None:
+        """Обработка события"""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Вывод накопленных событий"""
+
+
+class ConsoleSink(EventSink):
+    """Вывод сообщений о событиях в консоль
+
+    По умолчанию каждое сообщение выводится сразу. При batch_size > 1
+    сообщения накапливаются и выводятся одной записью на batch_size
+    событий (и при вызове flush).
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, batch_size: int = 1):
+        self.stream = stream
+        self.batch_size = batch_size
+        self._pending: List[str] = []
+
+    def emit(self, event: Event) -> None:
+        self._pending.append(event.message)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        # sys.stdout берется в момент вывода, чтобы работало перенаправление вывода
+        stream = self.stream or sys.stdout
+        stream.write('\n'.join(self._pending) + '\n')
+        self._pending = []
+
+
+class LoggingSink(EventSink):
+    """Передача событий в модуль logging
+
+    Событие доступно обработчикам журнала как атрибут записи event.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger('bookstore')
+        self.level = level
+
+    def emit(self, event: Event) -> None:
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, event.message, extra={'event': event})
+
+
+class RingBufferSink(EventSink):
+    """Хранение последних capacity событий в памяти"""
+
+    def __init__(self, capacity: int = 1000):
+        self._events = deque(maxlen=capacity)
+
+    def emit(self, event: Event) -> None:
+        self._events.append(event)
+
+    def events(self) -> List[Event]:
+        """Сохраненные события от старых к новым"""
+        return list(self._events)
+
+    def clear(self) -> None:
+        """Удаление сохраненных событий"""
+        self._events.clear()
+
+
+class NullSink(EventSink):
+    """Приемник, отключающий события"""
+
+    enabled = False
+
+    def emit(self, event: Event) -> None:
+        pass
@@ -1,16 +1,31 @@
 """
 Операции с файлами JSON и XML
+
+Снимки с расширением .gz, .bz2 или .xz (например, data.json.gz)
+сжимаются при записи; сжатые снимки распаковываются при чтении
+независимо от имени файла.
 """
 
 import json
+import os
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 from models import Book, Employee, Customer, Sale
-from exceptions import FileOperationError
+from exceptions import BookstoreError, FileOperationError
+from json_stream import JsonStreamReader
+import binary_format
+import compression
+import csv_import
+import delta_snapshot
+import partitioned_snapshot
 
 
 class FileOperations:
     """Класс для операций с файлами JSON и XML"""
 
+    # Число потоков блочного сжатия снимков; 1 - сжатие одним потоком
+    COMPRESS_THREADS = os.cpu_count() or 1
+
     @staticmethod
     def save_to_json(bookstore, filename: str) -> None:
         """Сохранение данных в JSON файл"""
@@ -21,65 +36,133 @@ class FileOperations:
                 'next_emp_id': bookstore._next_emp_id,
                 'next_cust_id': bookstore._next_cust_id,
                 'next_sale_id': bookstore._next_sale_id,
+                'journal_seq': bookstore._journal_seq,
                 'books': [book.to_dict() for book in bookstore.books.values()],
                 'employees': [emp.to_dict() for emp in bookstore.employees.values()],
                 'customers': [cust.to_dict() for cust in bookstore.customers.values()],
                 'sales': [sale.to_dict() for sale in bookstore.sales.values()]
             }
 
-            with open(filename, 'w', encoding='utf-8') as f:
+            with compression.open_text(filename, 'w', FileOperations.COMPRESS_THREADS) as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
 
-            print(f"Данные успешно сохранены в {filename}")
+            bookstore._emit('data_saved', filename=filename)
 
         except Exception as e:
             raise FileOperationError(f"Ошибка при сохранении в JSON: {e}")
 
+    # Через сколько элементов раздела сообщать о ходе потоковой загрузки
+    PROGRESS_STEP = 10000
+
     @staticmethod
-    def load_from_json(bookstore, filename: str) -> None:
-        """Загрузка данных из JSON файла"""
+    def load_from_json(bookstore, filename: str, streaming: bool = False, progress=None) -> None:
+        """Загрузка данных из JSON файла
+
+        В потоковом режиме (streaming=True) массивы разбираются поэлементно,
+        а progress(section, count) вызывается по ходу загрузки каждого раздела.
+        """
+        if streaming:
+            FileOperations._load_from_json_stream(bookstore, filename, progress)
+            return
+
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
+            with compression.open_text(filename) as f:
                 data = json.load(f)
 
             bookstore.name = data['name']
 
-            bookstore.books.clear()
-            bookstore.employees.clear()
-            bookstore.customers.clear()
-            bookstore.sales.clear()
+            bookstore._clear_data()
 
             bookstore._next_book_id = data.get('next_book_id', 1)
             bookstore._next_emp_id = data.get('next_emp_id', 1)
             bookstore._next_cust_id = data.get('next_cust_id', 1)
             bookstore._next_sale_id = data.get('next_sale_id', 1)
+            bookstore._journal_seq = data.get('journal_seq', 0)
 
             for book_data in data['books']:
                 book = Book.from_dict(book_data)
-                bookstore.books[book.book_id] = book
+                bookstore._restore_book(book)
 
             for emp_data in data['employees']:
                 employee = Employee.from_dict(emp_data)
-                bookstore.employees[employee.emp_id] = employee
+                bookstore._restore_employee(employee)
 
             for cust_data in data['customers']:
                 customer = Customer.from_dict(cust_data)
-                bookstore.customers[customer.cust_id] = customer
+                bookstore._restore_customer(customer)
 
             for sale_data in data.get('sales', []):
                 sale = Sale.from_dict(sale_data)
-                bookstore.sales[sale.sale_id] = sale
+                bookstore._restore_sale(sale)
+
+            bookstore._emit('data_loaded', filename=filename)
+
+        except FileNotFoundError:
+            raise FileOperationError(f"Файл {filename} не найден")
+        except Exception as e:
+            raise FileOperationError(f"Ошибка при загрузке из JSON: {e}")
+
+    @staticmethod
+    def _load_from_json_stream(bookstore, filename: str, progress=None) -> None:
+        """Потоковая загрузка данных из JSON файла"""
+        sections = {
+            'books': (Book, bookstore._restore_book),
+            'employees': (Employee, bookstore._restore_employee),
+            'customers': (Customer, bookstore._restore_customer),
+            'sales': (Sale, bookstore._restore_sale),
+        }
+        # Ключ файла -> (атрибут магазина, значение по умолчанию)
+        counters = {
+            'next_book_id': ('_next_book_id', 1),
+            'next_emp_id': ('_next_emp_id', 1),
+            'next_cust_id': ('_next_cust_id', 1),
+            'next_sale_id': ('_next_sale_id', 1),
+            'journal_seq': ('_journal_seq', 0),
+        }
 
-            print(f"Данные успешно загружены из {filename}")
+        try:
+            with compression.open_text(filename) as f:
+                bookstore._clear_data()
+                for attr, default in counters.values():
+                    setattr(bookstore, attr, default)
+
+                for key, value in JsonStreamReader(f).members():
+                    if key == 'name':
+                        bookstore.name = value
+                    elif key in counters:
+                        setattr(bookstore, counters[key][0], value)
+                    elif key in sections:
+                        model, store = sections[key]
+                        count = 0
+                        for item in value:
+                            store(model.from_dict(item))
+                            count += 1
+                            if progress is not None and count % FileOperations.PROGRESS_STEP == 0:
+                                progress(key, count)
+                        if progress is not None:
+                            progress(key, count)
+
+            bookstore._emit('data_loaded', filename=filename)
 
         except FileNotFoundError:
             raise FileOperationError(f"Файл {filename} не найден")
         except Exception as e:
             raise FileOperationError(f"Ошибка при загрузке из JSON: {e}")
 
+    # Размер буфера файла для потоковой записи XML
+    XML_WRITE_BUFFER = 1 << 20
+
     @staticmethod
-    def save_to_xml(bookstore, filename: str) -> None:
-        """Сохранение данных в XML файл"""
+    def save_to_xml(bookstore, filename: str, streaming: bool = False) -> None:
+        """Сохранение данных в XML файл
+
+        В потоковом режиме (streaming=True) элементы пишутся сразу в
+        буферизованный файл без построения дерева ElementTree.
+        """
+        if streaming:
+            FileOperations._save_to_xml_stream(bookstore, filename)
+            return
+
         try:
             root = ET.Element('bookstore')
 
@@ -89,6 +172,7 @@ class FileOperations:
             ET.SubElement(root, 'next_emp_id').text = str(bookstore._next_emp_id)
             ET.SubElement(root, 'next_cust_id').text = str(bookstore._next_cust_id)
             ET.SubElement(root, 'next_sale_id').text = str(bookstore._next_sale_id)
+            ET.SubElement(root, 'journal_seq').text = str(bookstore._journal_seq)
 
             # Книги
             books_elem = ET.SubElement(root, 'books')
@@ -124,98 +208,249 @@ class FileOperations:
 
             # Создание XML дерева и сохранение
             tree = ET.ElementTree(root)
-            tree.write(filename, encoding='utf-8', xml_declaration=True)
+            with compression.open_write(filename, FileOperations.COMPRESS_THREADS) as f:
+                tree.write(f, encoding='utf-8', xml_declaration=True)
+
+            bookstore._emit('data_saved', filename=filename)
+
+        except Exception as e:
+            raise FileOperationError(f"Ошибка при сохранении в XML: {e}")
+
+    @staticmethod
+    def _xml_element(tag: str, value) -> str:
+        """Текст элемента с экранированием, как его записывает ElementTree"""
+        text = escape(str(value))
+        if not text:
+            return f"<{tag} />"
+        return f"<{tag}>{text}</{tag}>"
+
+    @staticmethod
+    def _save_to_xml_stream(bookstore, filename: str) -> None:
+        """Потоковое сохранение данных в XML файл
+
+        Результат побайтно совпадает с выводом ElementTree в save_to_xml.
+        """
+        element = FileOperations._xml_element
+        sections = [
+            ('books', 'book', bookstore.books),
+            ('employees', 'employee', bookstore.employees),
+            ('customers', 'customer', bookstore.customers),
+            ('sales', 'sale', bookstore.sales),
+        ]
 
-            print(f"Данные успешно сохранены в {filename}")
+        try:
+            with compression.open_text(filename, 'w', FileOperations.COMPRESS_THREADS,
+                                       errors='xmlcharrefreplace',
+                                       buffering=FileOperations.XML_WRITE_BUFFER) as f:
+                write = f.write
+                write("<?xml version='1.0' encoding='utf-8'?>\n<bookstore>")
+
+                # Основная информация
+                write(element('name', bookstore.name))
+                write(element('next_book_id', bookstore._next_book_id))
+                write(element('next_emp_id', bookstore._next_emp_id))
+                write(element('next_cust_id', bookstore._next_cust_id))
+                write(element('next_sale_id', bookstore._next_sale_id))
+                write(element('journal_seq', bookstore._journal_seq))
+
+                for section, tag, entities in sections:
+                    if not entities:
+                        write(f"<{section} />")
+                        continue
+
+                    write(f"<{section}>")
+                    for entity in entities.values():
+                        fields = ''.join(element(key, value) for key, value in entity.to_dict().items())
+                        write(f"<{tag}>{fields}</{tag}>")
+                    write(f"</{section}>")
+
+                write("</bookstore>")
+
+            bookstore._emit('data_saved', filename=filename)
 
         except Exception as e:
             raise FileOperationError(f"Ошибка при сохранении в XML: {e}")
 
+    # Элемент сущности -> (раздел, модель, типы полей, метод размещения в магазине)
+    XML_ENTITIES = {
+        'book': ('books', Book, {'book_id': int, 'price': float, 'quantity': int, 'year': int},
+                 '_restore_book'),
+        'employee': ('employees', Employee, {'emp_id': int, 'salary': float},
+                     '_restore_employee'),
+        'customer': ('customers', Customer, {'cust_id': int},
+                     '_restore_customer'),
+        'sale': ('sales', Sale, {'sale_id': int, 'book_id': int, 'customer_id': int,
+                                 'employee_id': int, 'quantity': int, 'total_price': float},
+                 '_restore_sale'),
+    }
+
+    # Поля заголовка -> атрибут магазина и тип
+    XML_HEADER = {
+        'name': ('name', str),
+        'next_book_id': ('_next_book_id', int),
+        'next_emp_id': ('_next_emp_id', int),
+        'next_cust_id': ('_next_cust_id', int),
+        'next_sale_id': ('_next_sale_id', int),
+        'journal_seq': ('_journal_seq', int),
+    }
+
     @staticmethod
-    def load_from_xml(bookstore, filename: str) -> None:
-        """Загрузка данных из XML файла"""
+    def load_from_xml(bookstore, filename: str, progress=None) -> None:
+        """Загрузка данных из XML файла
+
+        Файл разбирается потоково через iterparse: каждый элемент книги,
+        сотрудника, клиента или продажи преобразуется в объект и сразу
+        удаляется из дерева, поэтому целиком документ в памяти не хранится.
+        progress(section, count) вызывается по ходу загрузки каждого раздела.
+        """
         try:
-            tree = ET.parse(filename)
-            root = tree.getroot()
-
-            # Загрузка основной информации
-            bookstore.name = root.find('name').text
-            bookstore._next_book_id = int(root.find('next_book_id').text)
-            bookstore._next_emp_id = int(root.find('next_emp_id').text)
-            bookstore._next_cust_id = int(root.find('next_cust_id').text)
-            bookstore._next_sale_id = int(root.find('next_sale_id').text)
-
-            # Очистка текущих данных
-            bookstore.books.clear()
-            bookstore.employees.clear()
-            bookstore.customers.clear()
-            bookstore.sales.clear()
-
-            # Загрузка книг
-            books_elem = root.find('books')
-            if books_elem is not None:
-                for book_elem in books_elem.findall('book'):
-                    book_data = {}
-                    for child in book_elem:
-                        book_data[child.tag] = child.text
-
-                    # Преобразование типов данных
-                    book_data['book_id'] = int(book_data['book_id'])
-                    book_data['price'] = float(book_data['price'])
-                    book_data['quantity'] = int(book_data['quantity'])
-                    book_data['year'] = int(book_data['year'])
-
-                    book = Book.from_dict(book_data)
-                    bookstore.books[book.book_id] = book
-
-            # Загрузка сотрудников
-            employees_elem = root.find('employees')
-            if employees_elem is not None:
-                for emp_elem in employees_elem.findall('employee'):
-                    emp_data = {}
-                    for child in emp_elem:
-                        emp_data[child.tag] = child.text
-
-                    emp_data['emp_id'] = int(emp_data['emp_id'])
-                    emp_data['salary'] = float(emp_data['salary'])
-
-                    employee = Employee.from_dict(emp_data)
-                    bookstore.employees[employee.emp_id] = employee
-
-            # Загрузка клиентов
-            customers_elem = root.find('customers')
-            if customers_elem is not None:
-                for cust_elem in customers_elem.findall('customer'):
-                    cust_data = {}
-                    for child in cust_elem:
-                        cust_data[child.tag] = child.text
-
-                    cust_data['cust_id'] = int(cust_data['cust_id'])
-
-                    customer = Customer.from_dict(cust_data)
-                    bookstore.customers[customer.cust_id] = customer
-
-            # Загрузка продаж
-            sales_elem = root.find('sales')
-            if sales_elem is not None:
-                for sale_elem in sales_elem.findall('sale'):
-                    sale_data = {}
-                    for child in sale_elem:
-                        sale_data[child.tag] = child.text
-
-                    sale_data['sale_id'] = int(sale_data['sale_id'])
-                    sale_data['book_id'] = int(sale_data['book_id'])
-                    sale_data['customer_id'] = int(sale_data['customer_id'])
-                    sale_data['employee_id'] = int(sale_data['employee_id'])
-                    sale_data['quantity'] = int(sale_data['quantity'])
-                    sale_data['total_price'] = float(sale_data['total_price'])
-
-                    sale = Sale.from_dict(sale_data)
-                    bookstore.sales[sale.sale_id] = sale
-
-            print(f"Данные успешно загружены из {filename}")
+            with compression.open_read(filename) as f:
+                FileOperations._load_from_xml_file(bookstore, f, progress)
+
+            bookstore._emit('data_loaded', filename=filename)
 
         except FileNotFoundError:
             raise FileOperationError(f"Файл {filename} не найден")
         except Exception as e:
             raise FileOperationError(f"Ошибка при загрузке из XML: {e}")
+
+    @staticmethod
+    def _load_from_xml_file(bookstore, f, progress=None) -> None:
+        """Разбор XML снимка из открытого двоичного файла"""
+        context = ET.iterparse(f, events=('start', 'end'))
+        _, root = next(context)
+
+        # Очистка текущих данных; снимок без номера журнала - из времени до журнала
+        bookstore._clear_data()
+        bookstore._journal_seq = 0
+
+        section = None
+        count = 0
+        sections = {spec[0] for spec in FileOperations.XML_ENTITIES.values()}
+
+        for event, elem in context:
+            tag = elem.tag
+
+            if event == 'start':
+                if section is None and tag in sections:
+                    section = elem
+                    count = 0
+                continue
+
+            if section is None:
+                # Основная информация
+                if tag in FileOperations.XML_HEADER:
+                    attr, cast = FileOperations.XML_HEADER[tag]
+                    setattr(bookstore, attr, cast(elem.text))
+                    root.remove(elem)
+                continue
+
+            if elem is section:
+                if progress is not None:
+                    progress(tag, count)
+                root.remove(elem)
+                section = None
+                continue
+
+            spec = FileOperations.XML_ENTITIES.get(tag)
+            if spec is None or spec[0] != section.tag:
+                continue
+
+            _, model, types, restore = spec
+            data = {child.tag: child.text for child in elem}
+            for field, cast in types.items():
+                data[field] = cast(data[field])
+            getattr(bookstore, restore)(model.from_dict(data))
+            section.remove(elem)
+
+            count += 1
+            if progress is not None and count % FileOperations.PROGRESS_STEP == 0:
+                progress(section.tag, count)
+
+    @staticmethod
+    def save_to_binary(bookstore, filename: str) -> None:
+        """Сохранение данных в двоичный колоночный файл"""
+        try:
+            binary_format.save(bookstore, filename, FileOperations.COMPRESS_THREADS)
+            bookstore._emit('data_saved', filename=filename)
+        except Exception as e:
+            raise FileOperationError(f"Ошибка при сохранении в двоичный формат: {e}")
+
+    @staticmethod
+    def load_from_binary(bookstore, filename: str) -> None:
+        """Загрузка данных из двоичного колоночного файла"""
+        try:
+            binary_format.load(bookstore, filename)
+            bookstore._emit('data_loaded', filename=filename)
+        except FileNotFoundError:
+            raise FileOperationError(f"Файл {filename} не найден")
+        except Exception as e:
+            raise FileOperationError(f"Ошибка при загрузке из двоичного формата: {e}")
+
+    @staticmethod
+    def save_partitioned(bookstore, directory: str, workers: int = None,
+                         codec: str = None) -> None:
+        """Сохранение данных в каталог секций, записываемых параллельно"""
+        try:
+            partitioned_snapshot.save(bookstore, directory, workers, codec=codec)
+            bookstore._emit('data_saved', filename=directory)
+        except BookstoreError:
+            raise
+        except Exception as e:
+            raise FileOperationError(f"Ошибка при сохранении секционированного снимка: {e}")
+
+    @staticmethod
+    def load_partitioned(bookstore, directory: str, workers: int = None, progress=None) -> None:
+        """Загрузка данных из каталога секций, разбираемых параллельно"""
+        try:
+            partitioned_snapshot.load(bookstore, directory, workers, progress)
+            bookstore._emit('data_loaded', filename=directory)
+        except BookstoreError:
+            raise
+        except FileNotFoundError as e:
+            raise FileOperationError(f"Файл {e.filename} не найден")
+        except Exception as e:
+            raise FileOperationError(f"Ошибка при загрузке секционированного снимка: {e}")
+
+    @staticmethod
+    def save_delta(bookstore, filename: str) -> None:
+        """Сохранение изменений после последнего снимка в дельта-снимок"""
+        try:
+            delta_snapshot.save(bookstore, filename)
+            bookstore._emit('data_saved', filename=filename)
+        except BookstoreError:
+            raise
+        except Exception as e:
+            raise FileOperationError(f"Ошибка при сохранении дельта-снимка: {e}")
+
+    @staticmethod
+    def load_delta(bookstore, filename: str) -> None:
+        """Применение дельта-снимка к магазину, загруженному из его базы"""
+        try:
+            delta_snapshot.apply(bookstore, filename)
+            bookstore._emit('data_loaded', filename=filename)
+        except BookstoreError:
+            raise
+        except FileNotFoundError:
+            raise FileOperationError(f"Файл {filename} не найден")
+        except Exception as e:
+            raise FileOperationError(f"Ошибка при загрузке дельта-снимка: {e}")
+
+    @staticmethod
+    def import_csv(bookstore, filename: str, entity: str = 'books', reject_file: str = None,
+                   batch_size: int = csv_import.BATCH_SIZE, delimiter: str = ',',
+                   progress=None, pause_gc: bool = False) -> csv_import.ImportReport:
+        """Потоковый импорт книг, сотрудников или клиентов из CSV файла"""
+        try:
+            report = csv_import.import_csv(bookstore, filename, entity, reject_file,
+                                           batch_size, delimiter, progress, pause_gc)
+            bookstore._emit('data_imported', filename=filename, rows=report.rows,
+                            imported=report.imported, rejected=report.rejected,
+                            rate=report.rows_per_second)
+            return report
+        except FileOperationError:
+            raise
+        except FileNotFoundError:
+            raise FileOperationError(f"Файл {filename} не найден")
+        except Exception as e:
+            raise FileOperationError(f"Ошибка при импорте из CSV: {e}")
@@ -0,0 +1,590 @@
+"""
+Вторичные индексы для быстрого поиска по данным магазина
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate, islice
+from operator import itemgetter, le
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class TrigramIndex:
+    """Триграммный индекс для поиска подстроки без учета регистра
+
+    Для каждого ключа хранится строка в нижнем регистре и набор триграмм.
+    Поиск пересекает списки ключей по триграммам запроса и затем проверяет
+    кандидатов оператором ``in``, поэтому результат совпадает с полным
+    перебором. Запросы короче трех символов проверяются по сохраненным
+    строкам без повторного вызова ``lower()``.
+    """
+
+    GRAM_SIZE = 3
+
+    def __init__(self):
+        self._postings: Dict[str, Set[int]] = {}
+        self._texts: Dict[int, str] = {}
+
+    @classmethod
+    def _grams(cls, text: str) -> Set[str]:
+        """Множество триграмм строки"""
+        size = cls.GRAM_SIZE
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    def add(self, key: int, text: str) -> None:
+        """Добавление строки в индекс"""
+        if key in self._texts:
+            self.remove(key)
+
+        lowered = text.lower()
+        self._texts[key] = lowered
+        for gram in self._grams(lowered):
+            self._postings.setdefault(gram, set()).add(key)
+
+    def add_many(self, items: Iterable[Tuple[int, str]]) -> None:
+        """Пакетное добавление новых строк (ключи еще не должны быть в индексе)
+
+        Ключи группируются по строке, поэтому триграммы повторяющихся
+        значений (авторов, жанров) вычисляются один раз на пакет, а ключи
+        с одинаковой строкой разделяют один объект строки.
+        """
+        groups: Dict[str, List[int]] = {}
+        for key, text in items:
+            lowered = text.lower()
+            keys = groups.get(lowered)
+            if keys is None:
+                groups[lowered] = [key]
+            else:
+                keys.append(key)
+
+        texts = self._texts
+        postings = self._postings
+        for lowered, keys in groups.items():
+            texts.update(dict.fromkeys(keys, lowered))
+            for gram in self._grams(lowered):
+                existing = postings.get(gram)
+                if existing is None:
+                    postings[gram] = set(keys)
+                else:
+                    existing.update(keys)
+
+    def remove(self, key: int) -> None:
+        """Удаление строки из индекса"""
+        lowered = self._texts.pop(key, None)
+        if lowered is None:
+            return
+
+        for gram in self._grams(lowered):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def search(self, query: str) -> Set[int]:
+        """Ключи строк, содержащих подстроку query"""
+        query = query.lower()
+        texts = self._texts
+
+        if len(query) < self.GRAM_SIZE:
+            return {key for key, text in texts.items() if query in text}
+
+        postings = []
+        for gram in self._grams(query):
+            keys = self._postings.get(gram)
+            if not keys:
+                return set()
+            postings.append(keys)
+
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for keys in postings[1:]:
+            candidates &= keys
+            if not candidates:
+                return candidates
+
+        return {key for key in candidates if query in texts[key]}
+
+    def clear(self) -> None:
+        """Очистка индекса"""
+        self._postings.clear()
+        self._texts.clear()
+
+
+class SortedIndex:
+    """Отсортированный индекс по числовому значению
+
+    Хранит пары (значение, ключ) в отсортированном списке, поэтому запрос
+    по диапазону выполняется двумя бинарными поисками за O(log n + k).
+    """
+
+    def __init__(self):
+        self._entries: List[Tuple[float, int]] = []
+        self._values: Dict[int, float] = {}
+
+    def add(self, key: int, value: float) -> None:
+        """Добавление или обновление значения ключа"""
+        if key in self._values:
+            self.remove(key)
+        insort(self._entries, (value, key))
+        self._values[key] = value
+
+    def add_many(self, items: Iterable[Tuple[int, float]]) -> None:
+        """Пакетное добавление пар (ключ, значение) с одной сортировкой"""
+        items = [(key, value) for key, value in items if key not in self._values]
+        self._entries.extend((value, key) for key, value in items)
+        self._entries.sort()
+        self._values.update(items)
+
+    def remove(self, key: int) -> None:
+        """Удаление ключа из индекса"""
+        value = self._values.pop(key, None)
+        if value is None:
+            return
+        del self._entries[bisect_left(self._entries, (value, key))]
+
+    def _bounds(self, low: Optional[float], high: Optional[float]) -> Tuple[int, int]:
+        """Границы среза списка для диапазона [low, high]"""
+        start = 0 if low is None else bisect_left(self._entries, (low,))
+        end = len(self._entries) if high is None else bisect_right(self._entries, (high, float('inf')))
+        return start, max(start, end)
+
+    def range(self, low: Optional[float] = None, high: Optional[float] = None) -> List[int]:
+        """Ключи со значением в диапазоне [low, high] по возрастанию значения"""
+        start, end = self._bounds(low, high)
+        return [key for _, key in self._entries[start:end]]
+
+    def count(self, low: Optional[float] = None, high: Optional[float] = None) -> int:
+        """Количество ключей в диапазоне [low, high]"""
+        start, end = self._bounds(low, high)
+        return end - start
+
+    def matches(self, key: int, low: Optional[float] = None, high: Optional[float] = None) -> bool:
+        """Попадает ли значение ключа в диапазон [low, high]"""
+        value = self._values.get(key)
+        if value is None:
+            return False
+        return (low is None or value >= low) and (high is None or value <= high)
+
+    def clear(self) -> None:
+        """Очистка индекса"""
+        self._entries.clear()
+        self._values.clear()
+
+
+class BookIndex:
+    """Набор индексов по книгам магазина
+
+    Помимо текстовых и числовых индексов хранит порядковый номер добавления
+    книги, чтобы результаты поиска шли в том же порядке, что и в словаре books.
+    """
+
+    TEXT_FIELDS = ('title', 'author', 'genre')
+    NUMERIC_FIELDS = ('price', 'year', 'quantity')
+
+    # Критерий поиска -> (поле, нижняя граница или верхняя)
+    RANGE_CRITERIA = {
+        'min_price': ('price', 'low'),
+        'max_price': ('price', 'high'),
+        'year_from': ('year', 'low'),
+        'year_to': ('year', 'high'),
+        'min_quantity': ('quantity', 'low'),
+        'max_quantity': ('quantity', 'high'),
+    }
+
+    def __init__(self):
+        self._text: Dict[str, TrigramIndex] = {field: TrigramIndex() for field in self.TEXT_FIELDS}
+        self._numeric: Dict[str, SortedIndex] = {field: SortedIndex() for field in self.NUMERIC_FIELDS}
+        self._order: Dict[int, int] = {}
+        self._counter = 0
+
+    def add(self, book) -> None:
+        """Добавление книги во все индексы
+
+        Замененная книга сохраняет место в порядке добавления, как ключ
+        словаря books при присваивании.
+        """
+        order = self._order.get(book.book_id)
+        if order is not None:
+            self.remove(book)
+
+        for field, index in self._text.items():
+            index.add(book.book_id, getattr(book, field))
+        for field, index in self._numeric.items():
+            index.add(book.book_id, getattr(book, field))
+        if order is None:
+            order = self._counter
+            self._counter += 1
+        self._order[book.book_id] = order
+
+    def add_many(self, books: List) -> None:
+        """Пакетное добавление новых книг (ID еще не должны быть в индексе)"""
+        for field, index in self._text.items():
+            index.add_many((book.book_id, getattr(book, field)) for book in books)
+        for field, index in self._numeric.items():
+            index.add_many((book.book_id, getattr(book, field)) for book in books)
+        for book in books:
+            self._order[book.book_id] = self._counter
+            self._counter += 1
+
+    def remove(self, book) -> None:
+        """Удаление книги из всех индексов"""
+        for index in self._text.values():
+            index.remove(book.book_id)
+        for index in self._numeric.values():
+            index.remove(book.book_id)
+        self._order.pop(book.book_id, None)
+
+    def update_quantity(self, book) -> None:
+        """Обновление индекса количества после изменения book.quantity"""
+        if book.book_id in self._order:
+            self._numeric['quantity'].add(book.book_id, book.quantity)
+
+    def _ranges(self, criteria: Dict) -> Dict[str, List[Optional[float]]]:
+        """Числовые критерии, сгруппированные по полям: поле -> [low, high]"""
+        ranges: Dict[str, List[Optional[float]]] = {}
+        for name, (field, side) in self.RANGE_CRITERIA.items():
+            value = criteria.get(name)
+            if value is None:
+                continue
+            bounds = ranges.setdefault(field, [None, None])
+            if side == 'low':
+                bounds[0] = value if bounds[0] is None else max(bounds[0], value)
+            else:
+                bounds[1] = value if bounds[1] is None else min(bounds[1], value)
+        return ranges
+
+    def search(self, **criteria) -> Optional[Set[int]]:
+        """ID книг, подходящих под все текстовые и числовые критерии
+
+        Возвращает None, если ни один критерий не задан. Самый узкий
+        критерий дает кандидатов, остальные проверяются по значениям в индексах.
+        """
+        result: Optional[Set[int]] = None
+        for field, index in self._text.items():
+            query = criteria.get(field)
+            if not query:
+                continue
+            found = index.search(query)
+            result = found if result is None else result & found
+            if not result:
+                return set()
+
+        ranges = self._ranges(criteria)
+        if not ranges:
+            return result
+
+        counts = {field: self._numeric[field].count(*bounds) for field, bounds in ranges.items()}
+        narrowest = min(counts, key=counts.__getitem__)
+        if result is None or counts[narrowest] < len(result):
+            candidates = self._numeric[narrowest].range(*ranges.pop(narrowest))
+            result = set(candidates) if result is None else result.intersection(candidates)
+
+        for field, (low, high) in ranges.items():
+            index = self._numeric[field]
+            result = {book_id for book_id in result if index.matches(book_id, low, high)}
+        return result
+
+    def ordered(self, book_ids: Iterable[int]) -> List[int]:
+        """Сортировка ID книг в порядке их добавления"""
+        return sorted(book_ids, key=self._order.__getitem__)
+
+    def clear(self) -> None:
+        """Очистка всех индексов"""
+        for index in self._text.values():
+            index.clear()
+        for index in self._numeric.values():
+            index.clear()
+        self._order.clear()
+        self._counter = 0
+
+
+class PostingIndex:
+    """Индекс "значение -> список ключей" в порядке добавления
+
+    Списки хранятся в компактных массивах целых чисел, поэтому выборка
+    по значению стоит O(k), где k - длина результата.
+    """
+
+    def __init__(self):
+        self._postings: Dict[int, array] = {}
+
+    def add(self, value: int, key: int) -> None:
+        """Добавление ключа в список значения"""
+        keys = self._postings.get(value)
+        if keys is None:
+            keys = self._postings[value] = array('q')
+        keys.append(key)
+
+    def add_many(self, values: Iterable[int], keys: Iterable[int]) -> None:
+        """Пакетное добавление пар (значение, ключ)"""
+        postings = self._postings
+        for value, key in zip(values, keys):
+            posting = postings.get(value)
+            if posting is None:
+                posting = postings[value] = array('q')
+            posting.append(key)
+
+    def remove(self, value: int, key: int) -> None:
+        """Удаление ключа из списка значения"""
+        keys = self._postings.get(value)
+        if keys is None or key not in keys:
+            return
+        keys.remove(key)
+        if not keys:
+            del self._postings[value]
+
+    def get(self, value: int) -> array:
+        """Ключи, связанные со значением"""
+        return self._postings.get(value, array('q'))
+
+    def clear(self) -> None:
+        """Очистка индекса"""
+        self._postings.clear()
+
+
+class SaleIndex:
+    """Индексы продаж по клиенту, сотруднику и книге"""
+
+    FIELDS = ('customer_id', 'employee_id', 'book_id')
+
+    def __init__(self):
+        self._postings: Dict[str, PostingIndex] = {field: PostingIndex() for field in self.FIELDS}
+
+    def add(self, sale) -> None:
+        """Добавление продажи во все индексы"""
+        for field, index in self._postings.items():
+            index.add(getattr(sale, field), sale.sale_id)
+
+    def add_many(self, sales: List) -> None:
+        """Пакетное добавление продаж во все индексы"""
+        sale_ids = [sale.sale_id for sale in sales]
+        for field, index in self._postings.items():
+            index.add_many([getattr(sale, field) for sale in sales], sale_ids)
+
+    def add_columns(self, sale_ids: Iterable[int], columns: Dict[str, Iterable[int]]) -> None:
+        """Пакетное добавление продаж, заданных колонками {поле: значения}"""
+        for field, index in self._postings.items():
+            index.add_many(columns[field], sale_ids)
+
+    def remove(self, sale) -> None:
+        """Удаление продажи из всех индексов"""
+        for field, index in self._postings.items():
+            index.remove(getattr(sale, field), sale.sale_id)
+
+    def get(self, field: str, value: int) -> array:
+        """ID продаж с заданным значением поля"""
+        return self._postings[field].get(value)
+
+    def clear(self) -> None:
+        """Очистка всех индексов"""
+        for index in self._postings.values():
+            index.clear()
+
+
+class TimeIndex:
+    """Индекс продаж, упорядоченный по дате
+
+    Хранит отсортированные метки времени (микросекунды от эпохи), ID продаж
+    и накопленные суммы выручки и количества экземпляров. Выборка продаж
+    за период стоит O(log n + k), а итоги за период - O(log n): это
+    разность накопленных сумм на границах периода. Продажи обычно приходят
+    в порядке времени и добавляются в конец; вставка в середину стоит O(n).
+    """
+
+    def __init__(self):
+        self._times = array('q')
+        self._keys = array('q')
+        # Накопленные суммы с ведущим нулем: итог строк [i, j) равен s[j] - s[i]
+        self._revenue = array('q', [0])
+        self._units = array('q', [0])
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def add(self, key: int, timestamp: int, kopecks: int, units: int) -> None:
+        """Добавление продажи в индекс"""
+        times = self._times
+        if not times or timestamp >= times[-1]:
+            times.append(timestamp)
+            self._keys.append(key)
+            self._revenue.append(self._revenue[-1] + kopecks)
+            self._units.append(self._units[-1] + units)
+            return
+
+        position = bisect_right(times, timestamp)
+        times.insert(position, timestamp)
+        self._keys.insert(position, key)
+        self._revenue = self._shifted(self._revenue, position, kopecks)
+        self._units = self._shifted(self._units, position, units)
+
+    @staticmethod
+    def _shifted(sums: array, position: int, value: int) -> array:
+        """Накопленные суммы после вставки значения в позицию position"""
+        result = sums[:position + 1]
+        result.append(sums[position] + value)
+        result.extend(total + value for total in sums[position + 1:])
+        return result
+
+    def add_many(self, keys: Iterable[int], timestamps: Iterable[int],
+                 kopecks: Iterable[int], units: Iterable[int]) -> None:
+        """Пакетное добавление продаж
+
+        Упорядоченный по времени пакет, который не раньше последней продажи
+        индекса, дописывается в конец; иначе индекс перестраивается целиком.
+        """
+        keys, timestamps = array('q', keys), array('q', timestamps)
+        kopecks, units = array('q', kopecks), array('q', units)
+        if not timestamps:
+            return
+
+        ordered = all(map(le, timestamps, islice(timestamps, 1, None)))
+        if ordered and (not self._times or timestamps[0] >= self._times[-1]):
+            self._times.extend(timestamps)
+            self._keys.extend(keys)
+            self._revenue.extend(islice(accumulate(kopecks, initial=self._revenue[-1]), 1, None))
+            self._units.extend(islice(accumulate(units, initial=self._units[-1]), 1, None))
+            return
+
+        rows = list(zip(self._times, self._keys, self._values(self._revenue), self._values(self._units)))
+        rows.extend(zip(timestamps, keys, kopecks, units))
+        rows.sort(key=itemgetter(0, 1))
+        self.clear()
+        times, keys, kopecks, units = zip(*rows)
+        self.add_many(keys, times, kopecks, units)
+
+    @staticmethod
+    def _values(sums: array) -> Iterator[int]:
+        """Значения строк по накопленным суммам"""
+        return (b - a for a, b in zip(sums, sums[1:]))
+
+    def remove(self, key: int, timestamp: int) -> None:
+        """Удаление продажи из индекса"""
+        times = self._times
+        position = bisect_left(times, timestamp)
+        end = bisect_right(times, timestamp)
+        while position < end and self._keys[position] != key:
+            position += 1
+        if position == end:
+            return
+
+        kopecks = self._revenue[position + 1] - self._revenue[position]
+        units = self._units[position + 1] - self._units[position]
+        del times[position]
+        del self._keys[position]
+        self._revenue = self._shifted_back(self._revenue, position, kopecks)
+        self._units = self._shifted_back(self._units, position, units)
+
+    @staticmethod
+    def _shifted_back(sums: array, position: int, value: int) -> array:
+        """Накопленные суммы после удаления значения из позиции position"""
+        result = sums[:position + 1]
+        result.extend(total - value for total in sums[position + 2:])
+        return result
+
+    def _bounds(self, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        """Строки периода start <= t < end (None - без ограничения)"""
+        times = self._times
+        low = 0 if start is None else bisect_left(times, start)
+        high = len(times) if end is None else bisect_left(times, end)
+        return low, max(low, high)
+
+    def keys_between(self, start: Optional[int] = None, end: Optional[int] = None) -> array:
+        """ID продаж периода в порядке времени"""
+        low, high = self._bounds(start, end)
+        return self._keys[low:high]
+
+    def totals_between(self, start: Optional[int] = None,
+                       end: Optional[int] = None) -> Tuple[int, int]:
+        """Выручка в копейках и количество экземпляров за период"""
+        low, high = self._bounds(start, end)
+        return (self._revenue[high] - self._revenue[low],
+                self._units[high] - self._units[low])
+
+    def rows_since(self, start: int) -> Iterator[Tuple[int, int, int]]:
+        """Строки (время, выручка, количество) начиная с момента start"""
+        low, _ = self._bounds(start, None)
+        for row in range(low, len(self._times)):
+            yield (self._times[row], self._revenue[row + 1] - self._revenue[row],
+                   self._units[row + 1] - self._units[row])
+
+    def latest(self) -> Optional[int]:
+        """Время последней продажи"""
+        return self._times[-1] if self._times else None
+
+    def clear(self) -> None:
+        """Очистка индекса"""
+        self._times = array('q')
+        self._keys = array('q')
+        self._revenue = array('q', [0])
+        self._units = array('q', [0])
+
+
+class RollingCounter:
+    """Итоги продаж за скользящее окно из минутных корзин
+
+    Корзины образуют кольцо длиной в окно. Добавление продажи стоит O(1):
+    при переходе на новую минуту устаревшие корзины вычитаются из итогов
+    и обнуляются (не больше одного прохода по кольцу за переход).
+    """
+
+    MINUTE = 60_000_000
+
+    def __init__(self, minutes: int):
+        self.minutes = minutes
+        self._stamps = array('q', [-1] * minutes)
+        self._revenue = array('q', [0] * minutes)
+        self._units = array('q', [0] * minutes)
+        self._total_revenue = 0
+        self._total_units = 0
+        self._current: Optional[int] = None
+
+    def _reset_slot(self, slot: int, minute: int) -> None:
+        """Освобождение корзины для новой минуты"""
+        self._total_revenue -= self._revenue[slot]
+        self._total_units -= self._units[slot]
+        self._revenue[slot] = 0
+        self._units[slot] = 0
+        self._stamps[slot] = minute
+
+    def _advance(self, minute: int) -> None:
+        """Сдвиг окна так, чтобы оно заканчивалось минутой minute"""
+        current = self._current
+        if current is not None and minute <= current:
+            return
+        if current is None or minute - current >= self.minutes:
+            self.clear()
+        else:
+            for passed in range(current + 1, minute + 1):
+                self._reset_slot(passed % self.minutes, passed)
+        self._current = minute
+
+    def add(self, timestamp: int, kopecks: int, units: int) -> None:
+        """Учет продажи (отрицательные значения отменяют учтенную продажу)"""
+        minute = timestamp // self.MINUTE
+        self._advance(minute)
+        if minute <= self._current - self.minutes:
+            return
+
+        slot = minute % self.minutes
+        if self._stamps[slot] != minute:
+            self._reset_slot(slot, minute)
+        self._revenue[slot] += kopecks
+        self._units[slot] += units
+        self._total_revenue += kopecks
+        self._total_units += units
+
+    def totals(self, now: int) -> Tuple[int, int]:
+        """Выручка в копейках и количество экземпляров за окно, заканчивающееся в now"""
+        self._advance(now // self.MINUTE)
+        return self._total_revenue, self._total_units
+
+    def clear(self) -> None:
+        """Очистка счетчика"""
+        for slot in range(self.minutes):
+            self._stamps[slot] = -1
+            self._revenue[slot] = 0
+            self._units[slot] = 0
+        self._total_revenue = 0
+        self._total_units = 0
+        self._current = None
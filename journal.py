@@ -0,0 +1,229 @@
+"""
+Журнал изменений магазина (write-ahead log) и восстановление после сбоя
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, Tuple
+
+from models import Book, Employee, Customer, Sale
+from exceptions import FileOperationError
+
+SNAPSHOT_FILE = 'snapshot.json'
+JOURNAL_FILE = 'journal.log'
+
+
+class Journal:
+    """Журнал изменений магазина с групповой фиксацией на диск
+
+    Каждое изменение записывается одной компактной JSON-строкой с
+    порядковым номером. Запись сразу передается операционной системе,
+    а fsync выполняется раз в batch_size записей или раз в flush_interval
+    секунд, поэтому при сбое питания теряется не больше одной группы.
+    Если за flush_interval новых записей нет, незафиксированный хвост
+    фиксирует таймер в фоновом потоке.
+    """
+
+    def __init__(self, path: str, start_seq: int = 0, batch_size: int = 64,
+                 flush_interval: float = 0.05):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._seq = start_seq
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._timer = None
+        # Таймер фиксации работает в своем потоке
+        self._lock = threading.Lock()
+        try:
+            self._file = open(path, 'a', encoding='utf-8')
+        except OSError as e:
+            raise FileOperationError(f"Не удалось открыть журнал {path}: {e}")
+
+    @property
+    def seq(self) -> int:
+        """Номер последней записи журнала"""
+        return self._seq
+
+    def append(self, operation: str, payload: Dict) -> int:
+        """Добавление записи в журнал; возвращает ее номер"""
+        try:
+            with self._lock:
+                seq = self._seq + 1
+                record = {'seq': seq, 'op': operation}
+                record.update(payload)
+                self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+                self._file.flush()
+                # Номер занимается только записанной записью
+                self._seq = seq
+
+                self._pending += 1
+                if (self._pending >= self.batch_size or
+                        time.monotonic() - self._last_sync >= self.flush_interval):
+                    self._sync()
+                elif self._timer is None:
+                    self._timer = threading.Timer(self.flush_interval, self._sync_pending)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return seq
+
+        except OSError as e:
+            raise FileOperationError(f"Ошибка при записи в журнал: {e}")
+
+    def _sync_pending(self) -> None:
+        """Фиксация записей, оставшихся без fsync (вызывается таймером)"""
+        with self._lock:
+            if self._timer is not threading.current_thread():
+                # Записи уже зафиксированы, таймер заменен новым
+                return
+            self._timer = None
+            if self._pending and not self._file.closed:
+                try:
+                    self._sync()
+                except OSError:
+                    # Ошибку получит следующая запись или закрытие журнала
+                    pass
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def sync(self) -> None:
+        """Принудительная фиксация журнала на диске"""
+        with self._lock:
+            self._sync()
+
+    def truncate(self) -> None:
+        """Очистка журнала после сохранения контрольной точки"""
+        with self._lock:
+            self._file.seek(0)
+            self._file.truncate()
+            self._sync()
+
+    def close(self) -> None:
+        """Фиксация и закрытие журнала"""
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    @staticmethod
+    def read(path: str) -> Iterator[Tuple[int, Dict]]:
+        """Записи журнала вместе со смещением конца каждой записи
+
+        Оборванная последняя строка (запись, прерванная сбоем) пропускается.
+        """
+        with open(path, 'rb') as f:
+            offset = 0
+            for line in f:
+                end = offset + len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    if f.read(1):
+                        raise FileOperationError(f"Поврежденная запись журнала на позиции {offset}")
+                    return
+                if not line.endswith(b'\n'):
+                    return
+                yield end, record
+                offset = end
+
+
+def apply_record(bookstore, record: Dict) -> None:
+    """Применение одной записи журнала к магазину"""
+    operation = record['op']
+    if operation == 'add_book':
+        bookstore._apply_add_book(Book.from_dict(record['book']))
+    elif operation == 'remove_book':
+        bookstore._apply_remove_book(bookstore.books[record['book_id']], record['quantity'])
+    elif operation == 'sell_book':
+        bookstore._apply_sale(Sale.from_dict(record['sale']))
+    elif operation == 'sell_books_bulk':
+        bookstore._apply_sales([Sale.from_dict(sale) for sale in record['sales']])
+    elif operation == 'add_employee':
+        bookstore._restore_employee(Employee.from_dict(record['employee']))
+    elif operation == 'add_customer':
+        bookstore._restore_customer(Customer.from_dict(record['customer']))
+    elif operation == 'reserve_ids':
+        bookstore.ids.observe(record['kind'], record['stop'] - 1)
+    else:
+        raise FileOperationError(f"Неизвестная операция в журнале: {operation}")
+
+
+def replay(bookstore, path: str) -> int:
+    """Применение записей журнала, более новых, чем состояние магазина
+
+    Оборванный хвост журнала отрезается. Возвращает число примененных записей.
+    """
+    applied = 0
+    valid_size = 0
+    try:
+        for valid_size, record in Journal.read(path):
+            if record['seq'] <= bookstore._journal_seq:
+                continue
+            apply_record(bookstore, record)
+            bookstore._journal_seq = record['seq']
+            applied += 1
+    except FileOperationError:
+        raise
+    except Exception as e:
+        raise FileOperationError(f"Ошибка при применении журнала: {e}")
+
+    if os.path.getsize(path) != valid_size:
+        with open(path, 'r+b') as f:
+            f.truncate(valid_size)
+    return applied
+
+
+def recover(bookstore, directory: str, **journal_options) -> Journal:
+    """Восстановление магазина из контрольной точки и журнала
+
+    Загружает последнюю контрольную точку, применяет хвост журнала и
+    подключает журнал к магазину для записи новых изменений.
+    """
+    os.makedirs(directory, exist_ok=True)
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+    journal_path = os.path.join(directory, JOURNAL_FILE)
+
+    if os.path.exists(snapshot_path):
+        bookstore.load_from_json(snapshot_path, streaming=True)
+    if os.path.exists(journal_path):
+        applied = replay(bookstore, journal_path)
+        bookstore._emit('journal_replayed', applied=applied)
+
+    journal = Journal(journal_path, start_seq=bookstore._journal_seq, **journal_options)
+    bookstore.journal = journal
+    return journal
+
+
+def compact(bookstore, directory: str) -> None:
+    """Сохранение контрольной точки и очистка журнала
+
+    Контрольная точка записывается во временный файл и атомарно заменяет
+    предыдущую. Номер последней записи журнала хранится в контрольной
+    точке, поэтому сбой между заменой файла и очисткой журнала не приведет
+    к повторному применению записей.
+    """
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+    temp_path = snapshot_path + '.tmp'
+
+    journal = bookstore.journal
+    if journal is not None:
+        journal.sync()
+
+    # Запись в обход Bookstore.save_to_json: контрольная точка не становится
+    # базой дельта-снимков пользователя
+    bookstore.file_ops.save_to_json(bookstore, temp_path)
+    with open(temp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, snapshot_path)
+
+    if journal is not None:
+        journal.truncate()
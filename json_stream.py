@@ -0,0 +1,117 @@
+"""
+Потоковое чтение JSON-документа без загрузки его целиком в память
+"""
+
+import json
+from typing import Any, Iterator, TextIO, Tuple
+
+# Символы, которыми может продолжаться число JSON
+NUMBER_TAIL = '0123456789.eE+-'
+
+
+class JsonStreamReader:
+    """Потоковый разбор JSON-объекта верхнего уровня
+
+    Файл читается блоками. Скалярные значения и вложенные объекты
+    разбираются целиком, а массивы верхнего уровня отдаются итератором,
+    который декодирует элементы по одному. Поэтому в памяти одновременно
+    находится только текущий блок файла и текущий элемент массива.
+    """
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, file: TextIO, chunk_size: int = CHUNK_SIZE):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Дочитывание следующего блока файла; False, если файл закончился"""
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Следующий непробельный символ (без извлечения)"""
+        while True:
+            buffer = self._buffer
+            pos = self._pos
+            while pos < len(buffer) and buffer[pos] in ' \t\n\r':
+                pos += 1
+            self._pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                raise ValueError("Неожиданный конец JSON-документа")
+
+    def _expect(self, chars: str) -> str:
+        """Извлечение одного из ожидаемых символов-разделителей"""
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(f"Ожидался один из символов {chars!r}, получен {char!r} "
+                             f"(позиция {self._pos} в текущем блоке)")
+        self._pos += 1
+        return char
+
+    def _value(self) -> Any:
+        """Декодирование одного значения целиком"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # Число или литерал на границе блока могут быть обрезаны: за
+            # числом "2" в следующем блоке может идти ".5" или "e3"
+            if end == len(self._buffer) or (isinstance(value, (int, float))
+                                            and self._buffer[end] in NUMBER_TAIL):
+                if self._fill():
+                    continue
+            self._pos = end
+            return value
+
+    def _array(self) -> Iterator[Any]:
+        """Итератор по элементам массива"""
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
+
+    def members(self) -> Iterator[Tuple[str, Any]]:
+        """Пары (ключ, значение) объекта верхнего уровня
+
+        Для массивов значением является итератор по элементам. Если
+        вызывающий код не дочитал его, оставшиеся элементы будут пропущены
+        перед переходом к следующему ключу.
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if self._peek() == '[':
+                items = self._array()
+                yield key, items
+                for _ in items:
+                    pass
+            else:
+                yield key, self._value()
+            if self._expect(',}') == '}':
+                return
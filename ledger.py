@@ -0,0 +1,243 @@
+"""
+Колоночное хранение истории продаж
+"""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from itertools import islice
+from operator import lt
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from models import Sale, to_kopecks, from_kopecks
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_timestamp(moment: datetime) -> int:
+    """Дата продажи в микросекундах от эпохи"""
+    return (moment - EPOCH) // MICROSECOND
+
+
+def from_timestamp(timestamp: int) -> datetime:
+    """Дата продажи из микросекунд от эпохи"""
+    return EPOCH + timedelta(microseconds=timestamp)
+
+
+BUCKET_UNITS = ('hour', 'day', 'month')
+
+
+def bucket_start(moment: datetime, unit: str) -> datetime:
+    """Начало часа, дня или месяца, в который попадает момент"""
+    if unit == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if unit == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == 'month':
+        return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Неизвестный интервал: {unit}. Допустимы: {', '.join(BUCKET_UNITS)}")
+
+
+def next_bucket(start: datetime, unit: str) -> datetime:
+    """Начало следующего часа, дня или месяца"""
+    if unit == 'hour':
+        return start + timedelta(hours=1)
+    if unit == 'day':
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def time_buckets(start: datetime, end: datetime, unit: str) -> List[Tuple[datetime, datetime, datetime]]:
+    """Интервалы периода start <= t < end по часам, дням или месяцам
+
+    Возвращает тройки (начало интервала, начало части периода, конец части
+    периода): крайние интервалы обрезаются границами периода.
+    """
+    buckets = []
+    label = bucket_start(start, unit)
+    while label < end:
+        following = next_bucket(label, unit)
+        buckets.append((label, max(label, start), min(following, end)))
+        label = following
+    return buckets
+
+
+class SalesLedger(Mapping):
+    """Журнал продаж в виде типизированных колонок
+
+    Вместо объекта Sale на каждую продажу хранится по одному элементу в
+    семи массивах array('q'): около 56 байт на продажу. При обращении
+    по ID создается объект Sale с теми же данными; изменять его бессмысленно,
+    продажи в журнале неизменяемы. Сумма продажи хранится в копейках.
+    """
+
+    COLUMNS = ('sale_id', 'book_id', 'customer_id', 'employee_id',
+               'quantity', 'total_kopecks', 'timestamp')
+
+    def __init__(self):
+        for name in self.COLUMNS:
+            setattr(self, name, array('q'))
+        # Пока ID добавляются по возрастанию, строка ищется бинарным поиском;
+        # иначе строится словарь "ID -> номер строки"
+        self._positions: Optional[Dict[int, int]] = None
+
+    def _columns(self) -> List[array]:
+        """Колонки журнала в порядке COLUMNS"""
+        return [getattr(self, name) for name in self.COLUMNS]
+
+    def _row(self, sale_id: int) -> int:
+        """Номер строки продажи или -1"""
+        if self._positions is not None:
+            return self._positions.get(sale_id, -1)
+        ids = self.sale_id
+        position = bisect_left(ids, sale_id)
+        if position < len(ids) and ids[position] == sale_id:
+            return position
+        return -1
+
+    def _make(self, row: int) -> Sale:
+        """Объект Sale для строки журнала"""
+        return Sale(self.sale_id[row], self.book_id[row], self.customer_id[row],
+                    self.employee_id[row], self.quantity[row],
+                    from_kopecks(self.total_kopecks[row]),
+                    from_timestamp(self.timestamp[row]))
+
+    @staticmethod
+    def _values(sale: Sale) -> tuple:
+        """Значения колонок для продажи"""
+        return (sale.sale_id, sale.book_id, sale.customer_id, sale.employee_id,
+                sale.quantity, to_kopecks(sale.total_price), to_timestamp(sale.sale_date))
+
+    def put(self, sale: Sale) -> None:
+        """Добавление продажи или замена продажи с тем же ID"""
+        row = self._row(sale.sale_id)
+        if row >= 0:
+            for column, value in zip(self._columns(), self._values(sale)):
+                column[row] = value
+            return
+
+        ids = self.sale_id
+        if self._positions is None and ids and sale.sale_id < ids[-1]:
+            self._positions = {sale_id: row for row, sale_id in enumerate(ids)}
+        if self._positions is not None:
+            self._positions[sale.sale_id] = len(ids)
+        for column, value in zip(self._columns(), self._values(sale)):
+            column.append(value)
+
+    def extend_columns(self, sale_ids: Sequence[int], book_ids: Sequence[int],
+                       customer_ids: Sequence[int], employee_ids: Sequence[int],
+                       quantities: Sequence[int], total_kopecks: Sequence[int],
+                       timestamps: Sequence[int]) -> None:
+        """Пакетное добавление новых продаж, заданных колонками"""
+        ids = self.sale_id
+        start = len(ids)
+        ascending = all(map(lt, sale_ids, islice(sale_ids, 1, None)))
+        if ids and len(sale_ids) and ids[-1] >= sale_ids[0]:
+            ascending = False
+        if self._positions is None and not ascending:
+            self._positions = {sale_id: row for row, sale_id in enumerate(ids)}
+
+        for column, values in zip(self._columns(), (sale_ids, book_ids, customer_ids, employee_ids,
+                                                    quantities, total_kopecks, timestamps)):
+            column.extend(values)
+
+        if self._positions is not None:
+            self._positions.update((sale_id, start + offset) for offset, sale_id in enumerate(sale_ids))
+
+    def extend(self, sales: Iterable[Sale]) -> None:
+        """Пакетное добавление новых продаж"""
+        rows = [self._values(sale) for sale in sales]
+        if rows:
+            self.extend_columns(*[array('q', values) for values in zip(*rows)])
+
+    def clear(self) -> None:
+        """Очистка журнала
+
+        Колонки заменяются новыми массивами, поэтому ранее полученные
+        колонки (например, захваченные для фонового снимка) не изменяются.
+        """
+        for name in self.COLUMNS:
+            setattr(self, name, array('q'))
+        self._positions = None
+
+    def copy(self) -> 'SalesLedger':
+        """Независимая копия журнала"""
+        ledger = SalesLedger()
+        for name in self.COLUMNS:
+            setattr(ledger, name, array('q', getattr(self, name)))
+        if self._positions is not None:
+            ledger._positions = dict(self._positions)
+        return ledger
+
+    # Интерфейс словаря "ID продажи -> Sale"
+
+    def __getitem__(self, sale_id: int) -> Sale:
+        row = self._row(sale_id)
+        if row < 0:
+            raise KeyError(sale_id)
+        return self._make(row)
+
+    def __contains__(self, sale_id) -> bool:
+        return self._row(sale_id) >= 0
+
+    def intersects(self, sale_ids: Sequence[int]) -> bool:
+        """Есть ли в журнале хотя бы одна из продаж sale_ids
+
+        Пока ID журнала возрастают, пакет с ID больше последнего
+        проверяется без поиска каждой продажи.
+        """
+        if not len(self.sale_id) or not len(sale_ids):
+            return False
+        if self._positions is None and min(sale_ids) > self.sale_id[-1]:
+            return False
+        return any(sale_id in self for sale_id in sale_ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.sale_id)
+
+    def __len__(self) -> int:
+        return len(self.sale_id)
+
+    def values(self) -> Iterator[Sale]:
+        """Продажи в порядке добавления"""
+        for row in range(len(self.sale_id)):
+            yield self._make(row)
+
+    def items(self) -> Iterator:
+        """Пары (ID, продажа) в порядке добавления"""
+        for row in range(len(self.sale_id)):
+            yield self.sale_id[row], self._make(row)
+
+    # Агрегаты по колонкам
+
+    def total_revenue_kopecks(self) -> int:
+        """Общая выручка в копейках"""
+        return sum(self.total_kopecks)
+
+    def total_units(self) -> int:
+        """Общее количество проданных экземпляров"""
+        return sum(self.quantity)
+
+    def revenue_by(self, field: str) -> Dict[int, int]:
+        """Выручка в копейках с группировкой по book_id, customer_id или employee_id"""
+        totals: Dict[int, int] = {}
+        get = totals.get
+        for key, amount in zip(getattr(self, field), self.total_kopecks):
+            totals[key] = get(key, 0) + amount
+        return totals
+
+    def units_by(self, field: str) -> Dict[int, int]:
+        """Количество экземпляров с группировкой по book_id, customer_id или employee_id"""
+        totals: Dict[int, int] = {}
+        get = totals.get
+        for key, units in zip(getattr(self, field), self.quantity):
+            totals[key] = get(key, 0) + units
+        return totals
+
+    def memory_usage(self) -> int:
+        """Объем памяти, занятый колонками, в байтах"""
+        return sum(column.buffer_info()[1] * column.itemsize for column in self._columns())
@@ -0,0 +1,144 @@
+"""
+Генератор нагрузки для HTTP/JSON сервиса книжного магазина
+
+Запуск: python load_generator.py [--host HOST] [--port PORT]
+                                 [--connections N] [--requests N] [--mix search:7,sell:2,stats:1]
+
+Каждое соединение отправляет запросы последовательно с keep-alive.
+В конце выводятся задержки p50/p99 по видам запросов и общее число
+запросов в секунду.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Tuple
+
+SEARCHES = ['/books?genre=%D0%A0%D0%BE%D0%BC%D0%B0%D0%BD',
+            '/books?min_price=400&max_price=600',
+            '/books?title=%D0%B8&min_quantity=1',
+            '/books?year_from=1900']
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Перцентиль отсортированного списка значений"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def parse_mix(text: str) -> List[str]:
+    """Список видов запросов с повторениями по весам, например 'search:7,sell:2'"""
+    kinds = []
+    for part in text.split(','):
+        kind, _, weight = part.partition(':')
+        kinds.extend([kind.strip()] * int(weight or 1))
+    return kinds
+
+
+def build_request(kind: str, host: str, books: List[int], rng: random.Random) -> bytes:
+    """HTTP-запрос заданного вида"""
+    if kind == 'search':
+        method, path, body = 'GET', rng.choice(SEARCHES), b''
+    elif kind == 'stats':
+        method, path, body = 'GET', '/stats', b''
+    elif kind == 'sell':
+        method, path = 'POST', '/sales'
+        body = json.dumps({'book_id': rng.choice(books), 'quantity': 1,
+                           'customer_id': 1, 'employee_id': 1}).encode()
+    else:
+        raise ValueError(f"Неизвестный вид запроса: {kind}")
+
+    head = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+async def read_response(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """Чтение ответа сервиса: код и тело"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Сервис закрыл соединение")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def client(host: str, port: int, count: int, kinds: List[str], books: List[int],
+                 seed: int, latencies: Dict[str, List[float]], statuses: Dict[int, int]) -> None:
+    """Одно соединение, отправляющее count запросов подряд"""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(count):
+            kind = rng.choice(kinds)
+            request = build_request(kind, host, books, rng)
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, _ = await read_response(reader)
+            latencies[kind].append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run(host: str, port: int, connections: int, requests: int, mix: str) -> None:
+    """Запуск нагрузки и вывод результатов"""
+    kinds = parse_mix(mix)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /books?limit=1000000 HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n"
+                 .encode('latin-1'))
+    await writer.drain()
+    _, body = await read_response(reader)
+    writer.close()
+    books = [book['book_id'] for book in json.loads(body)['books']] or [1]
+
+    latencies: Dict[str, List[float]] = {kind: [] for kind in set(kinds)}
+    statuses: Dict[int, int] = {}
+    per_connection = max(1, requests // connections)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, per_connection, kinds, books, seed, latencies, statuses)
+                           for seed in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"Соединений: {connections}, запросов: {total}, время: {elapsed:.2f} с")
+    print(f"Пропускная способность: {total / elapsed:.0f} запросов/с")
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        print(f"{kind:>7}: {len(values):>7} запросов, p50 {percentile(values, 0.50) * 1000:.2f} мс, "
+              f"p99 {percentile(values, 0.99) * 1000:.2f} мс")
+    everything = sorted(value for values in latencies.values() for value in values)
+    print(f"{'все':>7}: p50 {percentile(everything, 0.50) * 1000:.2f} мс, "
+          f"p99 {percentile(everything, 0.99) * 1000:.2f} мс")
+    print("Коды ответов: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+
+
+def main():
+    """Разбор аргументов и запуск нагрузки"""
+    parser = argparse.ArgumentParser(description="Генератор нагрузки для сервиса книжного магазина")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=20000, help="общее число запросов")
+    parser.add_argument('--mix', default='search:7,sell:2,stats:1',
+                        help="виды запросов с весами: search, sell, stats")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.host, args.port, args.connections, args.requests, args.mix))
+
+
+if __name__ == "__main__":
+    main()
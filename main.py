@@ -2,14 +2,19 @@
 Главный модуль для запуска книжного магазина
 """
 
+import argparse
+
 from bookstore import Bookstore
 from manager import BookstoreManager
 from models import Book, Employee, Customer
+from journal import recover
+from sqlite_storage import SQLiteBookstore
 
 
-def create_initial_bookstore():
+def create_initial_bookstore(bookstore: Bookstore = None):
     """Создание начального магазина с демонстрационными данными"""
-    bookstore = Bookstore("Книжный магазин")
+    if bookstore is None:
+        bookstore = Bookstore("Книжный магазин")
 
     books_data = [
         ("Мастер и Маргарита", "Михаил Булгаков", "Роман", 450.0, 15, 1967),
@@ -53,17 +58,53 @@ def create_initial_bookstore():
     return bookstore
 
 
+def create_journaled_bookstore(data_dir: str, concurrent: bool = False) -> Bookstore:
+    """Восстановление магазина из каталога данных с журналом изменений"""
+    bookstore = Bookstore("Книжный магазин", concurrent=concurrent)
+    recover(bookstore, data_dir)
+
+    if not bookstore.books and not bookstore.employees and not bookstore.customers:
+        create_initial_bookstore(bookstore)
+
+    return bookstore
+
+
+def create_sqlite_bookstore(path: str) -> Bookstore:
+    """Открытие магазина, хранящегося в базе SQLite"""
+    bookstore = SQLiteBookstore("Книжный магазин", path)
+
+    if not bookstore.books and not bookstore.employees and not bookstore.customers:
+        create_initial_bookstore(bookstore)
+
+    return bookstore
+
+
 def main():
     """Главная функция"""
+    parser = argparse.ArgumentParser(description="Система управления книжным магазином")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--data-dir', help="каталог для контрольной точки и журнала изменений")
+    group.add_argument('--db', help="файл базы данных SQLite")
+    args = parser.parse_args()
+
     print("=" * 50)
     print("     СИСТЕМА УПРАВЛЕНИЯ КНИЖНЫМ МАГАЗИНОМ")
     print("=" * 50)
 
-    bookstore = create_initial_bookstore()
+    if args.data_dir:
+        bookstore = create_journaled_bookstore(args.data_dir)
+    elif args.db:
+        bookstore = create_sqlite_bookstore(args.db)
+    else:
+        bookstore = create_initial_bookstore()
     manager = BookstoreManager(bookstore)
 
     bookstore.display_info()
-    manager.interactive_mode()
+    try:
+        manager.interactive_mode()
+    finally:
+        if bookstore.journal is not None:
+            bookstore.journal.close()
 
 
 if __name__ == "__main__":
@@ -2,16 +2,37 @@
 Менеджер для интерактивного управления книжным магазином
 """
 
+import sys
+from itertools import islice
+from operator import attrgetter
+from typing import Dict, Iterable, List, Optional, TextIO
+
 from bookstore import Bookstore
 from models import Book, Employee, Customer
 from exceptions import *
 
+PAGE_SIZE = 20
+
+# Ключи сортировки списков: название для пользователя -> атрибут модели
+BOOK_SORT_KEYS = {'id': 'book_id', 'название': 'title', 'автор': 'author',
+                  'цена': 'price', 'год': 'year', 'количество': 'quantity'}
+CUSTOMER_SORT_KEYS = {'id': 'cust_id', 'имя': 'name', 'email': 'email'}
+EMPLOYEE_SORT_KEYS = {'id': 'emp_id', 'имя': 'name', 'должность': 'position', 'зарплата': 'salary'}
+SALE_SORT_KEYS = {'id': 'sale_id', 'дата': 'sale_date', 'сумма': 'total_price'}
+
 
 class BookstoreManager:
-    """Менеджер для управления книжным магазином с обработкой исключений"""
+    """Менеджер для управления книжным магазином с обработкой исключений
 
-    def __init__(self, bookstore: Bookstore):
+    Списки выводятся постранично по page_size строк: объекты перебираются
+    лениво, и каждая страница записывается в output одним вызовом.
+    """
+
+    def __init__(self, bookstore: Bookstore, page_size: int = PAGE_SIZE,
+                 output: Optional[TextIO] = None):
         self.bookstore = bookstore
+        self.page_size = page_size
+        self.output = output or sys.stdout
 
     def safe_execute(self, operation, *args, **kwargs):
         """Безопасное выполнение операций с обработкой исключений"""
@@ -42,6 +63,63 @@ class BookstoreManager:
             except ValueError:
                 print("Ошибка: введите целое число (например: 5)")
 
+    def _get_optional_number_input(self, prompt: str, cast):
+        """Ввод необязательного неотрицательного числа (пустой ввод - пропуск)"""
+        value_input = input(prompt).strip()
+        if not value_input:
+            return None
+
+        try:
+            value = cast(value_input)
+        except ValueError:
+            print("Неверный формат числа. Этот критерий будет проигнорирован.")
+            return None
+
+        if value < 0:
+            print("Значение не может быть отрицательным. Этот критерий будет проигнорирован.")
+            return None
+        return value
+
+    def _write(self, lines: List[str]) -> None:
+        """Вывод строк одной записью"""
+        self.output.write('\n'.join(lines) + '\n')
+        self.output.flush()
+
+    def _get_sort_key(self, keys: Dict[str, str]) -> Optional[str]:
+        """Выбор ключа сортировки списка (пустой ввод - порядок хранения)"""
+        choice = input(f"Сортировка ({', '.join(keys)}; Enter - без сортировки): ").strip().lower()
+        if not choice:
+            return None
+        if choice not in keys:
+            print("Неизвестный ключ сортировки. Список будет показан без сортировки.")
+            return None
+        return keys[choice]
+
+    def _show_paged(self, title: str, entities: Iterable, total: int,
+                    sort_key: Optional[str] = None) -> None:
+        """Постраничный вывод списка
+
+        Без сортировки объекты перебираются лениво и создаются только для
+        показанных страниц; сортировка выполняется один раз на весь список.
+        """
+        if sort_key is not None:
+            entities = sorted(entities, key=attrgetter(sort_key))
+
+        entities = iter(entities)
+        shown = 0
+        lines = [title]
+        while True:
+            page = [f"  {entity}" for entity in islice(entities, self.page_size)]
+            shown += len(page)
+            lines.extend(page)
+            lines.append(f"Показано {shown} из {total}")
+            self._write(lines)
+            if shown >= total or not page:
+                return
+            if input("Enter - следующая страница, q - закончить просмотр: ").strip().lower() == 'q':
+                return
+            lines = []
+
     def interactive_mode(self):
         """Интерактивный режим работы с магазином"""
         print(f"Добро пожаловать в систему управления '{self.bookstore.name}'!")
@@ -64,6 +142,8 @@ class BookstoreManager:
             print("13. Загрузить данные (JSON)")
             print("14. Загрузить данные (XML)")
             print("15. Информация о магазине")
+            if self.bookstore.journal is not None:
+                print("16. Сохранить контрольную точку журнала")
             print("0. Выход")
 
             choice = input("Выберите действие: ").strip()
@@ -98,6 +178,8 @@ class BookstoreManager:
                 self._load_xml_interactive()
             elif choice == '15':
                 self.safe_execute(self.bookstore.display_info)
+            elif choice == '16' and self.bookstore.journal is not None:
+                self.safe_execute(self.bookstore.checkpoint)
             elif choice == '0':
                 print("До свидания!")
                 break
@@ -110,9 +192,9 @@ class BookstoreManager:
             print("В магазине нет книг")
             return
 
-        print("\nКниги в магазине:")
-        for book in self.bookstore.books.values():
-            print(f"  {book}")
+        sort_key = self._get_sort_key(BOOK_SORT_KEYS)
+        self._show_paged("\nКниги в магазине:", self.bookstore.books.values(),
+                         len(self.bookstore.books), sort_key)
 
     def _show_customers(self):
         """Показать всех клиентов"""
@@ -120,9 +202,9 @@ class BookstoreManager:
             print("В базе нет клиентов")
             return
 
-        print("\nКлиенты магазина:")
-        for customer in self.bookstore.customers.values():
-            print(f"  {customer}")
+        sort_key = self._get_sort_key(CUSTOMER_SORT_KEYS)
+        self._show_paged("\nКлиенты магазина:", self.bookstore.customers.values(),
+                         len(self.bookstore.customers), sort_key)
 
     def _show_employees(self):
         """Показать всех сотрудников"""
@@ -130,9 +212,9 @@ class BookstoreManager:
             print("В базе нет сотрудников")
             return
 
-        print("\nСотрудники магазина:")
-        for employee in self.bookstore.employees.values():
-            print(f"  {employee}")
+        sort_key = self._get_sort_key(EMPLOYEE_SORT_KEYS)
+        self._show_paged("\nСотрудники магазина:", self.bookstore.employees.values(),
+                         len(self.bookstore.employees), sort_key)
 
     def _show_sales(self):
         """Показать все продажи"""
@@ -140,13 +222,51 @@ class BookstoreManager:
             print("Продаж пока не было")
             return
 
-        print("\nИстория продаж:")
-        total_revenue = 0
-        for sale in self.bookstore.sales.values():
-            print(f"  {sale}")
-            total_revenue += sale.total_price
+        sort_key = self._get_sort_key(SALE_SORT_KEYS)
+        self._show_paged("\nИстория продаж:", self.bookstore.sales.values(),
+                         len(self.bookstore.sales), sort_key)
+
+        print(f"\nОбщая выручка: {self.bookstore.get_total_revenue():.2f} руб.")
+
+    def _select_book(self, prompt: str) -> Optional[int]:
+        """Выбор книги по ID или поиском по части названия
+
+        Возвращает ID книги или None, если книга не выбрана.
+        """
+        query = input(prompt).strip()
+        if not query:
+            return None
+
+        # Число считается ID книги; если такой книги нет, это может быть название ("1984")
+        book = self.bookstore.books.get(int(query)) if query.isdigit() else None
+        if book is not None:
+            self._write([f"  {book}"])
+            return book.book_id
 
-        print(f"\nОбщая выручка: {total_revenue:.2f} руб.")
+        results = self.safe_execute(self.bookstore.search_books, title=query)
+        if not results:
+            print("Книги с таким ID или названием не найдены")
+            return None
+        if len(results) == 1:
+            self._write([f"  {results[0]}"])
+            return results[0].book_id
+
+        lines = [f"Найдено {len(results)} книг:"]
+        lines.extend(f"  {book}" for book in results[:self.page_size])
+        if len(results) > self.page_size:
+            lines.append(f"Показаны первые {self.page_size}; уточните название, если нужной книги нет")
+        self._write(lines)
+        return self._get_int_input("ID книги: ")
+
+    def _select_person(self, storage, prompt: str, missing: str) -> Optional[int]:
+        """Ввод ID клиента или сотрудника с проверкой и подтверждением имени"""
+        person_id = self._get_int_input(prompt)
+        person = storage.get(person_id)
+        if person is None:
+            print(missing.format(person_id))
+            return None
+        self._write([f"  {person}"])
+        return person_id
 
     def _add_book_interactive(self):
         """Интерактивное добавление книги"""
@@ -185,9 +305,10 @@ class BookstoreManager:
                 return
 
             print("\nУдаление книги:")
-            self._show_books()
+            book_id = self._select_book("ID книги или часть названия: ")
+            if book_id is None:
+                return
 
-            book_id = self._get_int_input("\nID книги для удаления: ")
             quantity = self._get_int_input("Количество для удаления: ")
 
             self.safe_execute(self.bookstore.remove_book, book_id, quantity)
@@ -204,18 +325,6 @@ class BookstoreManager:
         author = input("Автор: ").strip() or None
         genre = input("Жанр: ").strip() or None
 
-        max_price = None
-        max_price_input = input("Максимальная цена: ").strip()
-        if max_price_input:
-            try:
-                max_price = float(max_price_input)
-                if max_price <= 0:
-                    print("Цена должна быть положительной. Этот критерий будет проигнорирован.")
-                    max_price = None
-            except ValueError:
-                print("Неверный формат цены. Этот критерий будет проигнорирован.")
-                max_price = None
-
         criteria = {}
         if title:
             criteria['title'] = title
@@ -223,15 +332,24 @@ class BookstoreManager:
             criteria['author'] = author
         if genre:
             criteria['genre'] = genre
-        if max_price:
-            criteria['max_price'] = max_price
+
+        numeric_criteria = [
+            ('min_price', "Минимальная цена: ", float),
+            ('max_price', "Максимальная цена: ", float),
+            ('year_from', "Год издания от: ", int),
+            ('year_to', "Год издания до: ", int),
+            ('max_quantity', "Количество в наличии не более: ", int),
+        ]
+        for key, prompt, cast in numeric_criteria:
+            value = self._get_optional_number_input(prompt, cast)
+            if value is not None:
+                criteria[key] = value
 
         results = self.safe_execute(self.bookstore.search_books, **criteria)
 
         if results:
-            print(f"\nНайдено {len(results)} книг:")
-            for book in results:
-                print(f"  {book}")
+            sort_key = self._get_sort_key(BOOK_SORT_KEYS)
+            self._show_paged(f"\nНайдено {len(results)} книг:", results, len(results), sort_key)
         else:
             print("Книги по заданным критериям не найдены")
 
@@ -244,27 +362,28 @@ class BookstoreManager:
                 print("В магазине нет книг для продажи")
                 return
 
-            print("\nДоступные книги:")
-            self._show_books()
-
             if not self.bookstore.customers:
                 print("В базе нет клиентов. Сначала добавьте клиента.")
                 return
 
-            print("\nДоступные клиенты:")
-            self._show_customers()
-
             if not self.bookstore.employees:
                 print("В базе нет сотрудников. Сначала добавьте сотрудника.")
                 return
 
-            print("\nДоступные сотрудники:")
-            self._show_employees()
+            book_id = self._select_book("ID книги или часть названия: ")
+            if book_id is None:
+                return
 
-            book_id = self._get_int_input("\nID книги для продажи: ")
             quantity = self._get_int_input("Количество: ")
-            customer_id = self._get_int_input("ID клиента: ")
-            employee_id = self._get_int_input("ID сотрудника: ")
+            customer_id = self._select_person(self.bookstore.customers, "ID клиента: ",
+                                              "Клиент с ID {} не найден")
+            if customer_id is None:
+                return
+
+            employee_id = self._select_person(self.bookstore.employees, "ID сотрудника: ",
+                                              "Сотрудник с ID {} не найден")
+            if employee_id is None:
+                return
 
             sale = self.safe_execute(self.bookstore.sell_book, book_id, quantity, customer_id, employee_id)
             if sale is not None:
@@ -2,20 +2,42 @@
 Основные классы предметной области
 """
 
+import sys
 from datetime import datetime
 from typing import List, Dict
 from exceptions import *
 
 
+def to_kopecks(amount: float) -> int:
+    """Перевод суммы в рублях в целое число копеек"""
+    return int(round(amount * 100))
+
+
+def from_kopecks(kopecks: int) -> float:
+    """Перевод целого числа копеек в рубли"""
+    return kopecks / 100
+
+
+def _intern(value):
+    """Интернирование повторяющейся строки (другие значения не изменяются)"""
+    return sys.intern(value) if type(value) is str else value
+
+
 class Book:
-    """Класс для представления книги"""
+    """Класс для представления книги
+
+    Атрибуты хранятся в слотах. Автор и жанр повторяются у многих книг,
+    поэтому интернируются: одинаковые строки разделяют один объект.
+    """
+
+    __slots__ = ('book_id', 'title', 'author', 'genre', 'price', 'quantity', 'year')
 
     def __init__(self, book_id: int, title: str, author: str, genre: str,
                  price: float, quantity: int, year: int):
         self.book_id = book_id
         self.title = title
-        self.author = author
-        self.genre = genre
+        self.author = _intern(author)
+        self.genre = _intern(genre)
         self.price = price
         self.quantity = quantity
         self.year = year
@@ -64,6 +86,20 @@ class Book:
             year=data['year']
         )
 
+    @classmethod
+    def from_checked(cls, book_id: int, title: str, author: str, genre: str,
+                     price: float, quantity: int, year: int) -> 'Book':
+        """Создание книги из уже проверенных значений без повторной валидации"""
+        book = cls.__new__(cls)
+        book.book_id = book_id
+        book.title = title
+        book.author = _intern(author)
+        book.genre = _intern(genre)
+        book.price = price
+        book.quantity = quantity
+        book.year = year
+        return book
+
     def __str__(self):
         return f"ID: {self.book_id} | '{self.title}' - {self.author} | Жанр: {self.genre} | {self.price} руб. | В наличии: {self.quantity} | Год: {self.year}"
 
@@ -71,10 +107,12 @@ class Book:
 class Employee:
     """Класс для представления сотрудника"""
 
+    __slots__ = ('emp_id', 'name', 'position', 'salary')
+
     def __init__(self, emp_id: int, name: str, position: str, salary: float):
         self.emp_id = emp_id
         self.name = name
-        self.position = position
+        self.position = _intern(position)
         self.salary = salary
 
         self._validate_data()
@@ -109,6 +147,16 @@ class Employee:
             salary=data['salary']
         )
 
+    @classmethod
+    def from_checked(cls, emp_id: int, name: str, position: str, salary: float) -> 'Employee':
+        """Создание сотрудника из уже проверенных значений без повторной валидации"""
+        employee = cls.__new__(cls)
+        employee.emp_id = emp_id
+        employee.name = name
+        employee.position = _intern(position)
+        employee.salary = salary
+        return employee
+
     def __str__(self):
         return f"ID: {self.emp_id} | {self.name} - {self.position} | Зарплата: {self.salary} руб."
 
@@ -116,6 +164,8 @@ class Employee:
 class Customer:
     """Класс для представления клиента"""
 
+    __slots__ = ('cust_id', 'name', 'email', 'phone')
+
     def __init__(self, cust_id: int, name: str, email: str, phone: str):
         self.cust_id = cust_id
         self.name = name
@@ -154,6 +204,16 @@ class Customer:
             phone=data['phone']
         )
 
+    @classmethod
+    def from_checked(cls, cust_id: int, name: str, email: str, phone: str) -> 'Customer':
+        """Создание клиента из уже проверенных значений без повторной валидации"""
+        customer = cls.__new__(cls)
+        customer.cust_id = cust_id
+        customer.name = name
+        customer.email = email
+        customer.phone = phone
+        return customer
+
     def __str__(self):
         return f"ID: {self.cust_id} | {self.name} | {self.email} | {self.phone}"
 
@@ -161,6 +221,9 @@ class Customer:
 class Sale:
     """Класс для представления продажи"""
 
+    __slots__ = ('sale_id', 'book_id', 'customer_id', 'employee_id',
+                 'quantity', 'total_price', 'sale_date')
+
     def __init__(self, sale_id: int, book_id: int, customer_id: int,
                  employee_id: int, quantity: int, total_price: float,
                  sale_date: datetime = None):
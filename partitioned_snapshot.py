@@ -0,0 +1,293 @@
+"""
+Секционированный снимок магазина: каталог файлов-секций с манифестом
+
+Разделы книг, сотрудников, клиентов и продаж независимы, поэтому каждый
+раздел делится на секции по PARTITION_ROWS строк (продажи - диапазонами
+sale_id по возрастанию), и каждая секция хранится в отдельном JSON файле
+в колоночном виде. Манифест manifest.json перечисляет секции с числом
+строк и диапазоном ID. Каждое сохранение пишет секции нового поколения
+рядом с прежними и атомарно заменяет манифест последним, поэтому
+прерванное сохранение оставляет целым предыдущий снимок; секции прежних
+поколений удаляются после замены манифеста.
+
+Секции сериализуются и разбираются параллельно в пуле процессов;
+основной процесс только раздает колонки и размещает полученные колонки
+в магазине пакетными методами _restore_*. Объекты проверяются в рабочих
+процессах, поэтому в основном процессе создаются без повторной проверки.
+"""
+
+import json
+import os
+import re
+import uuid
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from operator import lt
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import compression
+from models import Book, Employee, Customer
+from ledger import SalesLedger
+from exceptions import FileOperationError
+
+FORMAT = 'bookstore-partitioned'
+MANIFEST = 'manifest.json'
+
+# Строк в одной секции: секций должно хватать на все ядра при загрузке
+PARTITION_ROWS = 250_000
+
+# Раздел -> (модель, поля в порядке конструктора, метод пакетного размещения)
+# Продажи хранятся колонками журнала продаж: суммы в копейках, даты в микросекундах
+SECTIONS = {
+    'books': (Book, ('book_id', 'title', 'author', 'genre', 'price', 'quantity', 'year'),
+              '_restore_books'),
+    'employees': (Employee, ('emp_id', 'name', 'position', 'salary'), '_restore_employees'),
+    'customers': (Customer, ('cust_id', 'name', 'email', 'phone'), '_restore_customers'),
+    'sales': (None, SalesLedger.COLUMNS, '_restore_sale_columns'),
+}
+
+# Имя файла секции: раздел, поколение снимка, номер секции и необязательное расширение сжатия
+PARTITION_FILE = re.compile(r'^(books|employees|customers|sales)-\d+-\d{5}\.json(\.gz|\.bz2|\.xz)?$')
+
+
+def _partition_name(section: str, generation: int, number: int, codec: Optional[str]) -> str:
+    """Имя файла секции"""
+    suffix = compression.CODECS[codec].extension if codec else ''
+    return f"{section}-{generation}-{number:05d}.json{suffix}"
+
+
+def _chunks(columns: Sequence[Sequence], rows: int, size: int) -> Iterator[List[Sequence]]:
+    """Колонки, нарезанные на секции по size строк"""
+    for start in range(0, rows, size):
+        stop = min(start + size, rows)
+        yield [column[start:stop] for column in columns]
+
+
+def _entity_columns(entities, fields: Sequence[str]) -> List[list]:
+    """Колонки значений полей сущностей"""
+    entities = list(entities)
+    return [[getattr(entity, field) for entity in entities] for field in fields]
+
+
+def _sale_columns(sales) -> List[array]:
+    """Колонки продаж журнала в порядке возрастания sale_id"""
+    if isinstance(sales, SalesLedger):
+        columns = sales._columns()
+    else:
+        rows = [SalesLedger._values(sale) for sale in sales.values()]
+        columns = [array('q', [row[index] for row in rows]) for index in range(len(SalesLedger.COLUMNS))]
+    sale_ids = columns[0]
+    if all(map(lt, sale_ids, islice(sale_ids, 1, None))):
+        return columns
+    order = sorted(range(len(sale_ids)), key=sale_ids.__getitem__)
+    return [array('q', [column[row] for row in order]) for column in columns]
+
+
+def _write_partition(path: str, section: str, columns: List[Sequence]) -> None:
+    """Запись секции (выполняется в рабочем процессе)"""
+    data = {
+        'section': section,
+        'fields': list(SECTIONS[section][1]),
+        'columns': [column.tolist() if isinstance(column, array) else column for column in columns],
+    }
+    with compression.open_text(path, 'w') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def _read_partition(path: str, section: str, rows: int, first_id: Optional[int],
+                    last_id: Optional[int]) -> List[Sequence]:
+    """Разбор и проверка секции (выполняется в рабочем процессе)
+
+    Возвращает колонки секции: для продаж - массивы журнала продаж, для
+    остальных разделов - списки значений, уже проверенные конструктором
+    модели.
+    """
+    model, fields, _ = SECTIONS[section]
+    with compression.open_text(path) as f:
+        data = json.load(f)
+
+    if data.get('section') != section or data.get('fields') != list(fields):
+        raise ValueError(f"Файл {path} не является секцией раздела {section}")
+    columns = data['columns']
+    if any(len(column) != rows for column in columns):
+        raise ValueError(f"Число строк секции {path} не совпадает с манифестом")
+
+    if model is None:
+        columns = [array('q', column) for column in columns]
+        sale_ids = columns[0]
+        if not all(map(lt, sale_ids, islice(sale_ids, 1, None))):
+            raise ValueError(f"ID продаж секции {path} не возрастают")
+    else:
+        for row in zip(*columns):
+            model(*row)
+        sale_ids = columns[0]
+
+    if rows and (sale_ids[0] != first_id or sale_ids[-1] != last_id):
+        raise ValueError(f"Диапазон ID секции {path} не совпадает с манифестом")
+    return columns
+
+
+class _InProcess:
+    """Замена пула процессов для одного рабочего: секции обрабатываются по очереди"""
+
+    def map(self, function, *iterables):
+        return map(function, *iterables)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _pool(workers: int):
+    """Пул процессов или последовательная обработка при workers == 1"""
+    if workers > 1:
+        return ProcessPoolExecutor(workers)
+    return _InProcess()
+
+
+def _write_manifest(directory: str, manifest: Dict) -> None:
+    """Атомарная запись манифеста"""
+    path = os.path.join(directory, MANIFEST)
+    temp_path = os.path.join(directory, '.tmp-' + MANIFEST)
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def _remove_stale(directory: str, files: List[str]) -> None:
+    """Удаление секций предыдущих снимков, не вошедших в манифест"""
+    keep = set(files)
+    for name in os.listdir(directory):
+        if name not in keep and PARTITION_FILE.match(name):
+            os.remove(os.path.join(directory, name))
+
+
+def save(bookstore, directory: str, workers: Optional[int] = None,
+         partition_rows: int = PARTITION_ROWS, codec: Optional[str] = None) -> Dict:
+    """Сохранение магазина в каталог секций; возвращает манифест
+
+    workers - число рабочих процессов (по умолчанию - число ядер),
+    codec - необязательное сжатие файлов секций ('gzip', 'bz2', 'xz').
+    """
+    if codec is not None and codec not in compression.CODECS:
+        raise FileOperationError(f"Неизвестный кодек сжатия: {codec}")
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(directory, exist_ok=True)
+    try:
+        generation = read_manifest(directory)['generation'] + 1
+    except (OSError, ValueError, KeyError, FileOperationError):
+        generation = 1
+
+    manifest = {
+        'format': FORMAT,
+        # Различает снимки с одинаковыми счетчиками и диапазонами секций
+        'snapshot_id': uuid.uuid4().hex,
+        'generation': generation,
+        'name': bookstore.name,
+        'journal_seq': bookstore._journal_seq,
+        'partitions': [],
+    }
+    paths, sections, parts = [], [], []
+    for section, (_, fields, _) in SECTIONS.items():
+        if section == 'sales':
+            columns = _sale_columns(bookstore.sales)
+        else:
+            columns = _entity_columns(getattr(bookstore, section).values(), fields)
+        rows = len(columns[0])
+        for number, part in enumerate(_chunks(columns, rows, partition_rows)):
+            name = _partition_name(section, generation, number, codec)
+            manifest['partitions'].append({
+                'section': section,
+                'file': name,
+                'rows': len(part[0]),
+                'first_id': part[0][0],
+                'last_id': part[0][-1],
+            })
+            paths.append(os.path.join(directory, name))
+            sections.append(section)
+            parts.append(part)
+
+    # Счетчики берутся после колонок: выданные ID не могут оказаться больше них
+    manifest['ids'] = bookstore.ids.state()
+
+    with _pool(workers) as pool:
+        # Результаты перебираются, чтобы ошибки рабочих процессов дошли до вызывающего
+        for _ in pool.map(_write_partition, paths, sections, parts):
+            pass
+
+    _write_manifest(directory, manifest)
+    _remove_stale(directory, [entry['file'] for entry in manifest['partitions']])
+    return manifest
+
+
+def read_manifest(directory: str) -> Dict:
+    """Манифест секционированного снимка"""
+    with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT:
+        raise FileOperationError(f"Каталог {directory} не является секционированным снимком")
+    return manifest
+
+
+def _check_partitions(partitions: List[Dict]) -> None:
+    """Проверка строк манифеста до загрузки
+
+    Файл секции должен лежать в каталоге снимка и относиться к своему
+    разделу, а диапазоны sale_id секций продаж - возрастать без
+    пересечений: журнал продаж заполняется по порядку ID.
+    """
+    last_sale_id = 0
+    for entry in partitions:
+        section, name = entry.get('section'), entry.get('file')
+        match = PARTITION_FILE.match(name) if isinstance(name, str) else None
+        if match is None or match.group(1) != section:
+            raise FileOperationError(f"Неверная секция в манифесте: {name}")
+        rows = entry.get('rows')
+        if not isinstance(rows, int) or isinstance(rows, bool) or rows < 0:
+            raise FileOperationError(f"Неверное число строк секции {name}")
+        if section == 'sales' and rows:
+            if not last_sale_id < entry['first_id'] <= entry['last_id']:
+                raise FileOperationError(f"Диапазон ID секции {name} пересекается с предыдущими")
+            last_sale_id = entry['last_id']
+
+
+def load(bookstore, directory: str, workers: Optional[int] = None, progress=None) -> None:
+    """Загрузка магазина из каталога секций
+
+    Секции разбираются в пуле из workers процессов (по умолчанию - число
+    ядер) и размещаются в магазине по мере готовности в порядке манифеста.
+    progress(section, rows) вызывается после размещения каждой секции.
+    """
+    manifest = read_manifest(directory)
+    workers = workers or os.cpu_count() or 1
+    partitions = manifest['partitions']
+    _check_partitions(partitions)
+
+    bookstore._clear_data()
+    bookstore.name = manifest['name']
+    loaded = dict.fromkeys(SECTIONS, 0)
+
+    with _pool(workers) as pool:
+        results = pool.map(_read_partition,
+                           [os.path.join(directory, entry['file']) for entry in partitions],
+                           [entry['section'] for entry in partitions],
+                           [entry['rows'] for entry in partitions],
+                           [entry['first_id'] for entry in partitions],
+                           [entry['last_id'] for entry in partitions])
+        for entry, columns in zip(partitions, results):
+            section = entry['section']
+            model, _, restore = SECTIONS[section]
+            if model is None:
+                getattr(bookstore, restore)(*columns)
+            else:
+                build = model.from_checked
+                getattr(bookstore, restore)([build(*row) for row in zip(*columns)])
+            loaded[section] += entry['rows']
+            if progress is not None:
+                progress(section, loaded[section])
+
+    bookstore.ids.restore(manifest['ids'])
+    bookstore._journal_seq = manifest['journal_seq']
@@ -0,0 +1,320 @@
+"""
+HTTP/JSON сервис книжного магазина на asyncio
+
+Запуск: python service.py [--host HOST] [--port PORT] [--data-dir DIR]
+                          [--snapshot-dir DIR] [--snapshot-interval SECONDS] [--quiet]
+
+Маршруты:
+    GET  /books      поиск книг; параметры запроса - критерии search_books и limit
+    POST /books      добавление книги: {"title", "author", "genre", "price", "quantity", "year"}
+    POST /sales      продажа: {"book_id", "quantity", "customer_id", "employee_id"}
+                     или пакетная продажа: {"lines": [[book_id, quantity], ...], ...}
+    GET  /stats      сводка по магазину (и состояние снимков по расписанию)
+    POST /snapshots  сохранение снимка: {"name": "имя.json|.xml|.bin"}
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from bookstore import Bookstore
+import background_snapshot
+from background_snapshot import BackgroundSnapshots, SNAPSHOT_FORMATS
+from compression import snapshot_extension
+from models import Book
+from events import NullSink
+from exceptions import *
+
+# Критерии поиска с числовыми значениями и их типы
+NUMERIC_CRITERIA = {
+    'min_price': float, 'max_price': float,
+    'year_from': int, 'year_to': int,
+    'min_quantity': int, 'max_quantity': int,
+}
+TEXT_CRITERIA = ('title', 'author', 'genre')
+DEFAULT_LIMIT = 100
+MAX_BODY_SIZE = 1 << 20
+
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    """Ошибка запроса с кодом ответа HTTP"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def capture_snapshot(bookstore: Bookstore) -> Bookstore:
+    """Копия данных магазина на текущий момент для сохранения в фоне
+
+    Под блокировкой записи выполняется только захват состояния с
+    копированием при записи (background_snapshot.StateCapture); книги и
+    продажи копируются после ее освобождения, не задерживая продажи.
+    """
+    return background_snapshot.capture(bookstore, bookstore.events)
+
+
+class BookstoreService:
+    """HTTP/JSON сервис над общим магазином
+
+    Сводка читается прямо в цикле событий. Поиск по подстроке просматривает
+    весь каталог и может повторяться под блокировкой записи, а изменения
+    ждут блокировок и записи журнала на диск, поэтому они выполняются в
+    пуле потоков; сохранение снимка тоже уходит в пул и не задерживает
+    другие запросы. При snapshot_interval снимок scheduled.json в snapshot_dir
+    сохраняется в фоне каждые snapshot_interval секунд. Соединения
+    поддерживают keep-alive.
+    """
+
+    def __init__(self, bookstore: Bookstore, snapshot_dir: str = '.', workers: int = 8,
+                 snapshot_interval: Optional[float] = None):
+        if not bookstore.concurrent:
+            raise BookstoreError("Сервису нужен магазин в конкурентном режиме")
+        self.bookstore = bookstore
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_interval = snapshot_interval
+        self.scheduled = BackgroundSnapshots(bookstore, os.path.join(snapshot_dir, 'scheduled.json'))
+        self.executor = ThreadPoolExecutor(workers)
+        self.routes = {
+            ('GET', '/books'): self.search_books,
+            ('POST', '/books'): self.add_book,
+            ('POST', '/sales'): self.sell,
+            ('GET', '/stats'): self.stats,
+            ('POST', '/snapshots'): self.snapshot,
+        }
+
+    async def _in_executor(self, operation, *args):
+        """Выполнение операции в пуле потоков"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, operation, *args)
+
+    # Обработчики маршрутов
+
+    async def search_books(self, query: Dict, body: Dict) -> Tuple[int, Dict]:
+        """Поиск книг по критериям из строки запроса"""
+        criteria = {}
+        try:
+            for name, value in query.items():
+                if name in TEXT_CRITERIA:
+                    criteria[name] = value
+                elif name in NUMERIC_CRITERIA:
+                    criteria[name] = NUMERIC_CRITERIA[name](value)
+                elif name != 'limit':
+                    raise HTTPError(400, f"Неизвестный критерий поиска: {name}")
+            limit = int(query.get('limit', DEFAULT_LIMIT))
+        except ValueError as e:
+            raise HTTPError(400, f"Неверное значение критерия: {e}")
+
+        def search():
+            books = self.bookstore.search_books(**criteria)
+            return {'total': len(books), 'books': [book.to_dict() for book in books[:limit]]}
+
+        return 200, await self._in_executor(search)
+
+    async def add_book(self, query: Dict, body: Dict) -> Tuple[int, Dict]:
+        """Добавление книги"""
+        try:
+            book = Book(0, body['title'], body['author'], body['genre'],
+                        float(body['price']), int(body['quantity']), int(body['year']))
+        except KeyError as e:
+            raise HTTPError(400, f"Не указано поле {e}")
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, str(e))
+
+        await self._in_executor(self.bookstore.add_book, book)
+        return 201, {'book': book.to_dict()}
+
+    async def sell(self, query: Dict, body: Dict) -> Tuple[int, Dict]:
+        """Продажа одной книги или пакетная продажа"""
+        try:
+            customer_id = int(body['customer_id'])
+            employee_id = int(body['employee_id'])
+            if 'lines' in body:
+                lines = [(int(book_id), int(quantity)) for book_id, quantity in body['lines']]
+                sales = await self._in_executor(self.bookstore.sell_books_bulk, lines,
+                                                customer_id, employee_id)
+            else:
+                sales = [await self._in_executor(self.bookstore.sell_book, int(body['book_id']),
+                                                 int(body['quantity']), customer_id, employee_id)]
+        except KeyError as e:
+            raise HTTPError(400, f"Не указано поле {e}")
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, str(e))
+
+        return 201, {'sales': [sale.to_dict() for sale in sales]}
+
+    async def stats(self, query: Dict, body: Dict) -> Tuple[int, Dict]:
+        """Сводка по магазину"""
+        bookstore = self.bookstore
+        return 200, {
+            'name': bookstore.name,
+            'books': len(bookstore.books),
+            'employees': len(bookstore.employees),
+            'customers': len(bookstore.customers),
+            'sales': len(bookstore.sales),
+            'inventory_value': bookstore.get_inventory_value(),
+            'revenue': bookstore.get_total_revenue(),
+            'scheduled_snapshots': self.scheduled.status(),
+        }
+
+    async def snapshot(self, query: Dict, body: Dict) -> Tuple[int, Dict]:
+        """Сохранение снимка магазина без остановки обслуживания"""
+        name = os.path.basename(str(body.get('name', 'snapshot.json')))
+        method = SNAPSHOT_FORMATS.get(snapshot_extension(name))
+        if method is None:
+            raise HTTPError(400, f"Неизвестный формат снимка: {name}")
+
+        path = os.path.join(self.snapshot_dir, name)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        snapshot = await self._in_executor(capture_snapshot, self.bookstore)
+        await self._in_executor(getattr(snapshot, method), path)
+        return 201, {'path': path, 'sales': len(snapshot.sales),
+                     'seconds': round(loop.time() - start, 3)}
+
+    # HTTP
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Dict]:
+        """Выполнение запроса; возвращает код ответа и тело ответа"""
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        try:
+            if handler is None:
+                if any(path == url.path for _, path in self.routes):
+                    raise HTTPError(405, f"Метод {method} не поддерживается для {url.path}")
+                raise HTTPError(404, f"Маршрут {url.path} не найден")
+
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError as e:
+                raise HTTPError(400, f"Неверный JSON: {e}")
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "Тело запроса должно быть JSON-объектом")
+
+            return await handler(dict(parse_qsl(url.query)), payload)
+
+        except HTTPError as e:
+            return e.status, {'error': str(e)}
+        except (BookNotFoundError, CustomerNotFoundError, EmployeeNotFoundError) as e:
+            return 404, {'error': str(e)}
+        except InsufficientQuantityError as e:
+            return 409, {'error': str(e)}
+        except BookstoreError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f"Внутренняя ошибка: {e}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Обслуживание одного соединения (несколько запросов при keep-alive)"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    length = int(headers.get('content-length', 0))
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await self._respond(writer, 400, {'error': "Неверный HTTP-запрос"}, False)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, {'error': "Слишком большое тело запроса"}, False)
+                    break
+
+                body = await reader.readexactly(length) if length else b''
+                keep_alive = (version == 'HTTP/1.1' and
+                              headers.get('connection', '').lower() != 'close')
+
+                status, payload = await self.dispatch(method, target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload: Dict,
+                       keep_alive: bool) -> None:
+        """Отправка JSON-ответа"""
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8080) -> None:
+        """Запуск сервиса до отмены задачи"""
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Сервис магазина слушает http://{host}:{port}")
+        if self.snapshot_interval:
+            self.scheduled.start(self.snapshot_interval)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.scheduled.stop()
+            self.executor.shutdown(wait=True)
+
+
+def main():
+    """Запуск сервиса из командной строки"""
+    from main import create_initial_bookstore, create_journaled_bookstore
+
+    parser = argparse.ArgumentParser(description="HTTP/JSON сервис книжного магазина")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--data-dir', help="каталог для контрольной точки и журнала изменений")
+    parser.add_argument('--snapshot-dir', default='.', help="каталог для снимков POST /snapshots")
+    parser.add_argument('--snapshot-interval', type=float,
+                        help="интервал фонового сохранения снимка scheduled.json в секундах")
+    parser.add_argument('--workers', type=int, default=8, help="число потоков для изменений")
+    parser.add_argument('--quiet', action='store_true', help="не выводить сообщения об операциях")
+    args = parser.parse_args()
+
+    if args.data_dir:
+        bookstore = create_journaled_bookstore(args.data_dir, concurrent=True)
+    else:
+        bookstore = create_initial_bookstore(Bookstore("Книжный магазин", concurrent=True))
+
+    if args.quiet:
+        bookstore.events = NullSink()
+
+    service = BookstoreService(bookstore, args.snapshot_dir, args.workers, args.snapshot_interval)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if bookstore.journal is not None:
+            bookstore.journal.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+"""
+Хранение данных книжного магазина в базе SQLite
+"""
+
+import sqlite3
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bookstore import Bookstore, ROLLING_WINDOWS
+from indexes import BookIndex
+from models import Book, Employee, Customer, Sale, to_kopecks, from_kopecks
+from ledger import from_timestamp
+from csv_import import BATCH_SIZE, ImportReport
+from exceptions import *
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+CREATE TABLE IF NOT EXISTS books (
+    book_id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    genre TEXT NOT NULL,
+    price REAL NOT NULL,
+    quantity INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    title_lc TEXT NOT NULL,
+    author_lc TEXT NOT NULL,
+    genre_lc TEXT NOT NULL,
+    price_kopecks INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS books_price ON books (price);
+CREATE INDEX IF NOT EXISTS books_year ON books (year);
+CREATE INDEX IF NOT EXISTS books_quantity ON books (quantity);
+CREATE TABLE IF NOT EXISTS employees (
+    emp_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    position TEXT NOT NULL,
+    salary REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS customers (
+    cust_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    phone TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sales (
+    sale_id INTEGER PRIMARY KEY,
+    book_id INTEGER NOT NULL,
+    customer_id INTEGER NOT NULL,
+    employee_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    total_price REAL NOT NULL,
+    sale_date TEXT NOT NULL,
+    total_kopecks INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sales_customer ON sales (customer_id);
+CREATE INDEX IF NOT EXISTS sales_employee ON sales (employee_id);
+CREATE INDEX IF NOT EXISTS sales_book ON sales (book_id);
+CREATE INDEX IF NOT EXISTS sales_date ON sales (sale_date);
+"""
+
+# Триграммный индекс текстовых полей книг для поиска подстроки. Поля уже
+# приведены к нижнему регистру, поэтому индекс сравнивает их как есть.
+# Индекс хранит только триграммы (content='books') и поддерживается
+# триггерами; замена строки через INSERT OR REPLACE вызывает триггер
+# удаления только при recursive_triggers.
+FTS_SCHEMA = """
+PRAGMA recursive_triggers = ON;
+CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+    title_lc, author_lc, genre_lc,
+    content='books', content_rowid='book_id', tokenize='trigram case_sensitive 1'
+);
+CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+    INSERT INTO books_fts (rowid, title_lc, author_lc, genre_lc)
+    VALUES (new.book_id, new.title_lc, new.author_lc, new.genre_lc);
+END;
+CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+    INSERT INTO books_fts (books_fts, rowid, title_lc, author_lc, genre_lc)
+    VALUES ('delete', old.book_id, old.title_lc, old.author_lc, old.genre_lc);
+END;
+CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title_lc, author_lc, genre_lc ON books BEGIN
+    INSERT INTO books_fts (books_fts, rowid, title_lc, author_lc, genre_lc)
+    VALUES ('delete', old.book_id, old.title_lc, old.author_lc, old.genre_lc);
+    INSERT INTO books_fts (rowid, title_lc, author_lc, genre_lc)
+    VALUES (new.book_id, new.title_lc, new.author_lc, new.genre_lc);
+END;
+"""
+
+# Триграммы строятся по три символа: более короткая подстрока ищется просмотром
+TRIGRAM = 3
+
+BOOK_COLUMNS = ('book_id', 'title', 'author', 'genre', 'price', 'quantity', 'year')
+EMPLOYEE_COLUMNS = ('emp_id', 'name', 'position', 'salary')
+CUSTOMER_COLUMNS = ('cust_id', 'name', 'email', 'phone')
+SALE_COLUMNS = ('sale_id', 'book_id', 'customer_id', 'employee_id', 'quantity',
+                'total_price', 'sale_date')
+
+# Сохраняемые в таблице meta атрибуты магазина
+META_ATTRIBUTES = ('name', '_next_book_id', '_next_emp_id', '_next_cust_id',
+                   '_next_sale_id', '_journal_seq')
+
+
+def _book_row(book: Book) -> tuple:
+    """Строка таблицы books для книги"""
+    return (book.book_id, book.title, book.author, book.genre, book.price,
+            book.quantity, book.year, book.title.lower(), book.author.lower(),
+            book.genre.lower(), to_kopecks(book.price))
+
+
+def _employee_row(employee: Employee) -> tuple:
+    """Строка таблицы employees для сотрудника"""
+    return (employee.emp_id, employee.name, employee.position, employee.salary)
+
+
+def _customer_row(customer: Customer) -> tuple:
+    """Строка таблицы customers для клиента"""
+    return (customer.cust_id, customer.name, customer.email, customer.phone)
+
+
+def _sale_row(sale: Sale) -> tuple:
+    """Строка таблицы sales для продажи"""
+    return (sale.sale_id, sale.book_id, sale.customer_id, sale.employee_id,
+            sale.quantity, sale.total_price, sale.sale_date.isoformat(),
+            to_kopecks(sale.total_price))
+
+
+def _fts_phrase(field: str, text: str) -> str:
+    """Запрос FTS5: подстрока text в поле field (кавычки удваиваются)"""
+    quoted = text.replace('"', '""')
+    return f'{field} : "{quoted}"'
+
+
+def _row_factory(model) -> Callable:
+    """Функция создания объекта модели из строки таблицы"""
+    return lambda row: model(*row)
+
+
+def _sale_from_row(row: Sequence) -> Sale:
+    """Создание продажи из строки таблицы sales"""
+    *fields, sale_date = row
+    return Sale(*fields, sale_date=datetime.fromisoformat(sale_date))
+
+
+class SQLiteTable(MutableMapping):
+    """Словарь "ID -> объект модели", хранящийся в таблице SQLite
+
+    Объекты создаются при каждом обращении, поэтому изменения атрибутов
+    полученного объекта в базу не попадают: изменять данные нужно через
+    методы магазина.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, table: str, columns: Sequence[str],
+                 factory: Callable, to_row: Callable):
+        self._conn = conn
+        self._table = table
+        self._key = columns[0]
+        self._select = f"SELECT {', '.join(columns)} FROM {table}"
+        self._factory = factory
+        self._to_row = to_row
+        self._insert = None
+
+    def __getitem__(self, key: int):
+        row = self._conn.execute(f"{self._select} WHERE {self._key} = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return self._factory(row)
+
+    def __setitem__(self, key: int, value) -> None:
+        row = self._to_row(value)
+        if self._insert is None:
+            self._insert = f"INSERT OR REPLACE INTO {self._table} VALUES ({', '.join('?' * len(row))})"
+        self._conn.execute(self._insert, row)
+
+    def __delitem__(self, key: int) -> None:
+        cursor = self._conn.execute(f"DELETE FROM {self._table} WHERE {self._key} = ?", (key,))
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return self._conn.execute(f"SELECT 1 FROM {self._table} WHERE {self._key} = ?",
+                                  (key,)).fetchone() is not None
+
+    def __iter__(self):
+        for (key,) in self._conn.execute(f"SELECT {self._key} FROM {self._table} ORDER BY {self._key}"):
+            yield key
+
+    def __len__(self) -> int:
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+
+    def values(self):
+        """Все объекты таблицы одним запросом"""
+        for row in self._conn.execute(f"{self._select} ORDER BY {self._key}"):
+            yield self._factory(row)
+
+    def items(self):
+        """Пары (ID, объект) одним запросом"""
+        for entity in self.values():
+            yield getattr(entity, self._key), entity
+
+    def query(self, where: str, params: Sequence = ()) -> List:
+        """Объекты, удовлетворяющие условию WHERE"""
+        return [self._factory(row) for row in
+                self._conn.execute(f"{self._select} WHERE {where} ORDER BY {self._key}", params)]
+
+    def clear(self) -> None:
+        self._conn.execute(f"DELETE FROM {self._table}")
+
+
+class SQLiteBookstore(Bookstore):
+    """Книжный магазин с хранением данных в базе SQLite
+
+    Переопределяет слой хранения Bookstore (методы _restore_*, _apply_*,
+    _change_quantity и _clear_data), поэтому проверки и сообщения
+    публичных методов остаются общими. При открытии база не читается
+    целиком: поиск, выборки продаж и итоги выполняются SQL-запросами по
+    индексам, а каждое изменение выполняется в отдельной транзакции.
+    Поиск подстроки в названии, авторе и жанре сужается триграммным
+    индексом FTS5; подстроки короче трех символов и сборки SQLite без FTS5
+    проверяются просмотром всей таблицы книг.
+    """
+
+    def __init__(self, name: str, path: str):
+        super().__init__(name)
+        try:
+            self.conn = sqlite3.connect(path)
+            self.conn.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            raise FileOperationError(f"Не удалось открыть базу данных {path}: {e}")
+        self.fts = self._create_fts()
+
+        self.books = SQLiteTable(self.conn, 'books', BOOK_COLUMNS, _row_factory(Book), _book_row)
+        self.employees = SQLiteTable(self.conn, 'employees', EMPLOYEE_COLUMNS,
+                                     _row_factory(Employee), _employee_row)
+        self.customers = SQLiteTable(self.conn, 'customers', CUSTOMER_COLUMNS,
+                                     _row_factory(Customer), _customer_row)
+        self.sales = SQLiteTable(self.conn, 'sales', SALE_COLUMNS, _sale_from_row, _sale_row)
+
+        for key, value in self.conn.execute("SELECT key, value FROM meta"):
+            if key in META_ATTRIBUTES:
+                setattr(self, key, value)
+
+    def _create_fts(self) -> bool:
+        """Создание триграммного индекса; False, если SQLite собран без FTS5"""
+        created = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'books_fts'").fetchone() is None
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            return False
+        if created and self.conn.execute("SELECT 1 FROM books LIMIT 1").fetchone():
+            # База создана до появления индекса: индекс строится по имеющимся книгам
+            self.conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+            self.conn.commit()
+        return True
+
+    @contextmanager
+    def _transaction(self):
+        """Транзакция: изменения и счетчики ID фиксируются вместе"""
+        try:
+            yield
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                  [(key, getattr(self, key)) for key in META_ATTRIBUTES])
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def close(self) -> None:
+        """Закрытие соединения с базой"""
+        self.conn.close()
+
+    # Слой хранения
+
+    def _clear_data(self) -> None:
+        for table in (self.books, self.employees, self.customers, self.sales):
+            table.clear()
+        self._changes.reset()
+
+    def _restore_book(self, book: Book) -> None:
+        self.books[book.book_id] = book
+        self.ids.observe('book', book.book_id)
+        self._changes.mark('books', book.book_id)
+
+    def _restore_employee(self, employee: Employee) -> None:
+        self.employees[employee.emp_id] = employee
+        self.ids.observe('employee', employee.emp_id)
+        self._changes.mark('employees', employee.emp_id)
+
+    def _restore_customer(self, customer: Customer) -> None:
+        self.customers[customer.cust_id] = customer
+        self.ids.observe('customer', customer.cust_id)
+        self._changes.mark('customers', customer.cust_id)
+
+    def _restore_sale(self, sale: Sale) -> None:
+        self.sales[sale.sale_id] = sale
+        self.ids.observe('sale', sale.sale_id)
+        self._changes.mark('sales', sale.sale_id)
+
+    def _restore_books(self, books: List[Book]) -> None:
+        for book in books:
+            self._restore_book(book)
+
+    def _restore_sales(self, sales: List[Sale]) -> None:
+        for sale in sales:
+            self._restore_sale(sale)
+
+    def _restore_sale_columns(self, sale_ids, book_ids, customer_ids, employee_ids,
+                              quantities, total_kopecks, timestamps) -> None:
+        self._restore_sales([Sale(*row[:5], from_kopecks(row[5]), from_timestamp(row[6]))
+                             for row in zip(sale_ids, book_ids, customer_ids, employee_ids,
+                                            quantities, total_kopecks, timestamps)])
+
+    def _change_quantity(self, book: Book, delta: int) -> None:
+        book.quantity += delta
+        self.conn.execute("UPDATE books SET quantity = quantity + ? WHERE book_id = ?",
+                          (delta, book.book_id))
+        self._changes.mark('books', book.book_id)
+
+    def _apply_remove_book(self, book: Book, quantity: int) -> None:
+        self._change_quantity(book, -quantity)
+        if book.quantity == 0:
+            del self.books[book.book_id]
+            self._changes.delete_book(book.book_id)
+
+    # Изменения в транзакциях
+
+    def add_book(self, book: Book) -> None:
+        with self._transaction():
+            super().add_book(book)
+
+    def remove_book(self, book_id: int, quantity: int = 1) -> None:
+        with self._transaction():
+            super().remove_book(book_id, quantity)
+
+    def sell_book(self, book_id: int, quantity: int, customer_id: int, employee_id: int) -> Sale:
+        with self._transaction():
+            return super().sell_book(book_id, quantity, customer_id, employee_id)
+
+    def sell_books_bulk(self, lines, customer_id: int, employee_id: int) -> List[Sale]:
+        with self._transaction():
+            return super().sell_books_bulk(lines, customer_id, employee_id)
+
+    def reserve_ids(self, kind: str, count: int) -> range:
+        with self._transaction():
+            return super().reserve_ids(kind, count)
+
+    def add_employee(self, employee: Employee) -> None:
+        with self._transaction():
+            super().add_employee(employee)
+
+    def add_customer(self, customer: Customer) -> None:
+        with self._transaction():
+            super().add_customer(customer)
+
+    def load_from_json(self, filename: str, streaming: bool = False, progress=None) -> None:
+        with self._transaction():
+            super().load_from_json(filename, streaming, progress)
+
+    def load_from_xml(self, filename: str, progress=None) -> None:
+        with self._transaction():
+            super().load_from_xml(filename, progress)
+
+    def load_from_binary(self, filename: str) -> None:
+        with self._transaction():
+            super().load_from_binary(filename)
+
+    def load_partitioned(self, directory: str, workers: Optional[int] = None, progress=None) -> None:
+        with self._transaction():
+            super().load_partitioned(directory, workers, progress)
+
+    def load_with_deltas(self, base: str, deltas: Iterable[str] = ()) -> None:
+        with self._transaction():
+            super().load_with_deltas(base, deltas)
+
+    def import_csv(self, filename: str, entity: str = 'books', reject_file: Optional[str] = None,
+                   batch_size: int = BATCH_SIZE, delimiter: str = ',', progress=None,
+                   pause_gc: bool = False) -> ImportReport:
+        with self._transaction():
+            return super().import_csv(filename, entity, reject_file, batch_size, delimiter,
+                                      progress, pause_gc)
+
+    # Запросы
+
+    def search_books(self, **kwargs) -> List[Book]:
+        """Поиск книг SQL-запросом (результат упорядочен по ID книги)
+
+        Подстроки от трех символов выбирают кандидатов по триграммному
+        индексу, instr окончательно проверяет каждого кандидата.
+        """
+        try:
+            conditions = []
+            params = []
+            phrases = []
+            for field in BookIndex.TEXT_FIELDS:
+                if kwargs.get(field):
+                    text = kwargs[field].lower()
+                    conditions.append(f"instr({field}_lc, ?) > 0")
+                    params.append(text)
+                    if self.fts and len(text) >= TRIGRAM:
+                        phrases.append(_fts_phrase(f"{field}_lc", text))
+            if phrases:
+                conditions.insert(0, "book_id IN (SELECT rowid FROM books_fts WHERE books_fts MATCH ?)")
+                params.insert(0, ' AND '.join(phrases))
+            for name, (field, side) in BookIndex.RANGE_CRITERIA.items():
+                if kwargs.get(name) is not None:
+                    conditions.append(f"{field} {'>=' if side == 'low' else '<='} ?")
+                    params.append(kwargs[name])
+
+            return self.books.query(' AND '.join(conditions) or '1', params)
+
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при поиске книг: {e}")
+
+    def get_sales_by_customer(self, customer_id: int) -> List[Sale]:
+        try:
+            return self.sales.query("customer_id = ?", (customer_id,))
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при получении продаж клиента: {e}")
+
+    def get_sales_by_employee(self, employee_id: int) -> List[Sale]:
+        try:
+            return self.sales.query("employee_id = ?", (employee_id,))
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при получении продаж сотрудника: {e}")
+
+    def get_sales_by_book(self, book_id: int) -> List[Sale]:
+        try:
+            return self.sales.query("book_id = ?", (book_id,))
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при получении продаж книги: {e}")
+
+    def get_sales_between(self, start: datetime, end: datetime) -> List[Sale]:
+        try:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(SALE_COLUMNS)} FROM sales "
+                "WHERE sale_date >= ? AND sale_date < ? ORDER BY sale_date, sale_id",
+                (start.isoformat(), end.isoformat()))
+            return [_sale_from_row(row) for row in rows]
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при получении продаж за период: {e}")
+
+    def _period_totals(self, start: datetime, end: datetime) -> Tuple[int, int]:
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(total_kopecks), 0), COALESCE(SUM(quantity), 0) FROM sales "
+            "WHERE sale_date >= ? AND sale_date < ?", (start.isoformat(), end.isoformat())).fetchone()
+
+    def get_rolling_totals(self) -> Dict[str, Tuple[float, int]]:
+        """Итоги за скользящие окна запросом по индексу даты продажи"""
+        try:
+            now = datetime.now()
+            totals = {}
+            for name, minutes in ROLLING_WINDOWS.items():
+                kopecks, units = self.conn.execute(
+                    "SELECT COALESCE(SUM(total_kopecks), 0), COALESCE(SUM(quantity), 0) FROM sales "
+                    "WHERE sale_date > ?", ((now - timedelta(minutes=minutes)).isoformat(),)).fetchone()
+                totals[name] = (from_kopecks(kopecks), units)
+            return totals
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при расчете итогов за скользящие окна: {e}")
+
+    def get_total_revenue(self) -> float:
+        try:
+            total = self.conn.execute("SELECT COALESCE(SUM(total_kopecks), 0) FROM sales").fetchone()[0]
+            return from_kopecks(total)
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при расчете выручки: {e}")
+
+    def get_inventory_value(self) -> float:
+        try:
+            total = self.conn.execute(
+                "SELECT COALESCE(SUM(price_kopecks * quantity), 0) FROM books").fetchone()[0]
+            return from_kopecks(total)
+        except Exception as e:
+            raise BookstoreError(f"Ошибка при расчете стоимости инвентаря: {e}")
+
+    def verify_totals(self) -> bool:
+        """Итоги всегда считаются запросом к базе и расходиться не могут"""
+        return True
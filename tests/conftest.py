@@ -0,0 +1,183 @@
+"""
+Общие настройки тестов: модули магазина лежат в корне репозитория
+
+Здесь же - построители тестовых магазинов и измерения, общие для тестов
+и замеров benchmarks.py.
+"""
+
+import builtins
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bookstore import Bookstore
+from exceptions import InsufficientQuantityError
+from ledger import to_timestamp
+from manager import BookstoreManager
+from models import Book, Employee, Customer, Sale
+
+
+def make_bookstore(books: int = 1000, sales: int = 0, customers: int = 100,
+                   employees: int = 10, stock: int = 1000, concurrent: bool = False) -> Bookstore:
+    """Создание магазина со сгенерированными данными без вывода сообщений"""
+    bookstore = Bookstore("Тестовый магазин", concurrent=concurrent)
+    genres = ["Роман", "Антиутопия", "Фэнтези", "Детектив", "Поэзия"]
+
+    for book_id in range(1, books + 1):
+        bookstore._restore_book(Book(book_id, f"Книга {book_id}", f"Автор {book_id % 997}",
+                                     genres[book_id % len(genres)], 100.0 + book_id % 900,
+                                     stock, 1900 + book_id % 120))
+    for emp_id in range(1, employees + 1):
+        bookstore._restore_employee(Employee(emp_id, f"Сотрудник {emp_id}", "Продавец", 35000.0))
+    for cust_id in range(1, customers + 1):
+        bookstore._restore_customer(Customer(cust_id, f"Клиент {cust_id}",
+                                             f"client{cust_id}@mail.com", "+7-000-000-0000"))
+
+    start = datetime(2024, 1, 1)
+    for sale_id in range(1, sales + 1):
+        book_id = sale_id % books + 1
+        bookstore._restore_sale(Sale(sale_id, book_id, sale_id % customers + 1,
+                                     sale_id % employees + 1, 1,
+                                     bookstore.books[book_id].price,
+                                     start + timedelta(seconds=sale_id)))
+
+    bookstore._next_book_id = books + 1
+    bookstore._next_emp_id = employees + 1
+    bookstore._next_cust_id = customers + 1
+    bookstore._next_sale_id = sales + 1
+    return bookstore
+
+
+def timed(operation, *args, **kwargs) -> float:
+    """Время выполнения операции в секундах"""
+    start = time.perf_counter()
+    operation(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def run_concurrent_sales(threads: int, size: int, books: int = 100) -> dict:
+    """Продажа size экземпляров из threads потоков при параллельном поиске
+
+    Остатков хватает на половину продаж, поэтому потоки соревнуются за
+    последние экземпляры каждой книги.
+    """
+    stock = max(1, size // (2 * books))
+    bookstore = make_bookstore(books=books, stock=stock, concurrent=True)
+    done = threading.Event()
+    searches = []
+
+    def sell(worker: int) -> int:
+        sold = 0
+        for line in range(worker, size, threads):
+            try:
+                bookstore.sell_book(line * 7919 % books + 1, 1, line % 100 + 1, line % 10 + 1)
+                sold += 1
+            except InsufficientQuantityError:
+                pass
+        return sold
+
+    def search() -> None:
+        count = 0
+        while not done.is_set():
+            bookstore.search_books(min_quantity=1, max_price=500)
+            count += 1
+        searches.append(count)
+
+    reader = threading.Thread(target=search)
+    with contextlib.redirect_stdout(io.StringIO()):
+        reader.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            sold = sum(pool.map(sell, range(threads)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        reader.join()
+
+    sale_ids = list(bookstore.sales)
+    units = bookstore.sales.units_by('book_id')
+    checks = {
+        'нет перепродаж': all(book.quantity >= 0 and book.quantity + units.get(book.book_id, 0) == stock
+                              for book in bookstore.books.values()),
+        'ID уникальны': len(set(sale_ids)) == len(sale_ids) == sold,
+        'ID по порядку': sale_ids == list(range(1, sold + 1)),
+        'итоги сходятся': bookstore.verify_totals(),
+    }
+    return {'sold': sold, 'elapsed': elapsed, 'searches': searches[0], 'checks': checks}
+
+
+def add_sale_columns(bookstore: Bookstore, size: int) -> None:
+    """Быстрое добавление size продаж колонками, без создания объектов Sale"""
+    books, customers, employees = len(bookstore.books), len(bookstore.customers), len(bookstore.employees)
+    start = to_timestamp(datetime(2023, 1, 1))
+    ids = range(1, size + 1)
+    book_ids = array('q', (sale_id % books + 1 for sale_id in ids))
+    bookstore._restore_sale_columns(
+        array('q', ids), book_ids,
+        array('q', (sale_id % customers + 1 for sale_id in ids)),
+        array('q', (sale_id % employees + 1 for sale_id in ids)),
+        array('q', (sale_id % 3 + 1 for sale_id in ids)),
+        array('q', (10000 + book_id * 7 % 90000 for book_id in book_ids)),
+        array('q', (start + sale_id * 3_000_000 for sale_id in ids)))
+
+
+@contextlib.contextmanager
+def scripted_input(answers):
+    """Подмена input(): ответы берутся из answers, затем повторяется последний"""
+    answers = list(answers)
+    original = builtins.input
+
+    def fake_input(prompt=''):
+        return answers.pop(0) if len(answers) > 1 else answers[0]
+
+    builtins.input = fake_input
+    try:
+        yield
+    finally:
+        builtins.input = original
+
+
+class CountingWriter(io.TextIOBase):
+    """Поток вывода, считающий вызовы write, без сохранения текста"""
+
+    def __init__(self):
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        self.writes += 1
+        return len(text)
+
+
+# Первая страница списка не должна стоить больше этой доли вывода всех страниц
+# (построение всего списка, даже без форматирования, превышает ее уже при 100 000 книг)
+FIRST_PAGE_SHARE = 0.003
+
+
+def measure_manager_listing(size: int) -> dict:
+    """Время первой страницы, всех страниц и число записей вывода для size книг"""
+    bookstore = make_bookstore(books=size)
+    output = CountingWriter()
+    manager = BookstoreManager(bookstore, output=output)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        # Лучшее из нескольких измерений: время первой страницы - доли миллисекунды
+        first_page = float('inf')
+        for _ in range(3):
+            with scripted_input(['', 'q']):
+                first_page = min(first_page, timed(manager._show_books))
+        with scripted_input(['цена', 'q']):
+            sorted_page = timed(manager._show_books)
+        output.writes = 0
+        with scripted_input(['']):
+            all_pages = timed(manager._show_books)
+        writes = output.writes
+        with scripted_input([f'Книга {size - 1}', '1', '1', '1']):
+            sell_time = timed(manager._sell_book_interactive)
+    return {'first_page': first_page, 'sorted_page': sorted_page, 'all_pages': all_pages,
+            'writes': writes, 'pages': -(-size // manager.page_size), 'sell': sell_time}
@@ -0,0 +1,45 @@
+"""
+Тесты параллельной аналитики продаж
+"""
+
+import threading
+
+import analytics
+from analytics import sales_report
+from conftest import make_bookstore, add_sale_columns
+from events import NullSink
+
+
+def test_parallel_report_during_sales(monkeypatch):
+    """Отчет в пуле процессов не мешает продажам и не видит недописанных строк"""
+    monkeypatch.setattr(analytics, 'PARALLEL_THRESHOLD', 1000)
+    bookstore = make_bookstore(books=100, stock=10 ** 9, concurrent=True)
+    bookstore.events = NullSink()
+    add_sale_columns(bookstore, 100_000)
+
+    stop = threading.Event()
+    errors = []
+
+    def sell():
+        line = 0
+        while not stop.is_set():
+            try:
+                bookstore.sell_book(line % 100 + 1, 1, 1, 1)
+            except Exception as e:
+                errors.append(e)
+                return
+            line += 1
+
+    seller = threading.Thread(target=sell)
+    seller.start()
+    try:
+        for _ in range(3):
+            report = sales_report(bookstore, workers=2)
+            assert sum(report.units('book').values()) > 0
+    finally:
+        stop.set()
+        seller.join()
+
+    assert errors == []
+    assert len({len(getattr(bookstore.sales, name)) for name in bookstore.sales.COLUMNS}) == 1
+    assert bookstore.verify_totals()
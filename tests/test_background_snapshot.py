@@ -0,0 +1,125 @@
+"""
+Тесты фонового сохранения снимков
+"""
+
+import copy
+import threading
+
+import pytest
+
+from conftest import make_bookstore
+from background_snapshot import StateCapture, BackgroundSnapshots, capture
+from bookstore import Bookstore
+from events import NullSink
+from exceptions import BookstoreError, InsufficientQuantityError
+from models import Book
+
+
+@pytest.fixture
+def bookstore():
+    """Магазин в конкурентном режиме с загруженными продажами"""
+    store = make_bookstore(books=40, sales=150, customers=5, employees=3, stock=30, concurrent=True)
+    store.events = NullSink()
+    return store
+
+
+def _json_bytes(store, path) -> bytes:
+    store.save_to_json(str(path))
+    return path.read_bytes()
+
+
+def _loaded(filename: str) -> Bookstore:
+    store = Bookstore("Загрузка", events=NullSink())
+    store.load_from_json(filename)
+    return store
+
+
+def test_capture_equals_state_at_capture(bookstore, tmp_path):
+    """Захват не видит продаж, списаний и новых книг, сделанных после него"""
+    expected = _json_bytes(bookstore, tmp_path / 'expected.json')
+    state = StateCapture(bookstore)
+    try:
+        bookstore.sell_book(1, 3, 1, 1)
+        bookstore.sell_books_bulk([(2, 1), (1, 2)], 2, 2)
+        bookstore.remove_book(3, 30)
+        restock = copy.copy(bookstore.books[4])
+        restock.quantity = 5
+        bookstore.add_book(restock)
+        bookstore.add_book(Book(0, "Новая", "Автор", "Жанр", 10.0, 1, 2000))
+        bookstore.reserve_ids('sale', 10)
+        snapshot = state.materialize()
+    finally:
+        state.release()
+    assert _json_bytes(snapshot, tmp_path / 'snapshot.json') == expected
+    assert bookstore._captures == []
+    assert capture(bookstore).books[1].quantity == bookstore.books[1].quantity
+
+
+@pytest.mark.parametrize('name, load', [('data.json', 'load_from_json'), ('data.json.gz', 'load_from_json'),
+                                        ('data.xml', 'load_from_xml'), ('data.bin.xz', 'load_from_binary')])
+def test_save_round_trip(bookstore, tmp_path, name, load):
+    """Снимок, сохраненный в фоне, загружается в то же состояние, что и обычный"""
+    expected = _json_bytes(bookstore, tmp_path / 'expected.json')
+    path = str(tmp_path / name)
+    report = BackgroundSnapshots(bookstore, path).save()
+    assert report.sales == 150 and report.filename == path
+    loaded = Bookstore("Загрузка", events=NullSink())
+    getattr(loaded, load)(path)
+    assert _json_bytes(loaded, tmp_path / 'copy.json') == expected
+    assert not list(tmp_path.glob('.tmp-*'))
+
+
+def test_snapshot_consistent_during_sales(bookstore, tmp_path):
+    """Снимки, сохраненные во время продаж, согласованы: остаток + продано = исходный"""
+    stock = {book_id: book.quantity for book_id, book in bookstore.books.items()}
+    loaded_sales = len(bookstore.sales)
+    stop = threading.Event()
+
+    def sell(worker):
+        line = worker
+        while not stop.is_set():
+            try:
+                bookstore.sell_book(line % 40 + 1, 1, 1, 1)
+            except (InsufficientQuantityError, BookstoreError):
+                pass
+            line += 3
+
+    threads = [threading.Thread(target=sell, args=(worker,)) for worker in range(3)]
+    for thread in threads:
+        thread.start()
+    snapshots = BackgroundSnapshots(bookstore, str(tmp_path / 'live.json'))
+    try:
+        for _ in range(5):
+            report = snapshots.save()
+            snapshot = _loaded(report.filename)
+            sold = {}
+            for sale in snapshot.sales.values():
+                if sale.sale_id > loaded_sales:
+                    sold[sale.book_id] = sold.get(sale.book_id, 0) + sale.quantity
+            assert len(snapshot.sales) == report.sales
+            assert all(book.quantity + sold.get(book_id, 0) == stock[book_id]
+                       for book_id, book in snapshot.books.items())
+            assert snapshot.verify_totals()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_schedule_requires_concurrent_store(tmp_path):
+    """Сохранение по расписанию пишет снимки и требует конкурентного режима"""
+    plain = make_bookstore(books=3)
+    with pytest.raises(BookstoreError):
+        BackgroundSnapshots(plain, str(tmp_path / 'plain.json')).start(1)
+
+    store = make_bookstore(books=3, concurrent=True)
+    store.events = NullSink()
+    saved = threading.Event()
+    snapshots = BackgroundSnapshots(store, lambda: saved.set() or str(tmp_path / 'scheduled.json'))
+    snapshots.start(0.01)
+    try:
+        assert saved.wait(5)
+    finally:
+        snapshots.stop()
+    assert snapshots.last_error is None and snapshots.status()['scheduled'] is False
+    assert list(_loaded(str(tmp_path / 'scheduled.json')).books) == [1, 2, 3]
@@ -0,0 +1,61 @@
+"""
+Тесты пакетной продажи по принципу "все или ничего"
+"""
+
+import os
+
+import pytest
+
+import journal
+from conftest import make_bookstore
+from events import NullSink
+from exceptions import BookNotFoundError, BookstoreError, InsufficientQuantityError
+
+
+@pytest.fixture
+def bookstore(tmp_path):
+    bookstore = make_bookstore(books=5, stock=10)
+    bookstore.events = NullSink()
+    journal.recover(bookstore, str(tmp_path / 'journal'))
+    yield bookstore
+    bookstore.journal.close()
+
+
+def _state(bookstore):
+    return ([book.quantity for book in bookstore.books.values()], len(bookstore.sales),
+            bookstore.ids.state(), bookstore._journal_seq, bookstore.get_total_revenue())
+
+
+def test_bulk_sale(bookstore):
+    """Все строки продаются с непрерывными ID и одной датой"""
+    sales = bookstore.sell_books_bulk([(1, 2), (2, 1), (1, 3)], 1, 1)
+    assert [sale.sale_id for sale in sales] == [1, 2, 3]
+    assert len({sale.sale_date for sale in sales}) == 1
+    assert (bookstore.books[1].quantity, bookstore.books[2].quantity) == (5, 9)
+    assert bookstore.verify_totals()
+
+
+@pytest.mark.parametrize('line, error', [
+    ((3, 11), InsufficientQuantityError),
+    ((1, 10), InsufficientQuantityError),
+    ((99, 1), BookNotFoundError),
+    ((3, 0), BookstoreError),
+    ((3, True), BookstoreError),
+    ((3, 1.5), BookstoreError),
+])
+def test_failing_line_sells_nothing(bookstore, line, error):
+    """Ошибка в третьей строке оставляет остатки первых двух строк без изменений"""
+    before = _state(bookstore)
+    with pytest.raises(error):
+        bookstore.sell_books_bulk([(1, 1), (2, 1), line], 1, 1)
+    assert _state(bookstore) == before
+    assert bookstore.verify_totals()
+
+
+def test_empty_basket_rejected(bookstore):
+    """Пустой пакет отклоняется без выделения ID и записи в журнал"""
+    before = _state(bookstore)
+    with pytest.raises(BookstoreError):
+        bookstore.sell_books_bulk([], 1, 1)
+    assert _state(bookstore) == before
+    assert os.path.getsize(bookstore.journal.path) == 0
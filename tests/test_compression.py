@@ -0,0 +1,113 @@
+"""
+Тесты кодеков сжатия и блочной записи снимков
+"""
+
+import gzip
+import random
+import shutil
+
+import pytest
+
+import compression
+from conftest import make_bookstore
+from bookstore import Bookstore
+from events import NullSink
+from file_operations import FileOperations
+
+
+def _data(size: int) -> bytes:
+    """Частично сжимаемые данные"""
+    rng = random.Random(size)
+    return bytes(rng.choice(b'abc\n\xd0\x91') for _ in range(size))
+
+
+@pytest.mark.parametrize('filename, codec, extension', [
+    ('data.json', None, '.json'),
+    ('data.json.gz', 'gzip', '.json'),
+    ('DATA.XML.BZ2', 'bz2', '.xml'),
+    ('dir.v1/data.bin.xz', 'xz', '.bin'),
+    ('data.gz', 'gzip', ''),
+    ('data.tar', None, '.tar'),
+])
+def test_codec_by_extension(filename, codec, extension):
+    """Кодек и формат снимка определяются по расширениям имени"""
+    found = compression.codec_for(filename)
+    assert (found.name if found else None) == codec
+    assert compression.snapshot_extension(filename) == extension
+
+
+@pytest.mark.parametrize('codec', list(compression.CODECS))
+def test_codec_by_magic(tmp_path, codec):
+    """При чтении кодек определяется по сигнатуре, а не по имени файла"""
+    data = _data(5000)
+    packed = tmp_path / 'packed'
+    packed.write_bytes(compression.CODECS[codec].compress(data))
+    plain = tmp_path / 'plain.gz'
+    plain.write_bytes(data)
+
+    assert compression.is_compressed(str(packed)) and not compression.is_compressed(str(plain))
+    assert compression.detect(packed.read_bytes()[:compression.MAGIC_SIZE]).name == codec
+    with compression.open_read(str(packed)) as f:
+        assert f.read() == data
+    with compression.open_read(str(plain)) as f:
+        assert f.read() == data
+
+
+@pytest.mark.parametrize('codec', list(compression.CODECS))
+@pytest.mark.parametrize('threads', [1, 2, 4])
+@pytest.mark.parametrize('size', [0, 1, 999, 1000, 1001, 25000])
+def test_parallel_writer_round_trip(tmp_path, monkeypatch, codec, threads, size):
+    """Блочная запись любого объема распаковывается в исходные данные"""
+    monkeypatch.setattr(compression, 'BLOCK_SIZE', 1000)
+    data = _data(size)
+    filename = str(tmp_path / ('data' + compression.CODECS[codec].extension))
+    writer = compression._ParallelWriter(open(filename, 'wb'), compression.CODECS[codec], threads)
+    with writer as f:
+        for start in range(0, size, 333):
+            f.write(data[start:start + 333])
+    assert compression.is_compressed(filename)
+    with compression.open_read(filename) as f:
+        assert f.read() == data
+    if codec == 'gzip':
+        # Каждый блок записан отдельным членом gzip
+        with open(filename, 'rb') as f:
+            assert f.read().count(gzip.compress(b'', mtime=0)[:8]) == max(1, -(-size // 1000))
+
+
+def test_text_across_blocks(tmp_path, monkeypatch):
+    """Многобайтные символы на границе блоков не искажаются"""
+    monkeypatch.setattr(compression, 'BLOCK_SIZE', 7)
+    text = 'Книга «Война и мир» ☃\n' * 50
+    filename = str(tmp_path / 'data.txt.gz')
+    with compression.open_text(filename, 'w', threads=3) as f:
+        f.write(text)
+    with compression.open_text(filename) as f:
+        assert f.read() == text
+
+
+@pytest.mark.parametrize('save, load', [('save_to_json', 'load_from_json'),
+                                        ('save_to_xml', 'load_from_xml')])
+@pytest.mark.parametrize('suffix', ['.gz', '.bz2', '.xz'])
+@pytest.mark.parametrize('threads', [1, 3])
+def test_compressed_snapshot_loads(tmp_path, monkeypatch, save, load, suffix, threads):
+    """Сжатые снимки JSON и XML загружаются в то же состояние и после переименования"""
+    monkeypatch.setattr(FileOperations, 'COMPRESS_THREADS', threads)
+    monkeypatch.setattr(compression, 'BLOCK_SIZE', 4096)
+    bookstore = make_bookstore(books=60, sales=120, customers=5, employees=3)
+    bookstore.events = NullSink()
+    expected = str(tmp_path / 'expected.json')
+    bookstore.save_to_json(expected)
+
+    extension = '.json' if save == 'save_to_json' else '.xml'
+    packed = str(tmp_path / ('data' + extension + suffix))
+    getattr(bookstore, save)(packed)
+    renamed = str(tmp_path / ('renamed' + extension))
+    shutil.copy(packed, renamed)
+
+    for filename in (packed, renamed):
+        loaded = Bookstore("Загрузка", events=NullSink())
+        getattr(loaded, load)(filename)
+        copy = str(tmp_path / 'copy.json')
+        loaded.save_to_json(copy)
+        with open(expected, 'rb') as f1, open(copy, 'rb') as f2:
+            assert f1.read() == f2.read()
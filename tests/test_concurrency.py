@@ -0,0 +1,27 @@
+"""
+Нагрузочная проверка конкурентного режима
+"""
+
+import sys
+
+import pytest
+
+from conftest import run_concurrent_sales
+
+
+@pytest.fixture
+def frequent_switches():
+    """Частое переключение потоков увеличивает число чередований операций"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.mark.parametrize('threads', [1, 4, 8])
+def test_concurrent_sales_invariants(frequent_switches, threads):
+    """Нет перепродаж, ID продаж уникальны и идут по порядку, итоги сходятся"""
+    result = run_concurrent_sales(threads, 20_000)
+    failed = [name for name, passed in result['checks'].items() if not passed]
+    assert failed == []
+    assert result['sold'] > 0
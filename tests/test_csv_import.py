@@ -0,0 +1,105 @@
+"""
+Тесты потокового импорта из CSV
+"""
+
+import csv
+import gc
+import threading
+
+import pytest
+
+import csv_import
+from bookstore import Bookstore
+from models import Book
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    filename = tmp_path / 'catalogue.csv'
+    with open(filename, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['title', 'author', 'genre', 'price', 'quantity', 'year'])
+        writer.writerow(['Книга', 'Автор', 'Жанр', '100', '2', '2000'])
+        writer.writerow(['Книга', 'Автор', 'Жанр', 'нет', '2', '2000'])
+    return str(filename)
+
+
+@pytest.fixture
+def collector_enabled():
+    enabled = gc.isenabled()
+    gc.enable()
+    yield
+    if not enabled:
+        gc.disable()
+
+
+def test_non_finite_prices_rejected(tmp_path):
+    """Бесконечная и слишком большая цена попадают в файл отклоненных строк"""
+    filename = tmp_path / 'prices.csv'
+    with open(filename, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['title', 'author', 'genre', 'price', 'quantity', 'year'])
+        writer.writerow(['Книга', 'Автор', 'Жанр', '100', '2', '2000'])
+        writer.writerow(['Дорогая', 'Автор', 'Жанр', 'inf', '2', '2000'])
+        writer.writerow(['Огромная', 'Автор', 'Жанр', '1e400', '2', '2000'])
+        writer.writerow(['Странная', 'Автор', 'Жанр', 'nan', '2', '2000'])
+
+    bookstore = Bookstore("Импорт")
+    report = bookstore.import_csv(str(filename))
+
+    assert (report.imported, report.rejected) == (1, 3)
+    assert [book.title for book in bookstore.books.values()] == ['Книга']
+    assert bookstore.get_inventory_value() == 200.0
+    assert bookstore.verify_totals()
+    with open(report.reject_file, encoding='utf-8', newline='') as f:
+        rejected = list(csv.reader(f))[1:]
+    assert [(row[0], row[2]) for row in rejected] == [('3', 'Дорогая'), ('4', 'Огромная'), ('5', 'Странная')]
+
+
+def test_unconvertible_batch_not_applied():
+    """Пакет с ценой, не переводимой в копейки, не меняет магазин"""
+    bookstore = Bookstore("Импорт")
+    good = Book.from_checked(1, 'Книга', 'Автор', 'Жанр', 100.0, 2, 2000)
+    bad = Book.from_checked(2, 'Книга', 'Автор', 'Жанр', float('inf'), 2, 2000)
+    with pytest.raises(OverflowError):
+        bookstore._restore_books([good, bad])
+    assert len(bookstore.books) == 0
+    assert bookstore.search_books(title='книга') == []
+    assert bookstore.verify_totals()
+
+
+def test_import_keeps_collector_by_default(catalogue, collector_enabled):
+    """По умолчанию сборщик мусора во время импорта не отключается"""
+    states = []
+    Bookstore("Импорт").import_csv(catalogue, progress=lambda entity, rows: states.append(gc.isenabled()))
+    assert states == [True]
+    assert gc.isenabled()
+
+
+def test_paused_collector_restored_after_last_import(collector_enabled):
+    """Сборщик включается только после завершения последнего импорта"""
+    first_inside, release = threading.Event(), threading.Event()
+
+    def first_import():
+        with csv_import._collector_paused():
+            first_inside.set()
+            release.wait()
+
+    thread = threading.Thread(target=first_import)
+    thread.start()
+    first_inside.wait()
+    with csv_import._collector_paused():
+        assert not gc.isenabled()
+    # Первый импорт еще идет: сборщик остается отключенным
+    assert not gc.isenabled()
+    release.set()
+    thread.join()
+    assert gc.isenabled()
+
+
+def test_paused_collector_keeps_disabled_state(catalogue, collector_enabled):
+    """Отключенный до импорта сборщик остается отключенным"""
+    gc.disable()
+    report = Bookstore("Импорт").import_csv(catalogue, pause_gc=True)
+    assert (report.imported, report.rejected) == (1, 1)
+    assert not gc.isenabled()
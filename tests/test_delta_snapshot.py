@@ -0,0 +1,114 @@
+"""
+Тесты цепочек дельта-снимков
+"""
+
+import copy
+import threading
+
+import pytest
+
+from conftest import make_bookstore
+from bookstore import Bookstore
+from events import NullSink
+from exceptions import FileOperationError
+from journal import recover
+
+
+def _store():
+    bookstore = make_bookstore(books=20, sales=50, stock=10)
+    bookstore.events = NullSink()
+    return bookstore
+
+
+def _restock(bookstore, book_id, quantity):
+    book = copy.copy(bookstore.books[book_id])
+    book.quantity = quantity
+    bookstore.add_book(book)
+
+
+def test_checkpoint_does_not_rebase_deltas(tmp_path):
+    """Контрольная точка журнала не становится базой дельта-снимков"""
+    bookstore = _store()
+    recover(bookstore, str(tmp_path / 'journal'))
+    base = str(tmp_path / 'base.json')
+    delta = str(tmp_path / 'changes.delta')
+
+    bookstore.save_to_json(base)
+    _restock(bookstore, 1, 5)
+    bookstore.checkpoint()
+    bookstore.remove_book(2, 1)
+    bookstore.save_delta(delta)
+    bookstore.journal.close()
+
+    loaded = Bookstore("Цепочка", events=NullSink())
+    loaded.load_with_deltas(base, [delta])
+    assert loaded.books[1].quantity == 15
+    assert loaded.books[2].quantity == 9
+
+
+def test_chain_of_deltas(tmp_path):
+    """Дельта-снимки применяются по порядку"""
+    bookstore = _store()
+    base = str(tmp_path / 'base.bin')
+    deltas = [str(tmp_path / f'{number}.delta') for number in range(3)]
+
+    bookstore.save_to_binary(base)
+    for number, delta in enumerate(deltas):
+        bookstore.sell_book(number + 1, 1, 1, 1)
+        bookstore.save_delta(delta)
+
+    loaded = Bookstore("Цепочка", events=NullSink())
+    loaded.load_with_deltas(base, deltas)
+    assert len(loaded.sales) == len(bookstore.sales)
+    assert [book.quantity for book in loaded.books.values()] == \
+           [book.quantity for book in bookstore.books.values()]
+
+    skipped = Bookstore("Пропуск", events=NullSink())
+    with pytest.raises(FileOperationError):
+        skipped.load_with_deltas(base, [deltas[0], deltas[2]])
+
+
+def test_delta_of_other_chain_is_rejected(tmp_path):
+    """Дельта-снимок другой базы отклоняется, даже если ID не выдавались"""
+    bookstore = _store()
+    first = str(tmp_path / 'first.json')
+    second = str(tmp_path / 'second.json')
+    delta = str(tmp_path / 'changes.delta')
+
+    bookstore.save_to_json(first)
+    _restock(bookstore, 1, 5)
+    bookstore.save_to_json(second)
+    _restock(bookstore, 1, 5)
+    bookstore.save_delta(delta)
+
+    loaded = Bookstore("Цепочка", events=NullSink())
+    with pytest.raises(FileOperationError):
+        loaded.load_with_deltas(first, [delta])
+    loaded.load_with_deltas(second, [delta])
+    assert loaded.books[1].quantity == 20
+
+
+def test_sale_during_full_save_goes_to_delta(tmp_path, monkeypatch):
+    """Продажа во время сохранения полного снимка попадает в следующий дельта-снимок"""
+    bookstore = make_bookstore(books=20, sales=50, stock=10, concurrent=True)
+    bookstore.events = NullSink()
+    base = str(tmp_path / 'base.json')
+    delta = str(tmp_path / 'changes.delta')
+    seller = threading.Thread(target=bookstore.sell_book, args=(1, 1, 1, 1))
+    save = bookstore.file_ops.save_to_json
+
+    def save_while_selling(store, filename):
+        seller.start()
+        # Продажа успевает завершиться, если сохранение ее не задерживает
+        seller.join(0.2)
+        save(store, filename)
+
+    monkeypatch.setattr(bookstore.file_ops, 'save_to_json', save_while_selling)
+    bookstore.save_to_json(base)
+    seller.join()
+    bookstore.save_delta(delta)
+
+    loaded = Bookstore("Цепочка", events=NullSink())
+    loaded.load_with_deltas(base, [delta])
+    assert len(loaded.sales) == 51
+    assert loaded.books[1].quantity == bookstore.books[1].quantity == 9
@@ -0,0 +1,92 @@
+"""
+Тесты событий магазина и приемников событий
+"""
+
+import io
+import logging
+
+from bookstore import Bookstore
+from events import ConsoleSink, LoggingSink, RingBufferSink, NullSink
+from models import Book, Employee, Customer
+
+# Сообщения, которые печатала исходная версия магазина
+EXPECTED = [
+    "Сотрудник Иван успешно добавлен с ID: 1",
+    "Сотрудник с ID 1 уже существует",
+    "Клиент Петр успешно добавлен с ID: 1",
+    "Книга 'Книга' успешно добавлена с ID: 1",
+    "Количество книги 'Книга' увеличено. Теперь в наличии: 5",
+    "Продажа успешно завершена: 2 экз. 'Книга' клиенту Петр за 21.0 руб. (Продавец: Иван)",
+    "Удалено 1 экз. книги 'Книга'. Осталось: 2",
+    "Книга 'Книга' полностью удалена из магазина",
+]
+
+
+def _mutate(bookstore):
+    """Изменения, по одному на каждый вид события"""
+    bookstore.add_employee(Employee(1, "Иван", "Кассир", 30000.0))
+    bookstore.add_employee(Employee(1, "Иван", "Кассир", 30000.0))
+    bookstore.add_customer(Customer(1, "Петр", "petr@mail.com", "+7-000-000-0000"))
+    bookstore.add_book(Book(0, "Книга", "Автор", "Жанр", 10.5, 3, 2000))
+    bookstore.add_book(Book(1, "Книга", "Автор", "Жанр", 10.5, 2, 2000))
+    bookstore.sell_book(1, 2, 1, 1)
+    bookstore.remove_book(1, 1)
+    bookstore.remove_book(1, 2)
+
+
+def test_console_output_matches_baseline(capsys):
+    """Консольный приемник по умолчанию печатает прежние сообщения в прежнем порядке"""
+    _mutate(Bookstore("Консоль"))
+    assert capsys.readouterr().out.splitlines() == EXPECTED
+
+
+def test_console_batches_output():
+    """При пакетном выводе сообщения записываются пачками, а остаток - при flush"""
+    stream = io.StringIO()
+    writes = []
+    stream.write = lambda text, write=stream.write: writes.append(text) or write(text)
+    sink = ConsoleSink(stream, batch_size=3)
+    _mutate(Bookstore("Пакеты", events=sink))
+    assert len(writes) == 2
+    sink.flush()
+    assert len(writes) == 3
+    assert stream.getvalue().splitlines() == EXPECTED
+
+
+def test_ring_buffer_keeps_structured_events():
+    """Кольцевой буфер хранит последние события с данными"""
+    sink = RingBufferSink(capacity=4)
+    bookstore = Bookstore("Буфер", events=sink)
+    _mutate(bookstore)
+    events = sink.events()
+    assert [event.kind for event in events] == ['book_restocked', 'book_sold', 'book_removed', 'book_depleted']
+    assert [event.message for event in events] == EXPECTED[-4:]
+    assert events[1].data['sale_id'] == 1 and events[1].data['quantity'] == 2
+    sink.clear()
+    assert sink.events() == []
+
+
+def test_logging_sink_passes_event(caplog):
+    """Приемник logging передает текст и само событие в запись журнала"""
+    with caplog.at_level(logging.INFO, logger='bookstore'):
+        _mutate(Bookstore("Журнал", events=LoggingSink()))
+    assert [record.getMessage() for record in caplog.records] == EXPECTED
+    assert caplog.records[0].event.kind == 'employee_added'
+
+
+def test_silent_suppresses_and_restores(capsys):
+    """silent() отключает вывод на время блока, затем возвращает приемник"""
+    bookstore = Bookstore("Тишина")
+    console = bookstore.events
+    with bookstore.silent() as sink:
+        assert isinstance(sink, NullSink)
+        _mutate(bookstore)
+    assert capsys.readouterr().out == ''
+    assert bookstore.events is console
+    assert len(bookstore.sales) == 1 and 1 not in bookstore.books
+
+    ring = RingBufferSink()
+    with bookstore.silent(ring):
+        bookstore.add_book(Book(0, "Книга", "Автор", "Жанр", 10.5, 1, 2000))
+    assert [event.kind for event in ring.events()] == ['book_added']
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,118 @@
+"""
+Тесты выделения и резервирования ID
+"""
+
+import threading
+
+import pytest
+
+import journal
+from conftest import make_bookstore
+from bookstore import Bookstore
+from events import NullSink
+from id_allocator import IDAllocator
+from models import Book, Employee, Customer
+
+
+def _book(book_id=0):
+    return Book(book_id, "Книга", "Автор", "Жанр", 10.0, 1, 2000)
+
+
+def test_allocation_matches_max_plus_one():
+    """Без удалений выдаются те же ID, что и по прежнему правилу max + 1"""
+    bookstore = Bookstore("ID", events=NullSink())
+    for explicit in (0, 0, 10, 0, 4, 0):
+        expected = explicit or max(bookstore.books, default=0) + 1
+        book = _book(explicit)
+        bookstore.add_book(book)
+        assert book.book_id == expected
+
+        employee = Employee(explicit, "Сотрудник", "Кассир", 30000.0)
+        bookstore.add_employee(employee)
+        customer = Customer(explicit, "Клиент", "client@mail.com", "+7-000-000-0000")
+        bookstore.add_customer(customer)
+        assert sorted(bookstore.employees) == sorted(bookstore.books)
+        assert sorted(bookstore.customers) == sorted(bookstore.books)
+
+
+def test_removed_ids_not_reused():
+    """ID полностью удаленной книги не выдается повторно"""
+    bookstore = make_bookstore(books=5)
+    bookstore.events = NullSink()
+    bookstore.remove_book(5, bookstore.books[5].quantity)
+    book = _book()
+    bookstore.add_book(book)
+    assert book.book_id == 6
+
+
+def test_concurrent_reservations_disjoint():
+    """Диапазоны и одиночные ID из разных потоков не пересекаются и идут подряд"""
+    allocator = IDAllocator(concurrent=True)
+    issued = [[] for _ in range(8)]
+
+    def worker(index):
+        for step in range(500):
+            if step % 2:
+                issued[index].extend(allocator.reserve('sale', index + 1))
+            else:
+                issued[index].append(allocator.allocate('sale'))
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    values = [value for chunk in issued for value in chunk]
+    assert sorted(values) == list(range(1, len(values) + 1))
+    assert allocator.peek('sale') == len(values) + 1
+
+
+def test_reserve_is_constant_time_and_checked():
+    """Огромный диапазон выдается без перебора; неверные аргументы отклоняются"""
+    allocator = IDAllocator()
+    ids = allocator.reserve('book', 10 ** 15)
+    assert (ids.start, ids.stop) == (1, 10 ** 15 + 1)
+    assert allocator.allocate('book') == 10 ** 15 + 1
+    assert allocator.reserve('book', 0) == range(10 ** 15 + 2, 10 ** 15 + 2)
+    with pytest.raises(ValueError):
+        allocator.reserve('book', -1)
+    with pytest.raises(ValueError):
+        allocator.reserve('author', 1)
+
+
+@pytest.mark.parametrize('name, save, load', [('data.json', 'save_to_json', 'load_from_json'),
+                                              ('data.xml', 'save_to_xml', 'load_from_xml'),
+                                              ('data.bin', 'save_to_binary', 'load_from_binary')])
+def test_reservations_survive_snapshot(tmp_path, name, save, load):
+    """После загрузки снимка выдача продолжается за зарезервированными диапазонами"""
+    bookstore = make_bookstore(books=5, sales=3)
+    bookstore.events = NullSink()
+    books = bookstore.reserve_ids('book', 100)
+    sales = bookstore.reserve_ids('sale', 10)
+    filename = str(tmp_path / name)
+    getattr(bookstore, save)(filename)
+
+    loaded = Bookstore("Загрузка", events=NullSink())
+    getattr(loaded, load)(filename)
+    assert loaded.ids.state() == bookstore.ids.state()
+    book = _book()
+    loaded.add_book(book)
+    assert book.book_id == books.stop
+    assert loaded.sell_book(1, 1, 1, 1).sale_id == sales.stop
+
+
+def test_reservations_survive_journal(tmp_path):
+    """Резервирование попадает в журнал и учитывается при восстановлении"""
+    directory = str(tmp_path / 'journal')
+    bookstore = make_bookstore(books=5)
+    bookstore.events = NullSink()
+    journal.recover(bookstore, directory)
+    bookstore.checkpoint()
+    books = bookstore.reserve_ids('book', 50)
+    customers = bookstore.reserve_ids('customer', 7)
+    bookstore.journal.close()
+
+    recovered = Bookstore("Восстановление", events=NullSink())
+    journal.recover(recovered, directory).close()
+    assert recovered.ids.peek('book') == books.stop
+    assert recovered.ids.peek('customer') == customers.stop
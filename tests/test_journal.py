@@ -0,0 +1,71 @@
+"""
+Тесты журнала изменений и восстановления по нему
+"""
+
+import os
+import time
+
+import pytest
+
+import journal
+from conftest import make_bookstore
+from bookstore import Bookstore
+from events import NullSink
+from exceptions import FileOperationError
+
+
+def test_pending_records_synced_after_interval(tmp_path, monkeypatch):
+    """Последние записи фиксируются через flush_interval и без новых записей"""
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(journal.os, 'fsync', lambda fd: (synced.append(fd), fsync(fd)))
+    log = journal.Journal(str(tmp_path / 'journal.log'), batch_size=1000, flush_interval=0.05)
+    try:
+        log.append('reserve_ids', {'kind': 'book', 'stop': 2})
+        assert not synced
+        deadline = time.monotonic() + 5
+        while not synced and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert synced
+    finally:
+        log.close()
+
+
+def test_failed_write_keeps_sequence(tmp_path):
+    """Неудачная запись не занимает номер журнала"""
+    log = journal.Journal(str(tmp_path / 'journal.log'))
+    write = log._file.write
+
+    def failing_write(text):
+        log._file.write = write
+        raise OSError("диск заполнен")
+
+    log._file.write = failing_write
+    try:
+        with pytest.raises(FileOperationError):
+            log.append('reserve_ids', {'kind': 'book', 'stop': 2})
+        assert log.append('reserve_ids', {'kind': 'book', 'stop': 3}) == 1
+    finally:
+        log.close()
+    assert [record['seq'] for _, record in journal.Journal.read(log.path)] == [1]
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_xml_snapshot_keeps_journal_seq(tmp_path, streaming):
+    """XML снимок хранит номер журнала: записи до снимка не применяются повторно"""
+    directory = str(tmp_path / 'journal')
+    bookstore = make_bookstore(books=5, stock=10)
+    bookstore.events = NullSink()
+    journal.recover(bookstore, directory)
+    bookstore.sell_book(1, 1, 1, 1)
+    bookstore.sell_book(2, 1, 1, 1)
+    snapshot = str(tmp_path / 'snapshot.xml')
+    bookstore.save_to_xml(snapshot, streaming)
+    bookstore.journal.close()
+
+    loaded = Bookstore("Восстановление", events=NullSink())
+    loaded.load_from_xml(snapshot)
+    assert loaded._journal_seq == 2
+    assert journal.replay(loaded, os.path.join(directory, journal.JOURNAL_FILE)) == 0
+    assert len(loaded.sales) == 2
+    assert loaded.books[1].quantity == 9
@@ -0,0 +1,86 @@
+"""
+Тесты потокового разбора и загрузки JSON снимков
+"""
+
+import io
+import json
+
+import pytest
+
+from conftest import make_bookstore
+from bookstore import Bookstore
+from events import NullSink
+from file_operations import FileOperations
+from json_stream import JsonStreamReader
+from models import Book
+
+DOCUMENT = {
+    'name': 'Магазин "у дома" \\ ё',
+    'count': 3,
+    'ratio': -1.5e-3,
+    'flag': None,
+    'nested': {'a': [1, {'b': "]}"}], 'c': True},
+    'empty': [],
+    'items': [{'title': "Строка с \"кавычками\", [скобками] и {фигурными}"}, 2.5, "☃", [[], {}]],
+}
+
+
+def _members(text: str, chunk_size: int) -> dict:
+    """Члены объекта с массивами, прочитанными до конца"""
+    result = {}
+    for key, value in JsonStreamReader(io.StringIO(text), chunk_size).members():
+        result[key] = list(value) if not isinstance(value, (str, int, float, dict, type(None))) else value
+    return result
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1 << 16])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_reader_matches_json_load(chunk_size, indent):
+    """Разбор по блокам любого размера совпадает с json.loads"""
+    text = json.dumps(DOCUMENT, ensure_ascii=False, indent=indent)
+    assert _members(text, chunk_size) == json.loads(text)
+
+
+@pytest.mark.parametrize('text', ['{"a": [1, 2', '{"a": 1', '[1, 2]', '{"a" 1}'])
+def test_reader_rejects_broken_document(text):
+    """Оборванный или неверный документ вызывает ошибку, а не молча обрезается"""
+    with pytest.raises(ValueError):
+        _members(text, 2)
+
+
+def test_streaming_load_matches_plain_load(tmp_path, monkeypatch):
+    """Потоковая загрузка дает тот же магазин, что и json.load, и сообщает о ходе"""
+    monkeypatch.setattr(FileOperations, 'PROGRESS_STEP', 50)
+    bookstore = make_bookstore(books=120, sales=230, customers=10, employees=3)
+    bookstore._restore_book(Book(121, 'Книга "<&>"\n', 'Автор', 'Жанр', 199.99, 2, 2001))
+    bookstore.events = NullSink()
+    original = str(tmp_path / 'original.json')
+    bookstore.save_to_json(original)
+
+    progress = []
+    streamed = Bookstore("Поток", events=NullSink())
+    streamed.load_from_json(original, streaming=True,
+                            progress=lambda section, count: progress.append((section, count)))
+    copy = str(tmp_path / 'copy.json')
+    streamed.save_to_json(copy)
+
+    with open(original, 'rb') as f1, open(copy, 'rb') as f2:
+        assert f1.read() == f2.read()
+    assert streamed.verify_totals()
+    assert progress[-1] == ('sales', 230)
+    assert ('books', 50) in progress and ('books', 121) in progress
+
+
+def test_streaming_load_reads_old_format(tmp_path):
+    """Файл без счетчиков и номера журнала загружается со значениями по умолчанию"""
+    filename = tmp_path / 'old.json'
+    filename.write_text(json.dumps({
+        'name': 'Старый',
+        'books': [Book(7, 'Книга', 'Автор', 'Жанр', 10.0, 1, 2000).to_dict()],
+        'employees': [], 'customers': [], 'sales': [],
+    }), encoding='utf-8')
+    for streaming in (False, True):
+        loaded = Bookstore("Загрузка", events=NullSink())
+        loaded.load_from_json(str(filename), streaming=streaming)
+        assert loaded.name == 'Старый' and list(loaded.books) == [7]
+        assert loaded._journal_seq == 0
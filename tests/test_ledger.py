@@ -0,0 +1,95 @@
+"""
+Тесты колоночного журнала продаж
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from ledger import SalesLedger, from_timestamp, to_timestamp
+from models import Sale, to_kopecks
+
+
+def _sales(rng, ids):
+    """Продажи со случайными полями и датами с микросекундами"""
+    start = datetime(1965, 3, 1)
+    return [Sale(sale_id, rng.randint(1, 20), rng.randint(1, 5), rng.randint(1, 3), rng.randint(1, 4),
+                 round(rng.uniform(0.01, 5000), 2),
+                 start + timedelta(microseconds=rng.randint(0, 2 * 10 ** 15)))
+            for sale_id in ids]
+
+
+def _as_dicts(sales):
+    return [sale.to_dict() for sale in sales]
+
+
+@pytest.mark.parametrize('order', ['ascending', 'shuffled'])
+def test_ledger_behaves_like_dict(order):
+    """Журнал ведет себя как словарь "ID -> Sale" с тем же порядком и агрегатами"""
+    rng = random.Random(11)
+    ids = list(range(1, 501))
+    if order == 'shuffled':
+        rng.shuffle(ids)
+    sales = _sales(rng, ids)
+    reference = {}
+    ledger = SalesLedger()
+    ledger.extend(sales[:200])
+    for sale in sales[:200]:
+        reference[sale.sale_id] = sale
+    for sale in sales[200:]:
+        ledger.put(sale)
+        reference[sale.sale_id] = sale
+    # Замена продажи с существующим ID сохраняет ее место
+    for replacement in _sales(rng, rng.sample(ids, 20)):
+        ledger.put(replacement)
+        reference[replacement.sale_id] = replacement
+
+    assert len(ledger) == len(reference)
+    assert list(ledger) == list(reference)
+    assert _as_dicts(ledger.values()) == _as_dicts(reference.values())
+    for sale_id in rng.sample(ids, 50):
+        assert ledger[sale_id].to_dict() == reference[sale_id].to_dict()
+    assert 0 not in ledger and 501 not in ledger
+    with pytest.raises(KeyError):
+        ledger[10 ** 6]
+
+    assert ledger.total_revenue_kopecks() == sum(to_kopecks(sale.total_price) for sale in reference.values())
+    assert ledger.total_units() == sum(sale.quantity for sale in reference.values())
+    for field in ('book_id', 'customer_id', 'employee_id'):
+        units, revenue = {}, {}
+        for sale in reference.values():
+            key = getattr(sale, field)
+            units[key] = units.get(key, 0) + sale.quantity
+            revenue[key] = revenue.get(key, 0) + to_kopecks(sale.total_price)
+        assert ledger.units_by(field) == units
+        assert ledger.revenue_by(field) == revenue
+
+
+def test_timestamps_round_trip():
+    """Даты до и после 1970 года сохраняются с точностью до микросекунды"""
+    for moment in (datetime(1900, 1, 1), datetime(1969, 12, 31, 23, 59, 59, 999999),
+                   datetime(2024, 2, 29, 12, 0, 0, 1)):
+        assert from_timestamp(to_timestamp(moment)) == moment
+
+
+def test_copy_and_clear_are_independent():
+    """Копия и ранее полученные колонки не меняются при изменении журнала"""
+    rng = random.Random(3)
+    ledger = SalesLedger()
+    ledger.extend(_sales(rng, range(1, 11)))
+    copy = ledger.copy()
+    ledger.put(_sales(rng, [11])[0])
+    columns = ledger._columns()
+    ledger.clear()
+
+    assert len(ledger) == 0 and list(ledger.values()) == []
+    assert list(copy) == list(range(1, 11))
+    assert list(columns[0]) == list(range(1, 12))
+
+
+def test_memory_per_sale():
+    """Колонки занимают не больше 64 байт на продажу"""
+    ledger = SalesLedger()
+    ledger.extend(_sales(random.Random(5), range(1, 10001)))
+    assert ledger.memory_usage() / len(ledger) <= 64
@@ -0,0 +1,12 @@
+"""
+Тесты постраничного вывода списков менеджера
+"""
+
+from conftest import measure_manager_listing, FIRST_PAGE_SHARE
+
+
+def test_listing_is_paged():
+    """Первая страница не зависит от размера магазина, каждая страница - одна запись вывода"""
+    result = measure_manager_listing(100_000)
+    assert result['first_page'] <= result['all_pages'] * FIRST_PAGE_SHARE
+    assert result['writes'] <= result['pages'] + 1
@@ -0,0 +1,59 @@
+"""
+Тесты компактных моделей: слоты, интернирование и совместимость словарей
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+
+from exceptions import InvalidPriceError
+from models import Book, Employee, Customer, Sale
+
+MODELS = [
+    (Book, {'book_id': 1, 'title': 'Война и мир', 'author': 'Толстой', 'genre': 'Роман',
+            'price': 500.5, 'quantity': 3, 'year': 1869}),
+    (Employee, {'emp_id': 2, 'name': 'Иван', 'position': 'Продавец', 'salary': 35000.0}),
+    (Customer, {'cust_id': 3, 'name': 'Анна', 'email': 'anna@mail.ru', 'phone': '+7-900-000-0000'}),
+    (Sale, {'sale_id': 4, 'book_id': 1, 'customer_id': 3, 'employee_id': 2, 'quantity': 2,
+            'total_price': 1001.0, 'sale_date': datetime(2024, 1, 2, 3, 4, 5, 6).isoformat()}),
+]
+
+
+@pytest.mark.parametrize('model, data', MODELS)
+def test_dict_round_trip(model, data):
+    """to_dict и from_dict сохраняют прежний формат, у объектов нет __dict__"""
+    entity = model.from_dict(json.loads(json.dumps(data)))
+    assert entity.to_dict() == data
+    assert not hasattr(entity, '__dict__')
+    with pytest.raises(AttributeError):
+        entity.unknown = 1
+
+
+@pytest.mark.parametrize('model, data', MODELS[:2])
+def test_from_checked_matches_constructor(model, data):
+    """Создание без проверки дает тот же объект, что и конструктор"""
+    assert model.from_checked(*data.values()).to_dict() == model(*data.values()).to_dict()
+
+
+def test_repeated_strings_interned():
+    """Авторы, жанры и должности из разных источников разделяют один объект строки"""
+    author, genre, position = ''.join(['Тол', 'стой']), ''.join(['Ро', 'ман']), ''.join(['Про', 'давец'])
+    first = Book(1, 'Война и мир', author, genre, 500.0, 1, 1869)
+    second = Book.from_dict(json.loads(json.dumps(first.to_dict())))
+    third = Book.from_checked(3, 'Анна Каренина', 'Толстой', 'Роман', 450.0, 1, 1877)
+    assert first.author is second.author is third.author
+    assert first.genre is second.genre is third.genre
+    assert Employee(1, 'Иван', position, 1.0).position is Employee.from_checked(2, 'Петр', 'Продавец', 1.0).position
+
+
+def test_validation_kept():
+    """Проверки конструктора сохранились"""
+    with pytest.raises(ValueError):
+        Book(1, '', 'Автор', 'Жанр', 10.0, 1, 2000)
+    with pytest.raises(InvalidPriceError):
+        Book(1, 'Книга', 'Автор', 'Жанр', -1.0, 1, 2000)
+    with pytest.raises(ValueError):
+        Employee(1, 'Иван', 'Продавец', -1.0)
+    with pytest.raises(ValueError):
+        Customer(1, 'Анна', 'нет почты', '1')
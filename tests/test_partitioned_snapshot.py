@@ -0,0 +1,119 @@
+"""
+Тесты секционированных снимков
+"""
+
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import partitioned_snapshot
+from conftest import make_bookstore
+from bookstore import Bookstore
+from events import NullSink
+from exceptions import FileOperationError
+from models import Book, Sale
+
+
+@pytest.fixture
+def bookstore():
+    """Магазин с книгами вне порядка ID и продажами, не кратными размеру секции"""
+    store = make_bookstore(books=25, sales=103, customers=7, employees=3)
+    store.events = NullSink()
+    store._restore_book(Book(40, 'Книга "<&>"', 'Автор', 'Жанр', 199.99, 2, 2001))
+    store._restore_book(Book(30, 'Книга', 'Автор', 'Жанр', 0.01, 0, 1999))
+    store.reserve_ids('sale', 5)
+    return store
+
+
+def _json_bytes(store, path) -> bytes:
+    store.save_to_json(str(path))
+    return path.read_bytes()
+
+
+def _loaded(directory: str, workers: int = 1) -> Bookstore:
+    store = Bookstore("Загрузка", events=NullSink())
+    store.load_partitioned(directory, workers)
+    return store
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('codec', [None, 'gzip'])
+def test_round_trip_matches_json(bookstore, tmp_path, workers, codec):
+    """Снимок из секций загружается в то же состояние, что и JSON"""
+    expected = _json_bytes(bookstore, tmp_path / 'expected.json')
+    directory = str(tmp_path / 'parts')
+    manifest = partitioned_snapshot.save(bookstore, directory, workers, partition_rows=10, codec=codec)
+    sales = [entry for entry in manifest['partitions'] if entry['section'] == 'sales']
+    assert [entry['rows'] for entry in sales] == [10] * 10 + [3]
+    assert (sales[0]['first_id'], sales[-1]['last_id']) == (1, 103)
+
+    progress = []
+    loaded = Bookstore("Загрузка", events=NullSink())
+    loaded.load_partitioned(directory, workers, lambda section, rows: progress.append((section, rows)))
+    assert _json_bytes(loaded, tmp_path / 'copy.json') == expected
+    assert progress[-1] == ('sales', 103) and ('books', 27) in progress
+    assert loaded.ids.state() == bookstore.ids.state()
+
+
+def test_sales_sorted_by_id(tmp_path):
+    """Продажи, добавленные не по порядку ID, сохраняются по возрастанию sale_id"""
+    store = make_bookstore(books=3)
+    store.events = NullSink()
+    for sale_id in (5, 2, 9, 1):
+        store._restore_sale(Sale(sale_id, 1, 1, 1, 1, 10.0, datetime(2024, 1, sale_id)))
+    directory = str(tmp_path / 'parts')
+    store.save_partitioned(directory, workers=1)
+    loaded = _loaded(directory)
+    assert list(loaded.sales) == [1, 2, 5, 9]
+    assert [loaded.sales[sale_id].to_dict() for sale_id in loaded.sales] == \
+           [store.sales[sale_id].to_dict() for sale_id in (1, 2, 5, 9)]
+
+
+def test_stale_generations_removed(bookstore, tmp_path):
+    """Новое поколение удаляет секции прежних, посторонние файлы остаются"""
+    directory = str(tmp_path / 'parts')
+    first = partitioned_snapshot.save(bookstore, directory, 1, partition_rows=10)
+    (tmp_path / 'parts' / 'notes.txt').write_text('заметки')
+    bookstore.sell_book(1, 1, 1, 1)
+    second = partitioned_snapshot.save(bookstore, directory, 1, partition_rows=50, codec='xz')
+    assert (first['generation'], second['generation']) == (1, 2)
+    assert first['snapshot_id'] != second['snapshot_id']
+    assert sorted(os.listdir(directory)) == \
+        sorted([entry['file'] for entry in second['partitions']] + ['manifest.json', 'notes.txt'])
+    assert len(_loaded(directory).sales) == 104
+
+
+def _corrupt(directory, change):
+    """Изменение строки манифеста"""
+    path = os.path.join(directory, 'manifest.json')
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    change(manifest['partitions'])
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+
+def _sales(partitions):
+    return [entry for entry in partitions if entry['section'] == 'sales']
+
+
+@pytest.mark.parametrize('change', [
+    lambda parts: parts[0].update(file='../expected.json'),
+    lambda parts: parts[0].update(section='sales'),
+    lambda parts: parts[0].update(section='authors'),
+    lambda parts: parts[0].update(rows=-1),
+    lambda parts: _sales(parts)[0].update(rows=_sales(parts)[0]['rows'] + 1),
+    lambda parts: _sales(parts)[1].update(first_id=_sales(parts)[0]['last_id']),
+    lambda parts: parts.reverse(),
+    lambda parts: _sales(parts)[0].update(last_id=999),
+])
+def test_corrupt_manifest_rejected(bookstore, tmp_path, change):
+    """Неверные строки манифеста отклоняются с ошибкой файловой операции"""
+    _json_bytes(bookstore, tmp_path / 'expected.json')
+    directory = str(tmp_path / 'parts')
+    partitioned_snapshot.save(bookstore, directory, 1, partition_rows=10)
+    _corrupt(directory, change)
+    with pytest.raises(FileOperationError):
+        _loaded(directory)
@@ -0,0 +1,75 @@
+"""
+Тесты поиска книг по диапазонам цены, года издания и количества
+"""
+
+import copy
+import random
+
+import pytest
+
+from conftest import make_bookstore
+from events import NullSink
+
+RANGES = [
+    {'min_price': 300, 'max_price': 450},
+    {'max_price': 150.5},
+    {'year_from': 1950, 'year_to': 1960},
+    {'year_from': 2000},
+    {'max_quantity': 3},
+    {'min_quantity': 8, 'max_quantity': 9},
+    {'min_price': 200, 'year_to': 1950, 'min_quantity': 1},
+    {'min_price': 500, 'max_price': 400},
+    {'title': 'Книга 1', 'max_price': 600},
+]
+
+
+def _scan(books, criteria):
+    """Отбор книг полным перебором, границы включаются"""
+    bounds = {
+        'min_price': lambda book, value: book.price >= value,
+        'max_price': lambda book, value: book.price <= value,
+        'year_from': lambda book, value: book.year >= value,
+        'year_to': lambda book, value: book.year <= value,
+        'min_quantity': lambda book, value: book.quantity >= value,
+        'max_quantity': lambda book, value: book.quantity <= value,
+        'title': lambda book, value: value.lower() in book.title.lower(),
+    }
+    return [book.book_id for book in books
+            if all(bounds[name](book, value) for name, value in criteria.items())]
+
+
+@pytest.fixture
+def bookstore():
+    """Магазин, остатки которого изменены продажами, списанием и пополнением"""
+    rng = random.Random(2)
+    store = make_bookstore(books=500, stock=10)
+    store.events = NullSink()
+    for _ in range(800):
+        book_id = rng.choice(list(store.books))
+        book = store.books[book_id]
+        action = rng.random()
+        if action < 0.6 and book.quantity:
+            store.sell_book(book_id, 1, 1, 1)
+        elif action < 0.9:
+            store.remove_book(book_id, min(book.quantity, rng.randint(1, 3)))
+        else:
+            restock = copy.copy(book)
+            restock.quantity = rng.randint(1, 5)
+            store.add_book(restock)
+    return store
+
+
+@pytest.mark.parametrize('criteria', RANGES)
+def test_range_search_matches_scan(bookstore, criteria):
+    """Поиск по индексам совпадает с перебором и после изменений остатков"""
+    expected = _scan(bookstore.books.values(), criteria)
+    assert [book.book_id for book in bookstore.search_books(**criteria)] == expected
+
+
+def test_quantity_index_follows_sales(bookstore):
+    """Проданная до конца книга находится по нулевому остатку"""
+    book_id = next(book.book_id for book in bookstore.books.values() if book.quantity)
+    bookstore.sell_book(book_id, bookstore.books[book_id].quantity, 1, 1)
+    found = [book.book_id for book in bookstore.search_books(max_quantity=0)]
+    assert book_id in found
+    assert found == _scan(bookstore.books.values(), {'max_quantity': 0})
@@ -0,0 +1,61 @@
+"""
+Тесты выборок продаж по клиенту, сотруднику и книге
+"""
+
+import pytest
+
+from conftest import make_bookstore
+from bookstore import Bookstore
+from events import NullSink
+
+LOOKUPS = [
+    ('get_sales_by_customer', 'customer_id'),
+    ('get_sales_by_employee', 'employee_id'),
+    ('get_sales_by_book', 'book_id'),
+]
+
+
+def _scan(bookstore, field, value):
+    return [sale.sale_id for sale in bookstore.sales.values() if getattr(sale, field) == value]
+
+
+def _check(bookstore):
+    for method, field in LOOKUPS:
+        values = {getattr(sale, field) for sale in bookstore.sales.values()} | {999}
+        for value in values:
+            found = [sale.sale_id for sale in getattr(bookstore, method)(value)]
+            assert found == _scan(bookstore, field, value), (method, value)
+
+
+@pytest.fixture
+def bookstore():
+    """Магазин с загруженными, одиночными и пакетными продажами"""
+    store = make_bookstore(books=30, sales=300, customers=7, employees=4, stock=100)
+    store.events = NullSink()
+    for line in range(40):
+        store.sell_book(line % 30 + 1, 1, line % 7 + 1, line % 4 + 1)
+    store.sell_books_bulk([(1, 2), (5, 1), (1, 1)], 3, 2)
+    return store
+
+
+def test_lookups_match_scan(bookstore):
+    """Выборки по индексам совпадают с перебором, продажи идут по порядку ID"""
+    _check(bookstore)
+
+
+@pytest.mark.parametrize('name, save, load', [('data.json', 'save_to_json', 'load_from_json'),
+                                              ('data.xml', 'save_to_xml', 'load_from_xml'),
+                                              ('data.bin', 'save_to_binary', 'load_from_binary')])
+def test_lookups_after_load(bookstore, tmp_path, name, save, load):
+    """Загрузчики строят индексы продаж заново"""
+    filename = str(tmp_path / name)
+    getattr(bookstore, save)(filename)
+    loaded = Bookstore("Загрузка", events=NullSink())
+    getattr(loaded, load)(filename)
+    _check(loaded)
+    assert [sale.sale_id for sale in loaded.get_sales_by_book(1)] == \
+           [sale.sale_id for sale in bookstore.get_sales_by_book(1)]
+
+    # Повторная загрузка в заполненный магазин не удваивает списки
+    getattr(bookstore, load)(filename)
+    _check(bookstore)
@@ -0,0 +1,70 @@
+"""
+Тесты поиска книг по триграммному индексу
+"""
+
+import random
+
+import pytest
+
+from bookstore import Bookstore
+from events import NullSink
+from models import Book
+
+# Буквы разных алфавитов и регистров, пробелы и символы, меняющие длину при lower()
+ALPHABET = "абвгдеёжзАБВГДЕЁЖЗabcABC  -'İßΣσς"
+
+
+def _text(rng, low=1, high=12):
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(low, high))).strip() or 'а'
+
+
+def _queries(rng, books, count):
+    """Подстроки названий и авторов (в том числе через пробел), короткие и случайные строки"""
+    texts = [book.title for book in books] + [book.author for book in books]
+    queries = []
+    for _ in range(count):
+        text = rng.choice(texts)
+        start = rng.randrange(len(text))
+        query = text[start:start + rng.randint(1, 6)]
+        kind = rng.random()
+        if kind < 0.3:
+            query = query.upper()
+        elif kind < 0.5:
+            query = _text(rng, 1, 4)
+        queries.append(query)
+    return queries
+
+
+def _brute_force(books, **criteria):
+    """Поиск полным перебором с проверкой подстроки оператором in"""
+    result = []
+    for book in books:
+        if all(criteria[field].lower() in getattr(book, field).lower()
+               for field in ('title', 'author', 'genre') if criteria.get(field)):
+            if criteria.get('max_price') is None or book.price <= criteria['max_price']:
+                result.append(book.book_id)
+    return result
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_index_matches_substring_scan(seed):
+    """Результаты индекса совпадают с перебором для любых запросов, включая короткие"""
+    rng = random.Random(seed)
+    bookstore = Bookstore("Поиск", events=NullSink())
+    for _ in range(300):
+        bookstore.add_book(Book(0, _text(rng), _text(rng), rng.choice(["Роман", "Поэзия", "SciFi"]),
+                                float(rng.randint(1, 1000)), rng.randint(1, 3), 2000))
+    # Удаленные и замененные книги не должны оставаться в индексе
+    for book_id in rng.sample(list(bookstore.books), 50):
+        book = bookstore.books[book_id]
+        bookstore.remove_book(book_id, book.quantity)
+    for book_id in rng.sample(list(bookstore.books), 20):
+        bookstore._restore_book(Book(book_id, _text(rng), _text(rng), "Роман", 10.0, 1, 2000))
+
+    books = list(bookstore.books.values())
+    for query in _queries(rng, books, 300):
+        for criteria in ({'title': query}, {'author': query}, {'genre': query[:2]},
+                         {'title': query, 'max_price': 500}):
+            expected = _brute_force(books, **criteria)
+            found = [book.book_id for book in bookstore.search_books(**criteria)]
+            assert found == expected, criteria
@@ -0,0 +1,59 @@
+"""
+Тесты HTTP/JSON сервиса магазина
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from bookstore import Bookstore
+from models import Book
+from service import BookstoreService
+
+
+def test_search_runs_off_event_loop(tmp_path):
+    """Поиск выполняется в пуле потоков, а не в цикле событий"""
+    bookstore = Bookstore("Сервис", concurrent=True)
+    bookstore.add_book(Book(0, "Война и мир", "Толстой", "Роман", 500.0, 3, 1869))
+    bookstore.add_book(Book(0, "Анна Каренина", "Толстой", "Роман", 450.0, 2, 1877))
+    service = BookstoreService(bookstore, str(tmp_path), workers=2)
+    threads = []
+    search = bookstore.search_books
+
+    def recording_search(**criteria):
+        threads.append(threading.current_thread())
+        return search(**criteria)
+
+    bookstore.search_books = recording_search
+    try:
+        status, body = asyncio.run(service.search_books({'author': 'толстой', 'limit': '1'}, {}))
+    finally:
+        service.executor.shutdown()
+
+    assert status == 200
+    assert body['total'] == 2 and len(body['books']) == 1
+    assert threads and threads[0] is not threading.main_thread()
+
+
+@pytest.mark.parametrize('length', ['-5', 'abc'])
+def test_malformed_content_length(tmp_path, length):
+    """Отрицательная или нечисловая длина тела - ответ 400, а не обрыв соединения"""
+    service = BookstoreService(Bookstore("Сервис", concurrent=True), str(tmp_path), workers=1)
+
+    async def request():
+        server = await asyncio.start_server(service.handle_connection, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f"POST /sales HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+
+    try:
+        response = asyncio.run(request())
+    finally:
+        service.executor.shutdown()
+    assert response.startswith(b'HTTP/1.1 400 ')
@@ -0,0 +1,80 @@
+"""
+Тесты полных снимков: JSON, двоичный формат и сжатые варианты дают одинаковые данные
+"""
+
+import gzip
+from datetime import datetime
+
+import pytest
+
+import compression
+from conftest import make_bookstore
+from bookstore import Bookstore
+from events import NullSink
+from file_operations import FileOperations
+from models import Book, Sale
+
+
+@pytest.fixture
+def bookstore():
+    """Магазин с продажами, дробными ценами и строками не из ASCII"""
+    store = make_bookstore(books=50, sales=200, customers=5, employees=3)
+    store._restore_book(Book(51, 'Мастер и Маргарита "<&>"', 'Булгаков', 'Роман', 199.99, 3, 1967))
+    store._restore_sale(Sale(201, 51, 1, 1, 2, 399.98, datetime(2024, 5, 1, 12, 30, 15, 123456)))
+    store.events = NullSink()
+    return store
+
+
+def _json_bytes(store, path) -> bytes:
+    """Снимок магазина в JSON"""
+    store.save_to_json(str(path))
+    return path.read_bytes()
+
+
+def _loaded(method: str, filename: str) -> Bookstore:
+    """Магазин, загруженный из снимка"""
+    store = Bookstore("Загрузка", events=NullSink())
+    getattr(store, method)(filename)
+    return store
+
+
+@pytest.mark.parametrize('suffix', ['', '.gz', '.bz2', '.xz'])
+def test_binary_round_trip(bookstore, tmp_path, suffix):
+    """JSON -> двоичный снимок -> JSON побайтно совпадает с исходным JSON"""
+    original = _json_bytes(bookstore, tmp_path / 'original.json')
+    binary = str(tmp_path / ('data.bin' + suffix))
+    bookstore.save_to_binary(binary)
+    if suffix:
+        assert compression.is_compressed(binary)
+
+    assert _json_bytes(_loaded('load_from_binary', binary), tmp_path / 'copy.json') == original
+    assert _json_bytes(_loaded('load_with_deltas', binary), tmp_path / 'chain.json') == original
+
+
+@pytest.mark.parametrize('threads', [1, 3])
+def test_compressed_json_matches_plain(bookstore, tmp_path, monkeypatch, threads):
+    """Сжатый JSON (в том числе блочный) распаковывается в тот же документ"""
+    monkeypatch.setattr(FileOperations, 'COMPRESS_THREADS', threads)
+    monkeypatch.setattr(compression, 'BLOCK_SIZE', 4096)
+    original = _json_bytes(bookstore, tmp_path / 'original.json')
+    packed = str(tmp_path / 'data.json.gz')
+    bookstore.save_to_json(packed)
+
+    with gzip.open(packed, 'rb') as f:
+        assert f.read() == original
+    assert _json_bytes(_loaded('load_from_json', packed), tmp_path / 'copy.json') == original
+
+
+def test_binary_with_delta_matches_json(bookstore, tmp_path):
+    """Двоичная база с дельта-снимком восстанавливает текущее состояние"""
+    base = str(tmp_path / 'base.bin.xz')
+    delta = str(tmp_path / 'changes.delta.gz')
+    bookstore.save_to_binary(base)
+    bookstore.sell_book(51, 1, 2, 2)
+    bookstore.remove_book(1, 1000)
+    bookstore.save_delta(delta)
+    expected = _json_bytes(bookstore, tmp_path / 'expected.json')
+
+    restored = Bookstore("Цепочка", events=NullSink())
+    restored.load_with_deltas(base, [delta])
+    assert _json_bytes(restored, tmp_path / 'restored.json') == expected
@@ -0,0 +1,79 @@
+"""
+Тесты хранения магазина в базе SQLite
+"""
+
+import sqlite3
+
+import pytest
+
+from bookstore import Bookstore
+from models import Book
+from sqlite_storage import SQLiteBookstore
+
+BOOKS = [
+    ("Война и мир", "Толстой", "Роман", 500.0, 3, 1869),
+    ("Анна Каренина", "Толстой", "Роман", 450.0, 1, 1877),
+    ('Книга "в кавычках"', "О'Генри", "Рассказы", 199.99, 2, 1906),
+    ("Мир", "Ян", "Сказка", 100.0, 5, 2001),
+]
+
+QUERIES = [
+    {'title': 'мир'}, {'title': 'МИР'}, {'title': 'ми'}, {'title': 'р'},
+    {'author': 'толстой', 'genre': 'ром'}, {'author': 'толстой', 'max_price': 460},
+    {'title': '"в кав'}, {'author': "о'ген"}, {'title': 'нет такой'}, {'genre': 'ан'},
+    {'title': 'ина', 'year_from': 1870},
+]
+
+
+def _fill(bookstore):
+    for row in BOOKS:
+        bookstore.add_book(Book(0, *row))
+    # Последний экземпляр снимается с продажи, книга удаляется
+    bookstore.remove_book(2, 1)
+
+
+@pytest.fixture
+def stores(tmp_path):
+    memory = Bookstore("Память")
+    database = SQLiteBookstore("База", str(tmp_path / 'store.db'))
+    _fill(memory)
+    _fill(database)
+    yield memory, database
+    database.close()
+
+
+@pytest.mark.parametrize('criteria', QUERIES)
+def test_search_matches_memory_store(stores, criteria):
+    """Поиск SQL-запросом дает те же книги, что и магазин в памяти"""
+    memory, database = stores
+    expected = sorted(book.book_id for book in memory.search_books(**criteria))
+    assert [book.book_id for book in database.search_books(**criteria)] == expected
+
+
+def test_trigram_index_follows_changes(stores):
+    """Триграммный индекс следует за добавлением и удалением книг"""
+    _, database = stores
+    database.add_book(Book(0, "Воскресение", "Толстой", "Роман", 300.0, 1, 1899))
+    assert [book.title for book in database.search_books(title='воскрес')] == ["Воскресение"]
+    database.remove_book(database.search_books(title='воскрес')[0].book_id, 1)
+    assert database.search_books(title='воскрес') == []
+    database.conn.execute("INSERT INTO books_fts (books_fts) VALUES ('integrity-check')")
+
+
+def test_index_built_for_existing_database(tmp_path):
+    """Для базы без триграммного индекса он строится при открытии"""
+    path = str(tmp_path / 'old.db')
+    database = SQLiteBookstore("База", path)
+    _fill(database)
+    database.close()
+    # База без триграммного индекса, как до его появления
+    conn = sqlite3.connect(path)
+    conn.executescript("DROP TABLE books_fts; DROP TRIGGER books_fts_insert; "
+                       "DROP TRIGGER books_fts_delete; DROP TRIGGER books_fts_update;")
+    conn.close()
+
+    database = SQLiteBookstore("База", path)
+    try:
+        assert [book.title for book in database.search_books(title='мир')] == ["Война и мир", "Мир"]
+    finally:
+        database.close()
@@ -0,0 +1,90 @@
+"""
+Тесты выборок продаж по времени, рядов по интервалам и скользящих окон
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import make_bookstore
+from events import NullSink
+from indexes import RollingCounter
+from models import Sale, to_kopecks
+
+START = datetime(2023, 11, 28)
+
+
+@pytest.fixture
+def bookstore():
+    """Магазин с продажами в случайном порядке времени на рубеже месяцев и лет"""
+    rng = random.Random(17)
+    store = make_bookstore(books=10, customers=3, employees=2, stock=100)
+    store.events = NullSink()
+    for sale_id in range(1, 601):
+        moment = START + timedelta(seconds=rng.randint(0, 70 * 24 * 3600), microseconds=rng.randint(0, 999999))
+        book_id = rng.randint(1, 10)
+        quantity = rng.randint(1, 3)
+        store._restore_sale(Sale(sale_id, book_id, 1, 1, quantity,
+                                 round(store.books[book_id].price * quantity, 2), moment))
+    store._next_sale_id = 601
+    return store
+
+
+def _scan(bookstore, start, end):
+    sales = [sale for sale in bookstore.sales.values() if start <= sale.sale_date < end]
+    return sorted(sales, key=lambda sale: (sale.sale_date, sale.sale_id))
+
+
+@pytest.mark.parametrize('days, length', [(0, 1), (3, 7), (30, 5), (-5, 200), (80, 10)])
+def test_sales_between_matches_scan(bookstore, days, length):
+    """Продажи за период совпадают с перебором, граница end не включается"""
+    start = START + timedelta(days=days, hours=5)
+    end = start + timedelta(days=length)
+    expected = [sale.sale_id for sale in _scan(bookstore, start, end)]
+    assert [sale.sale_id for sale in bookstore.get_sales_between(start, end)] == expected
+    edge = bookstore.sales[expected[0]].sale_date if expected else start
+    assert all(sale.sale_date != edge for sale in bookstore.get_sales_between(start, edge))
+
+
+@pytest.mark.parametrize('unit', ['hour', 'day', 'month'])
+def test_series_matches_scan(bookstore, unit):
+    """Ряды по часам, дням и месяцам совпадают с суммами перебором"""
+    start = START + timedelta(days=2, hours=3, minutes=30)
+    end = start + (timedelta(days=2) if unit == 'hour' else timedelta(days=60))
+    series = bookstore.get_sales_series(start, end, unit)
+    assert series[0][0] <= start and series[-1][0] < end
+    bounds = [label for label, _, _ in series[1:]] + [end]
+    for (label, revenue, units), following in zip(series, bounds):
+        sales = _scan(bookstore, max(label, start), following)
+        assert revenue == sum(to_kopecks(sale.total_price) for sale in sales) / 100
+        assert units == sum(sale.quantity for sale in sales)
+    assert sum(units for _, _, units in series) == sum(sale.quantity for sale in _scan(bookstore, start, end))
+
+
+def test_rolling_counter_matches_scan():
+    """Итоги окна из минутных корзин равны сумме продаж за последние minutes минут"""
+    rng = random.Random(5)
+    counter = RollingCounter(60)
+    added = []
+    now = 10 ** 15
+    for _ in range(3000):
+        now += rng.choice([0, 1, 10 ** 6, 30 * 10 ** 6, RollingCounter.MINUTE * rng.randint(1, 90)])
+        timestamp = now - rng.choice([0, 0, 0, RollingCounter.MINUTE * 30, RollingCounter.MINUTE * 70])
+        kopecks, units = rng.randint(1, 10 ** 5), rng.randint(1, 3)
+        counter.add(timestamp, kopecks, units)
+        added.append((timestamp, kopecks, units))
+
+        minute = now // RollingCounter.MINUTE
+        window = [(k, u) for t, k, u in added if minute - 60 < t // RollingCounter.MINUTE <= minute]
+        assert counter.totals(now) == (sum(k for k, _ in window), sum(u for _, u in window))
+
+
+def test_rolling_totals_count_new_sales(bookstore):
+    """Скользящие окна магазина учитывают новые продажи и не учитывают старые"""
+    assert bookstore.get_rolling_totals() == {'1h': (0.0, 0), '24h': (0.0, 0)}
+    first = bookstore.sell_book(1, 2, 1, 1)
+    second = bookstore.sell_books_bulk([(2, 1), (3, 3)], 1, 1)
+    units = first.quantity + sum(sale.quantity for sale in second)
+    revenue = sum(to_kopecks(sale.total_price) for sale in [first] + second) / 100
+    assert bookstore.get_rolling_totals() == {'1h': (revenue, units), '24h': (revenue, units)}
@@ -0,0 +1,69 @@
+"""
+Тесты текущих итогов выручки и стоимости склада в копейках
+"""
+
+import copy
+from decimal import Decimal
+
+from conftest import make_bookstore
+from bookstore import Bookstore
+from events import NullSink
+from models import Book, Employee, Customer
+
+
+def _exact(values) -> float:
+    """Точная сумма денежных значений"""
+    return float(sum(Decimal(str(value)) for value in values))
+
+
+def _store():
+    store = make_bookstore(books=20, sales=100, stock=50)
+    store.events = NullSink()
+    return store
+
+
+def test_totals_match_recomputation():
+    """Итоги после продаж, списаний и пополнений равны точному пересчету"""
+    bookstore = _store()
+    for line in range(60):
+        bookstore.sell_book(line % 20 + 1, line % 3 + 1, 1, 1)
+    bookstore.remove_book(3, 5)
+    bookstore.remove_book(4, bookstore.books[4].quantity)
+    restock = copy.copy(bookstore.books[5])
+    restock.quantity = 7
+    bookstore.add_book(restock)
+    bookstore.sell_books_bulk([(6, 2), (7, 1)], 2, 2)
+
+    assert bookstore.get_total_revenue() == _exact(sale.total_price for sale in bookstore.sales.values())
+    assert bookstore.get_inventory_value() == \
+        _exact(Decimal(str(book.price)) * book.quantity for book in bookstore.books.values())
+    assert bookstore.verify_totals()
+
+
+def test_no_float_drift():
+    """Тысяча продаж по 0.10 дают ровно 100.00"""
+    bookstore = Bookstore("Копейки", events=NullSink())
+    bookstore._restore_employee(Employee(1, "Продавец", "Кассир", 30000.0))
+    bookstore._restore_customer(Customer(1, "Клиент", "client@mail.com", "+7-000-000-0000"))
+    bookstore.add_book(Book(0, "Открытка", "Автор", "Открытки", 0.1, 1000, 2000))
+    for _ in range(1000):
+        bookstore.sell_book(1, 1, 1, 1)
+    assert sum(0.1 for _ in range(1000)) != 100.0
+    assert bookstore.get_total_revenue() == 100.0
+    assert bookstore.get_inventory_value() == 0.0
+
+
+def test_verify_totals_repairs_drift(tmp_path):
+    """Пересчет обнаруживает и исправляет расхождение; загрузка восстанавливает итоги"""
+    bookstore = _store()
+    revenue, inventory = bookstore.get_total_revenue(), bookstore.get_inventory_value()
+    bookstore._revenue_kopecks += 1
+    assert not bookstore.verify_totals()
+    assert bookstore.get_total_revenue() == revenue
+    assert bookstore.verify_totals()
+
+    filename = str(tmp_path / 'data.json')
+    bookstore.save_to_json(filename)
+    loaded = Bookstore("Загрузка", events=NullSink())
+    loaded.load_from_json(filename, streaming=True)
+    assert (loaded.get_total_revenue(), loaded.get_inventory_value()) == (revenue, inventory)
@@ -0,0 +1,59 @@
+"""
+Тесты потоковой загрузки XML снимков через iterparse
+"""
+
+import pytest
+
+from conftest import make_bookstore
+from bookstore import Bookstore
+from events import NullSink
+from file_operations import FileOperations
+from models import Book
+
+# Снимок в разметке, которую пишет save_to_xml: пустые разделы и поля в порядке to_dict
+LEGACY_XML = """<?xml version='1.0' encoding='utf-8'?>
+<bookstore><name>Старый &amp; добрый</name><next_book_id>8</next_book_id><next_emp_id>1</next_emp_id>\
+<next_cust_id>1</next_cust_id><next_sale_id>1</next_sale_id>\
+<books><book><book_id>7</book_id><title>Книга &lt;1&gt;</title><author>Автор</author><genre>Жанр</genre>\
+<price>10.5</price><quantity>2</quantity><year>2000</year></book></books>\
+<employees /><customers /><sales /></bookstore>"""
+
+
+def _json_bytes(store, path) -> bytes:
+    store.save_to_json(str(path))
+    return path.read_bytes()
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_xml_round_trip(tmp_path, monkeypatch, streaming):
+    """XML снимок загружается в тот же магазин, что и исходный, с отчетом о ходе"""
+    monkeypatch.setattr(FileOperations, 'PROGRESS_STEP', 40)
+    bookstore = make_bookstore(books=90, sales=130, customers=5, employees=2)
+    bookstore._restore_book(Book(91, 'Книга "<&>"', "О'Генри", 'Рассказы', 199.99, 3, 1906))
+    bookstore.events = NullSink()
+    filename = str(tmp_path / 'data.xml')
+    bookstore.save_to_xml(filename, streaming)
+
+    progress = []
+    loaded = Bookstore("Загрузка", events=NullSink())
+    loaded.load_from_xml(filename, progress=lambda section, count: progress.append((section, count)))
+
+    assert _json_bytes(loaded, tmp_path / 'copy.json') == _json_bytes(bookstore, tmp_path / 'original.json')
+    assert loaded.verify_totals()
+    assert ('books', 40) in progress and ('books', 91) in progress
+    assert progress[-1] == ('sales', 130)
+
+
+def test_xml_legacy_layout(tmp_path):
+    """Разметка без номера журнала и с пустыми разделами читается, прежние данные заменяются"""
+    filename = tmp_path / 'legacy.xml'
+    filename.write_text(LEGACY_XML, encoding='utf-8')
+    loaded = make_bookstore(books=3, sales=2)
+    loaded.events = NullSink()
+    loaded.load_from_xml(str(filename))
+
+    assert loaded.name == 'Старый & добрый'
+    assert [(book.book_id, book.title, book.price) for book in loaded.books.values()] == [(7, 'Книга <1>', 10.5)]
+    assert (len(loaded.employees), len(loaded.customers), len(loaded.sales)) == (0, 0, 0)
+    assert loaded._next_book_id == 8
+    assert loaded.get_inventory_value() == 21.0
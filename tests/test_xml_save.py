@@ -0,0 +1,67 @@
+"""
+Тесты потоковой записи XML снимков
+"""
+
+from datetime import datetime
+
+import pytest
+
+import compression
+from conftest import make_bookstore
+from bookstore import Bookstore
+from events import NullSink
+from models import Book, Customer, Sale
+
+# Значения, которые ElementTree экранирует или записывает особо
+TRICKY = ['Кавычки "двойные" и \'одинарные\'', 'Разметка <b>&amp;</b>', 'Строки\nи\tтабуляция',
+          'Пробелы по краям  ', 'Эмодзи 📚 и ё']
+
+
+def _files_equal(first: str, second: str) -> bool:
+    """Совпадение содержимого файлов (сжатые сравниваются после распаковки)"""
+    with compression.open_read(first) as f1, compression.open_read(second) as f2:
+        return f1.read() == f2.read()
+
+
+@pytest.fixture
+def bookstore():
+    """Магазин со строками, требующими экранирования"""
+    store = make_bookstore(books=20, sales=40, customers=3, employees=2)
+    for offset, text in enumerate(TRICKY, 21):
+        store._restore_book(Book(offset, text, text, 'Жанр', 0.01 * offset, offset, 2000))
+        store._restore_customer(Customer(offset, text, f'{offset}@mail.ru', text))
+    store._restore_sale(Sale(41, 21, 21, 1, 1, 0.21, datetime(2024, 2, 29, 23, 59, 59, 999999)))
+    store.events = NullSink()
+    return store
+
+
+@pytest.mark.parametrize('suffix', ['', '.gz'])
+def test_streaming_matches_element_tree(bookstore, tmp_path, suffix):
+    """Потоковая запись побайтно совпадает с ElementTree, в том числе в сжатом файле"""
+    tree_file = str(tmp_path / ('tree.xml' + suffix))
+    stream_file = str(tmp_path / ('stream.xml' + suffix))
+    bookstore.save_to_xml(tree_file)
+    bookstore.save_to_xml(stream_file, streaming=True)
+    assert _files_equal(tree_file, stream_file)
+
+
+def test_streaming_empty_store(tmp_path):
+    """Пустые разделы записываются так же, как в ElementTree"""
+    bookstore = Bookstore("Пусто", events=NullSink())
+    bookstore.save_to_xml(str(tmp_path / 'tree.xml'))
+    bookstore.save_to_xml(str(tmp_path / 'stream.xml'), streaming=True)
+    assert _files_equal(str(tmp_path / 'tree.xml'), str(tmp_path / 'stream.xml'))
+
+
+def test_streaming_output_loads(bookstore, tmp_path):
+    """Потоковый XML загружается обратно без потерь"""
+    filename = str(tmp_path / 'stream.xml')
+    bookstore.save_to_xml(filename, streaming=True)
+    loaded = Bookstore("Загрузка", events=NullSink())
+    loaded.load_from_xml(filename)
+    assert [book.to_dict() for book in loaded.books.values()] == \
+           [book.to_dict() for book in bookstore.books.values()]
+    assert [customer.to_dict() for customer in loaded.customers.values()] == \
+           [customer.to_dict() for customer in bookstore.customers.values()]
+    assert [sale.to_dict() for sale in loaded.sales.values()] == \
+           [sale.to_dict() for sale in bookstore.sales.values()]